@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import date, timedelta
@@ -7,6 +7,8 @@ from app.api import deps
 from app.db.session import get_db
 from app.models.user import User
 from app.crud.crud_body_metrics import body_metrics
+from app.services.body_metrics_series_service import body_metrics_series_service
+from app.services.weight_trend_service import weight_trend_service
 from app.schemas.body_metrics import (
     BodyMetricsCreate,
     BodyMetricsUpdate,
@@ -40,14 +42,18 @@ def create_body_metrics(
             db_metrics=existing, 
             metrics_in=BodyMetricsUpdate(**metrics_in.model_dump())
         )
+        body_metrics_series_service.invalidate(current_user.id)
+        weight_trend_service.invalidate(current_user.id)
         return updated
     
     # 创建新记录
-    return body_metrics.create_body_metrics(
+    created = body_metrics.create_body_metrics(
         db, 
         user_id=current_user.id, 
         metrics_in=metrics_in
     )
+    body_metrics_series_service.invalidate(current_user.id)
+    return created
 
 
 @router.get("/", response_model=List[BodyMetricsInDB], summary="获取身体指标历史")
@@ -77,61 +83,42 @@ def get_body_metrics_history(
 
 @router.get("/trends", response_model=BodyMetricsTrendResponse, summary="获取身体指标趋势")
 def get_body_metrics_trends(
-    weeks: int = 8,
+    weeks: int = Query(8, ge=1, le=520, description="时间范围（周）"),
+    resolution: str = Query("auto", description="数据粒度: auto, raw, week, month, lttb", enum=["auto", "raw", "week", "month", "lttb"]),
+    max_points: int = Query(200, ge=10, le=2000, description="返回的最大数据点数（raw 模式不限制）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     获取用户的身体指标趋势分析
-    返回包含体重和体脂率变化的数据
+    返回包含体重和体脂率变化的数据；记录较多时在服务端降采样（周/月均值或LTTB），
+    返回的数据点数不超过 max_points
     """
     from app.schemas.body_metrics import BodyMetricsTrend
     
     end_date = date.today()
     start_date = end_date - timedelta(weeks=weeks)
     
-    metrics_list = body_metrics.get_body_metrics_by_user_and_date_range(
-        db,
-        user_id=current_user.id,
-        start_date=start_date,
-        end_date=end_date
-    )
-    
-    trends = []
-    prev_weight = None
-    prev_bf = None
+    try:
+        series = body_metrics_series_service.get_trend_rows(
+            db,
+            current_user.id,
+            start_date,
+            end_date,
+            resolution=resolution,
+            max_points=max_points
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    for m in metrics_list:
-        weight_change = None
-        bf_change = None
-        
-        if m.weight_kg:
-            weight_kg = float(m.weight_kg)
-            if prev_weight is not None:
-                weight_change = weight_kg - prev_weight
-            prev_weight = weight_kg
-        else:
-            weight_kg = None
-        
-        if m.body_fat_pct:
-            bf_pct = float(m.body_fat_pct)
-            if prev_bf is not None:
-                bf_change = bf_pct - prev_bf
-            prev_bf = bf_pct
-        else:
-            bf_pct = None
-        
-        trends.append(BodyMetricsTrend(
-            record_date=m.record_date,
-            weight_kg=weight_kg,
-            body_fat_pct=bf_pct,
-            weight_change_kg=weight_change,
-            body_fat_change_pct=bf_change
-        ))
+    trends = [BodyMetricsTrend(**row) for row in series['rows']]
     
     return BodyMetricsTrendResponse(
         data=trends,
-        total_records=len(trends)
+        total_records=len(trends),
+        resolution=series['resolution'],
+        source_records=series['source_records'],
+        weight_trend=weight_trend_service.get_trend(db, current_user.id)
     )
 
 
@@ -166,11 +153,14 @@ def update_body_metrics(
     if db_metrics.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问该记录")
     
-    return body_metrics.update_body_metrics(
+    updated = body_metrics.update_body_metrics(
         db, 
         db_metrics=db_metrics, 
         metrics_in=metrics_in
     )
+    body_metrics_series_service.invalidate(current_user.id)
+    weight_trend_service.invalidate(current_user.id)
+    return updated
 
 
 @router.delete("/{metrics_id}", summary="删除身体指标")
@@ -192,5 +182,7 @@ def delete_body_metrics(
     success = body_metrics.delete_body_metrics(db, metrics_id=metrics_id)
     if not success:
         raise HTTPException(status_code=500, detail="删除失败")
+    body_metrics_series_service.invalidate(current_user.id)
+    weight_trend_service.invalidate(current_user.id)
     
     return {"message": "删除成功"}
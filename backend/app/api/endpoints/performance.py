@@ -11,7 +11,7 @@ router = APIRouter()
 
 @router.get("/analysis", summary="获取训练表现分析")
 def get_performance_analysis(
-    weeks: int = Query(4, ge=1, le=12, description="分析的时间范围（周）"),
+    weeks: int = Query(4, ge=1, le=52, description="分析的时间范围（周）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
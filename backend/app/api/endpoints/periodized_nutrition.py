@@ -86,6 +86,41 @@ def get_weekly_periodized_plan(
     return weekly_plan
 
 
+@router.get("/monthly", summary="获取一个月的周期化营养日历")
+def get_monthly_periodized_calendar(
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="年份，默认为今年"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="月份，默认为本月"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    获取一个月的周期化营养日历
+    包含每天的训练日/休息日状态和推荐值，以及按周排列的日历
+    """
+    today = date.today()
+    year = year or today.year
+    month = month or today.month
+
+    # 获取基础推荐
+    base_recommendation = RecommendationService.get_calorie_recommendation(
+        user=current_user,
+        db=db,
+        enable_auto_adjustment=True,
+        enable_periodized=True
+    )
+
+    # 获取月历
+    monthly_calendar = periodized_nutrition_service.get_monthly_periodized_calendar(
+        user=current_user,
+        year=year,
+        month=month,
+        base_recommendation=base_recommendation,
+        db=db
+    )
+
+    return monthly_calendar
+
+
 @router.get("/cycle-info", summary="获取月经周期信息（仅女性）")
 def get_menstrual_cycle_info(
     target_date: Optional[date] = Query(None, description="目标日期，默认为今天"),
@@ -10,7 +10,7 @@ from app.api import deps
 from app.db.session import get_db
 from app.models.user import User
 from app.crud.crud_user import user as crud_user
-from app.schemas.ranking import RankingResponse, RankingItem, UserRankingInfo
+from app.schemas.ranking import RankingResponse, RankingItem, UserRankingInfo, RankingHistogramResponse, RankingHistogramBucket, UserPercentileInfo
 from app.services.ranking_service import ranking_service
 
 router = APIRouter()
@@ -18,7 +18,7 @@ router = APIRouter()
 
 @router.get("/", response_model=RankingResponse)
 def get_rankings(
-    period: str = Query(..., description="排行榜周期: day, month, year", enum=["day", "month", "year"]),
+    period: str = Query(..., description="排行榜周期: day, month, year, last_7_days, last_30_days", enum=["day", "month", "year", "last_7_days", "last_30_days"]),
     identity: Optional[str] = Query(None, description="身份类型，不传则返回总榜", enum=["student", "office_worker", "flexible", "fitness_pro", "health_care"]),
     target_date: Optional[date] = Query(None, description="目标日期，格式: YYYY-MM-DD，不传则使用今天"),
     limit: int = Query(10, ge=1, le=100, description="返回数量，默认10"),
@@ -27,7 +27,7 @@ def get_rankings(
 ) -> Any:
     """
     获取排行榜
-    - period: 排行榜周期（日榜、月榜、年榜）
+    - period: 排行榜周期（日榜、月榜、年榜、近7天榜、近30天榜）
     - identity: 身份类型，不传则返回总榜
     - target_date: 目标日期，不传则使用今天
     - limit: 返回数量
@@ -89,7 +89,7 @@ def get_rankings(
 
 @router.get("/my-ranking", response_model=UserRankingInfo)
 def get_my_ranking(
-    period: str = Query(..., description="排行榜周期: day, month, year", enum=["day", "month", "year"]),
+    period: str = Query(..., description="排行榜周期: day, month, year, last_7_days, last_30_days", enum=["day", "month", "year", "last_7_days", "last_30_days"]),
     identity: Optional[str] = Query(None, description="身份类型，不传则返回总榜", enum=["student", "office_worker", "flexible", "fitness_pro", "health_care"]),
     target_date: Optional[date] = Query(None, description="目标日期，格式: YYYY-MM-DD，不传则使用今天"),
     db: Session = Depends(get_db),
@@ -120,3 +120,64 @@ def get_my_ranking(
             rank=None,
             calories=None
         )
+
+
+@router.get("/histogram", response_model=RankingHistogramResponse)
+def get_ranking_histogram(
+    period: str = Query(..., description="排行榜周期: day, month, year, last_7_days, last_30_days", enum=["day", "month", "year", "last_7_days", "last_30_days"]),
+    identity: Optional[str] = Query(None, description="身份类型，不传则返回总榜", enum=["student", "office_worker", "flexible", "fitness_pro", "health_care"]),
+    target_date: Optional[date] = Query(None, description="目标日期，格式: YYYY-MM-DD，不传则使用今天"),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    获取排行榜热量分布直方图
+    """
+    if target_date is None:
+        target_date = date.today()
+    
+    histogram = ranking_service.get_score_histogram(
+        period=period,
+        identity=identity,
+        target_date=target_date
+    )
+    
+    return RankingHistogramResponse(
+        buckets=[RankingHistogramBucket(**bucket) for bucket in histogram['buckets']],
+        total_users=histogram['total_users'],
+        bucket_kcal=histogram['bucket_kcal'],
+        period=period,
+        identity=identity,
+        target_date=target_date
+    )
+
+
+@router.get("/my-percentile", response_model=UserPercentileInfo)
+def get_my_percentile(
+    period: str = Query(..., description="排行榜周期: day, month, year, last_7_days, last_30_days", enum=["day", "month", "year", "last_7_days", "last_30_days"]),
+    identity: Optional[str] = Query(None, description="身份类型，不传则返回总榜", enum=["student", "office_worker", "flexible", "fitness_pro", "health_care"]),
+    target_date: Optional[date] = Query(None, description="目标日期，格式: YYYY-MM-DD，不传则使用今天"),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    获取当前用户击败了榜单中百分之多少的用户
+    """
+    if target_date is None:
+        target_date = date.today()
+    
+    user_percentile = ranking_service.get_user_percentile(
+        user_id=current_user.id,
+        period=period,
+        identity=identity,
+        target_date=target_date
+    )
+    
+    if user_percentile:
+        return UserPercentileInfo(
+            user_id=current_user.id,
+            calories=user_percentile['calories'],
+            percentile=user_percentile['percentile'],
+            total_users=user_percentile['total_users']
+        )
+    else:
+        return UserPercentileInfo(user_id=current_user.id)
+
@@ -8,6 +8,9 @@ from app.db.session import get_db
 from app.models.user import User
 from app.services.recommendation_service import RecommendationService
 from app.services.menu_generator import menu_generator
+from app.services.calorie_calculator import ProfileVector
+from app.services.recommendation_simulator import recommendation_simulator
+from app.schemas.simulation import RecommendationSimulationRequest, RecommendationSimulationResponse
 
 router = APIRouter()
 
@@ -55,4 +58,32 @@ def generate_ai_menu(
         except:
             continue
             
-    return None  # 或返回一个预设的保底菜单
\ No newline at end of file
+    return None  # 或返回一个预设的保底菜单
+
+
+@router.post("/simulate", response_model=RecommendationSimulationResponse, summary="批量模拟不同参数下的推荐（what-if）")
+def simulate_recommendations(
+    simulation_in: RecommendationSimulationRequest,
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    在基础资料（默认为当前用户资料）上展开参数网格，一次性计算所有组合的热量区间和宏量营养素
+    只做纯计算，不读取历史数据，也不会记录调整历史
+    """
+    # 枚举统一转换为字符串值
+    overrides = simulation_in.base_profile.model_dump(exclude_none=True, mode='json') if simulation_in.base_profile else {}
+    base_profile = ProfileVector.from_user(current_user)._replace(**overrides)
+
+    variations = simulation_in.variations.model_dump(exclude_none=True, mode='json')
+    scenario_count = recommendation_simulator.count_scenarios(variations)
+    if scenario_count > recommendation_simulator.max_scenarios:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many scenarios ({scenario_count}), the maximum is {recommendation_simulator.max_scenarios}.",
+        )
+
+    return recommendation_simulator.simulate(
+        base_profile,
+        variations,
+        prefer_katch_mcardle=simulation_in.prefer_katch_mcardle
+    )
@@ -9,10 +9,10 @@ from app.db.session import get_db
 from app.models.user import User
 from app.crud.crud_log import log
 from app.crud.crud_food import food
-from app.crud.crud_exercise import exercise
+from app.services.exercise_catalogue import exercise_catalogue
 from app.schemas import log as log_schema
 from app.services.tracking_service import tracking_service
-from app.services.ranking_service import ranking_service
+from app.services.ranking_buffer import ranking_write_buffer
 
 router = APIRouter()
 
@@ -43,26 +43,22 @@ def log_exercise_activity(
     """
     记录运动活动，并实时更新排行榜
     """
-    cur_exercise = exercise.get_exercise_by_id(db, exercise_id=log_in.exercise_id)
+    cur_exercise = exercise_catalogue.get(db, log_in.exercise_id)
     if not cur_exercise:
         raise HTTPException(status_code=404, detail="Exercise not found.")
 
     exercise_log = log.create_exercise_log(db, user_id=current_user.id, log_in=log_in)
     
-    # 实时更新排行榜
-    try:
-        calories = float(exercise_log.calories_burned)
-        user_identity = current_user.identity if hasattr(current_user, 'identity') else 'office_worker'
-        ranking_service.update_ranking(
-            user_id=current_user.id,
-            calories=calories,
-            user_identity=user_identity,
-            log_date=log_in.log_date
-        )
-    except Exception as e:
-        # 排行榜更新失败不应该影响运动记录的正常创建
-        # 可以记录日志，但不抛出异常
-        print(f"Failed to update ranking: {e}")
+    # 更新排行榜：先写入本地缓冲，由后台线程批量写入Redis
+    # Redis不可用时增量保留在本地，恢复后按运动记录ID幂等重放，不影响运动记录的正常创建
+    user_identity = current_user.identity if hasattr(current_user, 'identity') else 'office_worker'
+    ranking_write_buffer.record(
+        user_id=current_user.id,
+        calories=float(exercise_log.calories_burned),
+        user_identity=user_identity,
+        log_date=log_in.log_date,
+        exercise_log_id=exercise_log.id
+    )
     
     return exercise_log
 
@@ -0,0 +1,134 @@
+"""
+进程内缓存 - 短TTL缓存 + 单飞（single-flight）请求合并
+用于热点读请求：同一进程内相同Key的并发请求只会触发一次后端调用
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _InFlight:
+    """正在加载中的请求，其他等待者共享同一个结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    线程安全的TTL缓存
+    - 命中：直接返回缓存值
+    - 未命中：第一个请求负责加载，同时到达的相同请求等待并复用其结果
+    - serve_stale=True 时，加载失败会返回已过期的旧值（后端不可用时的降级快照）
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024, serve_stale: bool = False):
+        """
+        :param ttl_seconds: 缓存有效期（秒）
+        :param max_entries: 最大缓存条目数，超过后淘汰最早过期的条目
+        :param serve_stale: 加载失败时是否返回已过期的旧值
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.serve_stale = serve_stale
+        self._entries: Dict[Hashable, tuple] = {}  # key -> (过期时间, 值)
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+
+        # 统计指标
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.load_errors = 0
+        self.stale_hits = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，未命中时调用loader加载
+        :param key: 缓存Key
+        :param loader: 加载函数（无参数）
+        :return: 缓存值或新加载的值
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                # 已有相同请求在加载，等待其结果
+                self.coalesced += 1
+                is_leader = False
+            else:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self.misses += 1
+                is_leader = True
+
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+                self._inflight.pop(key, None)
+                stale = self._entries.get(key) if self.serve_stale else None
+                if stale is not None:
+                    self.stale_hits += 1
+            if stale is not None:
+                # 降级：返回旧值，等待者也共享旧值
+                flight.value = stale[1]
+                flight.event.set()
+                return stale[1]
+            flight.error = e
+            flight.event.set()
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            self._inflight.pop(key, None)
+        flight.value = value
+        flight.event.set()
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        """写入缓存（调用方需持有锁）"""
+        now = time.monotonic()
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            # 先清理已过期的条目（保留旧值作为降级快照时跳过），仍然超限则淘汰最早过期的条目
+            if not self.serve_stale:
+                expired = [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]
+                for k in expired:
+                    del self._entries[k]
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+        self._entries[key] = (now + self.ttl_seconds, value)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'load_errors': self.load_errors,
+                'stale_hits': self.stale_hits,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl_seconds
+            }
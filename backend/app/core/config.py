@@ -4,7 +4,8 @@ from typing import Optional
 
 # 使用os.path.join来构建.env文件的路径，确保跨平台兼容性
 # .env 文件应该位于 backend/ 目录下，与 app/ 目录同级
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+env_path = os.path.join(backend_dir, '.env')
 
 class Settings(BaseSettings):
     # Database settings
@@ -40,6 +41,26 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50  # 连接池最大连接数
+    REDIS_POOL_TIMEOUT: float = 2.0  # 连接池耗尽时等待空闲连接的最长时间（秒）
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # 空闲连接超过该时间（秒）后使用前先PING
+    REDIS_RETRY_ATTEMPTS: int = 3  # 连接错误/超时的重试次数
+    REDIS_RETRY_BACKOFF_BASE: float = 0.05  # 指数退避基数（秒）
+    REDIS_RETRY_BACKOFF_CAP: float = 0.5  # 指数退避上限（秒）
+
+    # Ranking settings
+    RANKING_TOP_CACHE_TTL_SECONDS: float = 2.0  # 进程内Top N排行榜缓存时间（秒）
+    RANKING_SPILL_DIR: str = os.path.join(backend_dir, 'var', 'ranking_spill')  # 排行榜写缓冲落盘目录
+    RANKING_BUFFER_BATCH_SIZE: int = 200  # 排行榜写缓冲每批写入Redis的记录数
+    RANKING_BUFFER_FLUSH_INTERVAL: float = 0.5  # 排行榜写缓冲写入间隔（秒）
+
+    # Dynamic adjustment settings
+    # lazy: 请求时评估并调整；batch: 由夜间批处理预先计算，请求时只查询已保存的调整结果
+    DYNAMIC_ADJUSTMENT_MODE: str = "lazy"
+    ADJUSTMENT_BATCH_CHUNK_SIZE: int = 200  # 批处理每个任务处理的用户数
+    ADJUSTMENT_BATCH_WORKERS: int = 4  # 批处理进程数
 
     class Config:
         env_file = env_path
@@ -27,6 +27,9 @@ class CRUDBodyMetrics:
         db.add(db_metrics)
         db.commit()
         db.refresh(db_metrics)
+        # 所有新增记录都要推进体重趋势（在函数内导入，避免与 weight_trend_service 循环导入）
+        from app.services.weight_trend_service import weight_trend_service
+        weight_trend_service.record_weight(db, user_id, db_metrics.record_date, db_metrics.weight_kg)
         return db_metrics
 
     def get_body_metrics_by_id(
@@ -66,6 +69,28 @@ class CRUDBodyMetrics:
             BodyMetrics.record_date <= end_date
         ).order_by(BodyMetrics.record_date.asc()).all()
 
+    def get_metric_columns(
+        self, 
+        db: Session, 
+        *, 
+        user_id: int, 
+        start_date: date, 
+        end_date: date
+    ) -> List[Tuple[date, Optional[Decimal], Optional[Decimal]]]:
+        """
+        获取指定日期范围内的体重/体脂率（只查询需要的列，不加载ORM对象）
+        返回: [(record_date, weight_kg, body_fat_pct), ...]，按日期升序
+        """
+        return db.query(
+            BodyMetrics.record_date,
+            BodyMetrics.weight_kg,
+            BodyMetrics.body_fat_pct
+        ).filter(
+            BodyMetrics.user_id == user_id,
+            BodyMetrics.record_date >= start_date,
+            BodyMetrics.record_date <= end_date
+        ).order_by(BodyMetrics.record_date.asc()).all()
+
     def get_weight_history(
         self, 
         db: Session, 
@@ -77,23 +102,7 @@ class CRUDBodyMetrics:
         获取体重历史记录（最近N周）
         返回: [(date, weight_kg), ...]
         """
-        end_date = date.today()
-        start_date = end_date - timedelta(weeks=weeks)
-        
-        metrics = self.get_body_metrics_by_user_and_date_range(
-            db, 
-            user_id=user_id, 
-            start_date=start_date, 
-            end_date=end_date
-        )
-        
-        # 只返回有体重数据的记录
-        history = []
-        for m in metrics:
-            if m.weight_kg:
-                history.append((m.record_date, float(m.weight_kg)))
-        
-        return history
+        return self._get_value_history(db, BodyMetrics.weight_kg, user_id=user_id, weeks=weeks)
 
     def get_body_fat_history(
         self, 
@@ -106,23 +115,31 @@ class CRUDBodyMetrics:
         获取体脂率历史记录（最近N周）
         返回: [(date, body_fat_pct), ...]
         """
+        return self._get_value_history(db, BodyMetrics.body_fat_pct, user_id=user_id, weeks=weeks)
+
+    def _get_value_history(
+        self, 
+        db: Session, 
+        column, 
+        *, 
+        user_id: int, 
+        weeks: int
+    ) -> List[Tuple[date, float]]:
+        """只查询日期和指定列，且只返回有数据（非空且大于0）的记录"""
         end_date = date.today()
         start_date = end_date - timedelta(weeks=weeks)
         
-        metrics = self.get_body_metrics_by_user_and_date_range(
-            db, 
-            user_id=user_id, 
-            start_date=start_date, 
-            end_date=end_date
-        )
-        
-        # 只返回有体脂率数据的记录
-        history = []
-        for m in metrics:
-            if m.body_fat_pct:
-                history.append((m.record_date, float(m.body_fat_pct)))
+        rows = db.query(
+            BodyMetrics.record_date,
+            column
+        ).filter(
+            BodyMetrics.user_id == user_id,
+            BodyMetrics.record_date >= start_date,
+            BodyMetrics.record_date <= end_date,
+            column > 0
+        ).order_by(BodyMetrics.record_date.asc()).all()
         
-        return history
+        return [(record_date, float(value)) for record_date, value in rows]
 
     def get_latest_body_metrics(
         self, 
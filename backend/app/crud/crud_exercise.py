@@ -11,5 +11,9 @@ class CRUDExercise:
         """列出所有运动项目"""
         return db.query(Exercise).offset(skip).limit(limit).all()
 
+    def get_all_exercise_columns(self, db: Session) -> List:
+        """获取所有运动项目的ID、名称和MET值（只查询需要的列）"""
+        return db.query(Exercise.id, Exercise.name, Exercise.met_value).all()
+
 # 创建一个实例以便全局使用
 exercise = CRUDExercise()
@@ -79,6 +79,7 @@ class CRUDFood:
         db_obj = Food(**obj_in_data)
         db.add(db_obj)
         db.commit()
+        # 营养标签由 foods 表的 BEFORE INSERT 触发器计算，refresh 后读回
         db.refresh(db_obj)
         return db_obj
 
@@ -1,6 +1,8 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 from datetime import date
-from typing import List
+from decimal import Decimal
+from typing import List, Optional, Tuple
 
 from app.models.log import UserFoodLog, UserExerciseLog
 from app.models.food import Food
@@ -46,6 +48,17 @@ class CRUDLog:
             UserFoodLog.log_date <= end_date
         ).all()
 
+    def get_daily_food_calorie_totals(self, db: Session, *, user_id: int, start_date: date, end_date: date) -> List[Tuple[date, Optional[Decimal]]]:
+        """按日期汇总指定用户在日期范围内的饮食热量（数据库端GROUP BY），返回: [(log_date, total_calories), ...]"""
+        return db.query(
+            UserFoodLog.log_date,
+            func.sum(UserFoodLog.total_calories)
+        ).filter(
+            UserFoodLog.user_id == user_id,
+            UserFoodLog.log_date >= start_date,
+            UserFoodLog.log_date <= end_date
+        ).group_by(UserFoodLog.log_date).order_by(UserFoodLog.log_date.asc()).all()
+
     def create_exercise_log(self, db: Session, *, user_id: int, log_in: ExerciseLogCreate) -> UserExerciseLog:
         """创建一条新的运动记录"""
         db_log = UserExerciseLog(
@@ -75,5 +88,32 @@ class CRUDLog:
             UserExerciseLog.log_date <= end_date
         ).all()
 
+    def get_daily_exercise_minutes(self, db: Session, *, user_id: int, start_date: date, end_date: date) -> List[Tuple[date, int]]:
+        """按日期汇总指定用户在日期范围内的运动时长（数据库端GROUP BY），返回: [(log_date, total_minutes), ...]"""
+        return db.query(
+            UserExerciseLog.log_date,
+            func.sum(UserExerciseLog.duration_minutes)
+        ).filter(
+            UserExerciseLog.user_id == user_id,
+            UserExerciseLog.log_date >= start_date,
+            UserExerciseLog.log_date <= end_date
+        ).group_by(UserExerciseLog.log_date).all()
+
+    def get_exercise_log_columns(self, db: Session, *, user_id: int, start_date: date, end_date: date) -> List[Tuple[date, int, int, Decimal]]:
+        """
+        获取指定用户和日期范围内运动记录的分析所需列（不加载ORM对象，运动信息从运动目录查表）
+        返回: [(log_date, exercise_id, duration_minutes, calories_burned), ...]，按日期升序
+        """
+        return db.query(
+            UserExerciseLog.log_date,
+            UserExerciseLog.exercise_id,
+            UserExerciseLog.duration_minutes,
+            UserExerciseLog.calories_burned
+        ).filter(
+            UserExerciseLog.user_id == user_id,
+            UserExerciseLog.log_date >= start_date,
+            UserExerciseLog.log_date <= end_date
+        ).order_by(UserExerciseLog.log_date.asc()).all()
+
 # 创建一个实例以便全局使用
 log = CRUDLog()
\ No newline at end of file
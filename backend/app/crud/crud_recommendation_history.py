@@ -1,8 +1,10 @@
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
 from typing import List, Optional
 
 from app.models.recommendation_history import RecommendationHistory
+from app.models.user import User
 from app.schemas.recommendation_history import RecommendationHistoryCreate
 
 
@@ -88,6 +90,43 @@ class CRUDRecommendationHistory:
             RecommendationHistory.adjustment_date.desc()
         ).first()
 
+    def get_latest_adjustment_date(
+        self, 
+        db: Session, 
+        *, 
+        user_id: int
+    ) -> Optional[date]:
+        """获取用户最近一次推荐调整的日期（只查询日期列）"""
+        return db.query(
+            func.max(RecommendationHistory.adjustment_date)
+        ).filter(
+            RecommendationHistory.user_id == user_id
+        ).scalar()
+
+    def get_user_ids_due_for_adjustment(
+        self, 
+        db: Session, 
+        *, 
+        min_interval_days: int,
+        today: Optional[date] = None
+    ) -> List[int]:
+        """
+        获取需要重新评估推荐的用户ID（从未调整过，或距最近一次调整已超过最小间隔）
+        按最近调整日期分组后与用户表做一次LEFT JOIN
+        """
+        cutoff_date = (today or date.today()) - timedelta(days=min_interval_days)
+        latest = db.query(
+            RecommendationHistory.user_id.label('user_id'),
+            func.max(RecommendationHistory.adjustment_date).label('latest_date')
+        ).group_by(RecommendationHistory.user_id).subquery()
+
+        rows = db.query(User.id).outerjoin(
+            latest, latest.c.user_id == User.id
+        ).filter(
+            or_(latest.c.latest_date.is_(None), latest.c.latest_date <= cutoff_date)
+        ).order_by(User.id.asc()).all()
+        return [row[0] for row in rows]
+
     def get_adjustment_count_since(
         self, 
         db: Session, 
@@ -1,17 +1,117 @@
+import threading
+
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+from redis.retry import Retry
+from typing import Any, Dict
+
 from app.core.config import settings
 
+# 连接失败/超时时重试（指数退避），其他错误直接抛出
+RETRY_ON_ERROR = [ConnectionError, TimeoutError]
+
+
+def _connection_kwargs() -> Dict[str, Any]:
+    """连接参数"""
+    return {
+        'host': settings.REDIS_HOST,
+        'port': settings.REDIS_PORT,
+        'db': settings.REDIS_DB,
+        'password': settings.REDIS_PASSWORD,
+        'decode_responses': True,  # 自动解码响应为字符串
+        'socket_connect_timeout': settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        'socket_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'health_check_interval': settings.REDIS_HEALTH_CHECK_INTERVAL,
+        'retry_on_error': RETRY_ON_ERROR,
+    }
+
+
+def _backoff() -> ExponentialBackoff:
+    return ExponentialBackoff(
+        cap=settings.REDIS_RETRY_BACKOFF_CAP,
+        base=settings.REDIS_RETRY_BACKOFF_BASE
+    )
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    统计连接使用情况的连接池
+    只重写 redis-py 的公开方法（get_connection / release / make_connection / reset）计数，
+    不读取连接池的内部属性，升级 redis-py 后统计不会静默失效
+    """
+
+    def __init__(self, *args, **kwargs):
+        # 父类构造函数会调用 reset()，计数器需要先初始化
+        self._stats_lock = threading.Lock()
+        self.in_use = 0
+        self.created = 0
+        self.peak_in_use = 0
+        super().__init__(*args, **kwargs)
+
+    def reset(self):
+        super().reset()
+        # 连接全部丢弃（如fork后），计数归零
+        with self._stats_lock:
+            self.in_use = 0
+            self.created = 0
+
+    def make_connection(self):
+        connection = super().make_connection()
+        with self._stats_lock:
+            self.created += 1
+        return connection
+
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        with self._stats_lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        with self._stats_lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池使用情况"""
+        with self._stats_lock:
+            in_use = self.in_use
+            created = max(self.created, in_use)
+            peak_in_use = self.peak_in_use
+        return {
+            'max_connections': self.max_connections,
+            'in_use': in_use,
+            'idle': created - in_use,
+            'created': created,
+            'peak_in_use': peak_in_use,
+            'utilization': round(in_use / self.max_connections, 4) if self.max_connections else 0.0
+        }
+
+
 # 创建Redis连接池
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-    password=settings.REDIS_PASSWORD,
-    decode_responses=True,  # 自动解码响应为字符串
-    socket_connect_timeout=5,
-    socket_timeout=5
+# BlockingConnectionPool: 连接数达到上限时最多等待 REDIS_POOL_TIMEOUT 秒，而不是无限创建新连接
+redis_pool = InstrumentedConnectionPool(
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT,
+    retry=Retry(_backoff(), settings.REDIS_RETRY_ATTEMPTS),
+    **_connection_kwargs()
 )
 
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+
 def get_redis() -> redis.Redis:
     """获取Redis客户端实例"""
     return redis_client
+
+
+def close_redis():
+    """关闭Redis连接池（应用关闭时调用）"""
+    redis_pool.disconnect()
+
+
+def get_redis_pool_stats() -> Dict[str, Any]:
+    """获取连接池的使用情况"""
+    return redis_pool.stats()
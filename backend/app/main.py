@@ -1,8 +1,13 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.db.redis_client import get_redis, get_redis_pool_stats, close_redis
+from app.services.ranking_buffer import ranking_write_buffer
+from app.services.ranking_service import ranking_service
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
@@ -32,15 +37,38 @@ def read_root():
     """
     return {"message": "Welcome to the Nutri-Plan!"}
 
+
+@app.get("/health/redis", tags=["Root"])
+def redis_health():
+    """
+    Redis健康检查，返回连通性、连接池使用情况、排行榜写缓冲状态和排行榜进程内缓存统计（当前工作进程）。
+    """
+    try:
+        available = bool(get_redis().ping())
+    except Exception:
+        available = False
+    return {
+        "available": available,
+        "pool": get_redis_pool_stats(),
+        "ranking_write_buffer": ranking_write_buffer.stats(),
+        "ranking_cache": {
+            "top_rankings": ranking_service.get_cache_stats(),
+            "user_ranking_snapshot": ranking_service.get_user_ranking_snapshot_stats()
+        }
+    }
+
 # --- 包含主API路由 ---
 # 将所有在 api_router 中定义的路由包含进来，并添加统一的前缀 /api
 app.include_router(api_router, prefix="/api")
 
-# --- 应用启动时的附加逻辑 (可选) ---
-# @app.on_event("startup")
-# async def startup_event():
-#     print("Application is starting up...")
+# --- 应用启动/关闭时的附加逻辑 ---
+@app.on_event("startup")
+async def startup_event():
+    # 启动排行榜写缓冲（恢复上次未写入Redis的落盘数据）
+    ranking_write_buffer.start()
 
-# @app.on_event("shutdown")
-# async def shutdown_event():
-#     print("Application is shutting down...")
+@app.on_event("shutdown")
+async def shutdown_event():
+    # stop() 会等待后台线程写完剩余增量，放到线程中执行，避免阻塞事件循环
+    await asyncio.to_thread(ranking_write_buffer.stop)
+    close_redis()
@@ -42,9 +42,23 @@ class BodyMetricsTrend(BaseModel):
     body_fat_pct: Optional[float] = None
     weight_change_kg: Optional[float] = None  # 相对于上次的变化
     body_fat_change_pct: Optional[float] = None  # 相对于上次的变化
+    weight_ema_kg: Optional[float] = None  # 体重指数移动平均（平滑趋势）
+
+
+class WeightTrendState(BaseModel):
+    """平滑体重趋势"""
+    level_kg: float  # 平滑后的当前体重
+    slope_kg_per_week: float  # 平滑后的体重变化速度
+    last_date: date  # 最后一条体重记录的日期
+    count: int  # 参与计算的体重记录数
+    span_days: int  # 参与计算的记录覆盖的天数
+    established: bool  # 记录数和覆盖天数是否足够，不足时斜率仅供参考
 
 
 class BodyMetricsTrendResponse(BaseModel):
     """身体指标趋势响应"""
     data: List[BodyMetricsTrend]
     total_records: int
+    resolution: str = 'raw'  # raw / week / month / lttb（降采样方式）
+    source_records: Optional[int] = None  # 降采样前的原始记录数
+    weight_trend: Optional[WeightTrendState] = None  # 当前的平滑体重趋势
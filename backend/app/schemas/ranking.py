@@ -32,9 +32,34 @@ class RankingResponse(BaseModel):
     """排行榜响应"""
     rankings: List[RankingItem]
     user_ranking: Optional[UserRankingInfo] = None
-    period: str  # 'day', 'month', 'year'
+    period: str  # 'day', 'month', 'year', 'last_7_days', 'last_30_days'
     identity: Optional[str] = None  # None表示总榜
     target_date: date
 
     class Config:
         from_attributes = True
+
+
+class RankingHistogramBucket(BaseModel):
+    """排行榜分布直方图单个桶"""
+    min_kcal: float
+    max_kcal: Optional[float] = None  # None表示没有上界（最后一个桶）
+    count: int
+
+
+class RankingHistogramResponse(BaseModel):
+    """排行榜分布直方图响应"""
+    buckets: List[RankingHistogramBucket]
+    total_users: int
+    bucket_kcal: float
+    period: str
+    identity: Optional[str] = None
+    target_date: date
+
+
+class UserPercentileInfo(BaseModel):
+    """用户百分位信息"""
+    user_id: int
+    calories: Optional[float] = None
+    percentile: Optional[float] = None  # 击败了榜单中百分之多少的用户，None表示不在榜上
+    total_users: int = 0
@@ -0,0 +1,43 @@
+"""
+推荐模拟（what-if）相关的Schema定义
+"""
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+
+from app.schemas.user import ActivityLevelEnum, GenderEnum, GoalEnum, TrainingExperienceEnum
+
+
+class SimulationProfile(BaseModel):
+    """基础资料（未提供的字段使用当前用户的资料）"""
+    gender: Optional[GenderEnum] = None
+    age: Optional[int] = Field(None, ge=10, le=100)
+    height_cm: Optional[float] = Field(None, gt=0, le=260)
+    weight_kg: Optional[float] = Field(None, gt=0, le=400)
+    body_fat_pct: Optional[float] = Field(None, ge=0, le=70)
+    activity_level: Optional[ActivityLevelEnum] = None
+    goal: Optional[GoalEnum] = None
+    training_experience: Optional[TrainingExperienceEnum] = None
+
+
+class SimulationGrid(BaseModel):
+    """参数变化网格（每个字段提供候选值列表，所有组合都会被计算；未提供的字段保持基础资料的值）"""
+    goal: Optional[List[GoalEnum]] = None
+    activity_level: Optional[List[ActivityLevelEnum]] = None
+    body_fat_pct: Optional[List[Optional[float]]] = None
+    weight_kg: Optional[List[float]] = None
+    training_experience: Optional[List[TrainingExperienceEnum]] = None
+
+
+class RecommendationSimulationRequest(BaseModel):
+    """推荐模拟请求"""
+    base_profile: Optional[SimulationProfile] = None
+    variations: SimulationGrid
+    prefer_katch_mcardle: bool = True
+
+
+class RecommendationSimulationResponse(BaseModel):
+    """推荐模拟结果（紧凑表格：columns 为列名，rows 中每一行对应一个场景）"""
+    scenario_count: int
+    columns: List[str]
+    rows: List[List[Any]]
+    elapsed_ms: float
@@ -0,0 +1,169 @@
+"""
+动态调整批处理服务
+夜间离线运行：找出到期需要重新评估的用户，按块分发到进程池中评估，
+并将调整结果写入 recommendation_adjustments，请求时只需查询（DYNAMIC_ADJUSTMENT_MODE=batch）
+
+运行方式（在 backend/ 目录下）:
+    python -m app.services.adjustment_batch_service --workers 4 --chunk-size 200
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.crud.crud_recommendation_history import recommendation_history
+from app.db.session import SessionLocal, engine
+from app.models.user import User
+from app.services.dynamic_adjustment_service import dynamic_adjustment_service
+from app.services.recommendation_service import RecommendationService
+
+
+def _init_worker():
+    """
+    子进程初始化：丢弃从父进程继承的连接池
+    fork出来的进程不能复用父进程的数据库连接，close=False 只丢弃引用而不关闭父进程的连接
+    """
+    engine.dispose(close=False)
+
+
+def _process_chunk(user_ids: List[int]) -> Dict:
+    """
+    在子进程中评估一块用户
+    :param user_ids: 用户ID列表
+    :return: 该块的统计信息
+    """
+    started_at = time.perf_counter()
+    adjusted = 0
+    skipped = 0
+    errors = 0
+
+    db = SessionLocal()
+    try:
+        users = db.query(User).filter(User.id.in_(user_ids)).all()
+        skipped += len(user_ids) - len(users)
+        for user in users:
+            try:
+                base_recommendation = RecommendationService.get_base_recommendation(user)
+                if base_recommendation.recommended_kcal == 0:
+                    skipped += 1  # 资料不完整，无法计算
+                    continue
+
+                new_recommendation = dynamic_adjustment_service.evaluate_and_adjust(
+                    user=user,
+                    db=db,
+                    current_recommendation=base_recommendation
+                )
+                if new_recommendation is not base_recommendation:
+                    adjusted += 1
+            except Exception as e:
+                errors += 1
+                db.rollback()
+                logging.warning(f"Batch adjustment failed for user {user.id}: {e}")
+    finally:
+        db.close()
+
+    return {
+        'users': len(user_ids),
+        'adjusted': adjusted,
+        'skipped': skipped,
+        'errors': errors,
+        'seconds': time.perf_counter() - started_at
+    }
+
+
+class AdjustmentBatchService:
+    """动态调整批处理"""
+
+    def __init__(self, chunk_size: int = 200, workers: int = 4):
+        """
+        :param chunk_size: 每个任务处理的用户数
+        :param workers: 进程数（<=1 时在当前进程中顺序执行）
+        """
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def find_due_user_ids(self) -> List[int]:
+        """获取到期需要重新评估的用户ID"""
+        db = SessionLocal()
+        try:
+            return recommendation_history.get_user_ids_due_for_adjustment(
+                db,
+                min_interval_days=dynamic_adjustment_service.min_adjustment_interval_days
+            )
+        finally:
+            db.close()
+
+    def run(self, user_ids: Optional[List[int]] = None) -> Dict:
+        """
+        执行批处理
+        :param user_ids: 指定要评估的用户ID，默认评估所有到期用户
+        :return: 汇总统计信息
+        """
+        started_at = time.perf_counter()
+        if user_ids is None:
+            user_ids = self.find_due_user_ids()
+        chunks = [user_ids[i:i + self.chunk_size] for i in range(0, len(user_ids), self.chunk_size)]
+        logging.info(f"Adjustment batch: {len(user_ids)} due users in {len(chunks)} chunks, {self.workers} workers")
+
+        totals = {'users': 0, 'adjusted': 0, 'skipped': 0, 'errors': 0, 'chunks': len(chunks)}
+
+        if self.workers <= 1 or len(chunks) <= 1:
+            for index, chunk in enumerate(chunks):
+                self._report_chunk(index, _process_chunk(chunk), totals)
+        else:
+            # 父进程先释放连接，避免子进程继承正在使用的连接
+            engine.dispose()
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+                futures = {executor.submit(_process_chunk, chunk): index for index, chunk in enumerate(chunks)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"Adjustment batch: chunk {index} failed: {e}")
+                        totals['errors'] += len(chunks[index])
+                        continue
+                    self._report_chunk(index, result, totals)
+
+        elapsed = time.perf_counter() - started_at
+        totals['seconds'] = round(elapsed, 2)
+        totals['users_per_second'] = round(totals['users'] / elapsed, 1) if elapsed > 0 else 0.0
+        logging.info(
+            f"Adjustment batch finished: {totals['users']} users, {totals['adjusted']} adjusted, "
+            f"{totals['skipped']} skipped, {totals['errors']} errors in {elapsed:.1f}s "
+            f"({totals['users_per_second']} users/s)"
+        )
+        return totals
+
+    @staticmethod
+    def _report_chunk(index: int, result: Dict, totals: Dict):
+        """记录单个块的吞吐量，并累加到汇总统计"""
+        seconds = result['seconds']
+        throughput = result['users'] / seconds if seconds > 0 else 0.0
+        logging.info(
+            f"Adjustment batch: chunk {index} processed {result['users']} users "
+            f"({result['adjusted']} adjusted, {result['skipped']} skipped, {result['errors']} errors) "
+            f"in {seconds:.2f}s, {throughput:.1f} users/s"
+        )
+        for key in ('users', 'adjusted', 'skipped', 'errors'):
+            totals[key] += result[key]
+
+
+# 创建全局实例
+adjustment_batch_service = AdjustmentBatchService(
+    chunk_size=settings.ADJUSTMENT_BATCH_CHUNK_SIZE,
+    workers=settings.ADJUSTMENT_BATCH_WORKERS
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    parser = argparse.ArgumentParser(description="夜间批量评估并保存动态调整结果")
+    parser.add_argument('--workers', type=int, default=settings.ADJUSTMENT_BATCH_WORKERS, help='进程数')
+    parser.add_argument('--chunk-size', type=int, default=settings.ADJUSTMENT_BATCH_CHUNK_SIZE, help='每块用户数')
+    args = parser.parse_args()
+
+    AdjustmentBatchService(chunk_size=args.chunk_size, workers=args.workers).run()
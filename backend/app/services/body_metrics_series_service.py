@@ -0,0 +1,320 @@
+"""
+身体指标时间序列服务
+只查询日期/体重/体脂率三列，以列式数组计算趋势，并在服务端降采样（周/月均值、LTTB），
+无论历史记录有多长，趋势图返回的数据点数量都有上限；平滑序列（EMA）按用户缓存
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.crud.crud_body_metrics import body_metrics
+from app.db.redis_client import get_redis
+
+
+def _to_float_array(values) -> np.ndarray:
+    """将可能包含None/Decimal的序列转换为float数组（None -> NaN）"""
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def bucket_starts(dates: np.ndarray, period: str) -> np.ndarray:
+    """
+    计算每个日期所在分组的起始日期
+    :param dates: datetime64[D] 数组
+    :param period: 'week'（周一开始）或 'month'
+    :return: datetime64[D] 数组
+    """
+    if period == 'week':
+        days = dates.astype(np.int64)
+        # 1970-01-01 是周四，(days + 3) % 7 为距本周一的天数
+        return (days - (days + 3) % 7).astype('datetime64[D]')
+    if period == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Invalid period: {period}")
+
+
+def downsample_mean(
+    dates: np.ndarray,
+    columns: Dict[str, np.ndarray],
+    period: str
+) -> Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+    """
+    按周/月分组求均值（忽略NaN，分组内没有有效值时为NaN）
+    :param dates: 按日期升序排列的 datetime64[D] 数组
+    :param columns: {列名: 与dates等长的数值数组}
+    :param period: 'week' 或 'month'
+    :return: (分组起始日期, {列名: 分组均值}, 每组最后一条记录的下标)
+    """
+    keys = bucket_starts(dates, period)
+    buckets, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    last_index = np.append(first_index[1:] - 1, len(dates) - 1) if len(dates) else first_index
+
+    means = {}
+    for name, values in columns.items():
+        valid = ~np.isnan(values)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(buckets))
+        counts = np.bincount(inverse[valid], minlength=len(buckets))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[name] = np.where(counts > 0, sums / counts, np.nan)
+    return buckets, means, last_index
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，保留曲线形状
+    :param x: 横坐标（升序）
+    :param y: 纵坐标（不含NaN）
+    :param threshold: 目标点数
+    :return: 选中点的下标（升序，包含首尾两点）
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # 除首尾两点外，其余点平均分成 threshold-2 个桶
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # 下一个桶的平均点（最后一个桶使用末尾点）
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        # 与上一个选中点、下一个桶平均点构成的三角形面积最大的点
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def exponential_moving_average(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均（alpha = 2 / (span + 1)）
+    NaN不参与计算，对应位置沿用上一个平滑值；第一个有效值之前为NaN
+    """
+    alpha = 2.0 / (span + 1)
+    result = np.full(len(values), np.nan)
+    current = None
+    for index, value in enumerate(values.tolist()):
+        if value == value:  # 非NaN
+            current = value if current is None else current + alpha * (value - current)
+        if current is not None:
+            result[index] = current
+    return result
+
+
+def changes_from_previous(values: np.ndarray) -> np.ndarray:
+    """每个有效值相对于上一个有效值的变化（第一个有效值和缺失值为NaN）"""
+    changes = np.full(len(values), np.nan)
+    positions = np.flatnonzero(~np.isnan(values))
+    if len(positions) > 1:
+        changes[positions[1:]] = np.diff(values[positions])
+    return changes
+
+
+class BodyMetricsSeriesService:
+    """身体指标时间序列服务"""
+
+    RESOLUTIONS = ['auto', 'raw', 'week', 'month', 'lttb']
+
+    SERIES_CACHE_TTL = 300
+    # 版本号Key的过期时间需远大于缓存时间：版本号过期归零时，旧版本的缓存条目早已过期
+    VERSION_TTL = 24 * 3600
+
+    def __init__(self, ema_span: int = 7):
+        """
+        :param ema_span: EMA平滑跨度（记录数）
+        """
+        self.ema_span = ema_span
+        self.redis_client = get_redis()
+        # 趋势序列缓存：(用户ID, 数据版本, 开始日期, 结束日期, 分辨率, 最大点数) -> 序列
+        # 数据版本号保存在Redis中，任一工作进程写入后所有进程的旧缓存都会失效
+        self._series_cache = TTLCache(ttl_seconds=self.SERIES_CACHE_TTL, max_entries=2000)
+
+    def _get_version_key(self, user_id: int) -> str:
+        """生成用户身体指标数据版本号的Redis Key"""
+        return f"bm:ver:{user_id}"
+
+    def invalidate(self, user_id: int):
+        """用户身体指标发生变化后调用，递增数据版本号，使所有进程中该用户的缓存序列失效"""
+        key = self._get_version_key(user_id)
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.incr(key)
+            pipeline.expire(key, self.VERSION_TTL)
+            pipeline.execute()
+        except Exception as e:
+            logging.warning(f"Body metrics version bump failed for user {user_id}: {e}")
+
+    def load_series(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: date,
+        end_date: date
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        加载原始时间序列（只查询三列）
+        :return: (日期, 体重, 体脂率)，缺失值和0为NaN
+        """
+        rows = body_metrics.get_metric_columns(
+            db,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+        weights = _to_float_array([row[1] for row in rows])
+        body_fat = _to_float_array([row[2] for row in rows])
+        # 与逐条判断 `if m.weight_kg` 的规则一致：0视为没有数据
+        weights[weights == 0] = np.nan
+        body_fat[body_fat == 0] = np.nan
+        return dates, weights, body_fat
+
+    def get_trend_series(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: date,
+        end_date: date,
+        resolution: str = 'auto',
+        max_points: int = 200
+    ) -> Dict:
+        """
+        获取趋势序列（按用户缓存）
+
+        :param db: 数据库会话
+        :param user_id: 用户ID
+        :param start_date: 开始日期
+        :param end_date: 结束日期
+        :param resolution: raw（原始记录）、week/month（分组均值）、lttb（按形状降采样）、
+                           auto（原始记录超过max_points时依次尝试周、月均值，仍超过时再用LTTB）
+        :param max_points: auto/lttb 模式下返回的最大点数
+        :return: {'resolution', 'source_records', 'dates', 'weight_kg', 'body_fat_pct', 'weight_ema_kg'}
+        """
+        if resolution not in self.RESOLUTIONS:
+            raise ValueError(f"Invalid resolution: {resolution}")
+
+        try:
+            version = int(self.redis_client.get(self._get_version_key(user_id)) or 0)
+        except Exception as e:
+            # 无法确认数据版本时不使用缓存，直接从数据库计算
+            logging.warning(f"Body metrics version read failed for user {user_id}, skipping cache: {e}")
+            return self._build_trend_series(db, user_id, start_date, end_date, resolution, max_points)
+
+        key = (user_id, version, start_date, end_date, resolution, max_points)
+        return self._series_cache.get_or_load(
+            key,
+            lambda: self._build_trend_series(db, user_id, start_date, end_date, resolution, max_points)
+        )
+
+    def get_trend_rows(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: date,
+        end_date: date,
+        resolution: str = 'auto',
+        max_points: int = 200
+    ) -> Dict:
+        """
+        获取趋势表（每个点附带相对上一个点的变化）
+        :return: {'resolution', 'source_records', 'rows': [{record_date, weight_kg, body_fat_pct,
+                  weight_change_kg, body_fat_change_pct, weight_ema_kg}, ...]}
+        """
+        series = self.get_trend_series(db, user_id, start_date, end_date, resolution, max_points)
+        weight_changes = changes_from_previous(series['weight_kg'])
+        body_fat_changes = changes_from_previous(series['body_fat_pct'])
+
+        def to_optional(values: np.ndarray) -> List[Optional[float]]:
+            return [None if value != value else value for value in values.tolist()]
+
+        rows = [
+            {
+                'record_date': record_date,
+                'weight_kg': weight,
+                'body_fat_pct': body_fat,
+                'weight_change_kg': weight_change,
+                'body_fat_change_pct': body_fat_change,
+                'weight_ema_kg': weight_ema
+            }
+            for record_date, weight, body_fat, weight_change, body_fat_change, weight_ema in zip(
+                series['dates'].tolist(),
+                to_optional(series['weight_kg']),
+                to_optional(series['body_fat_pct']),
+                to_optional(weight_changes),
+                to_optional(body_fat_changes),
+                to_optional(series['weight_ema_kg'])
+            )
+        ]
+        return {
+            'resolution': series['resolution'],
+            'source_records': series['source_records'],
+            'rows': rows
+        }
+
+    def _build_trend_series(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: date,
+        end_date: date,
+        resolution: str,
+        max_points: int
+    ) -> Dict:
+        dates, weights, body_fat = self.load_series(db, user_id, start_date, end_date)
+        weight_ema = exponential_moving_average(weights, self.ema_span)
+        source_records = len(dates)
+
+        if resolution == 'auto':
+            resolution = 'raw'
+            if source_records > max_points:
+                for period in ('week', 'month'):
+                    resolution = period
+                    if len(np.unique(bucket_starts(dates, period))) <= max_points:
+                        break
+
+        if resolution in ('week', 'month'):
+            dates, means, last_index = downsample_mean(
+                dates, {'weight_kg': weights, 'body_fat_pct': body_fat}, resolution
+            )
+            weights, body_fat = means['weight_kg'], means['body_fat_pct']
+            # 分组的平滑值取该组最后一条记录处的EMA
+            weight_ema = weight_ema[last_index]
+
+        if len(dates) > max_points and resolution != 'raw':
+            # 按体重曲线（没有体重数据时按体脂率曲线）的形状选点
+            shape = weights if not np.all(np.isnan(weights)) else body_fat
+            valid = np.flatnonzero(~np.isnan(shape))
+            keep = valid[lttb_indices(dates[valid].astype(np.int64), shape[valid], max_points)]
+            dates, weights, body_fat, weight_ema = dates[keep], weights[keep], body_fat[keep], weight_ema[keep]
+            resolution = 'lttb' if resolution == 'lttb' else f"{resolution}+lttb"
+
+        return {
+            'resolution': resolution,
+            'source_records': source_records,
+            'dates': dates.astype(object),
+            'weight_kg': weights,
+            'body_fat_pct': body_fat,
+            'weight_ema_kg': weight_ema
+        }
+
+
+# 创建全局实例
+body_metrics_series_service = BodyMetricsSeriesService()
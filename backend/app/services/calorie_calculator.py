@@ -1,4 +1,7 @@
 from datetime import date
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Union
+
 from app.models.user import User
 
 
@@ -18,44 +21,85 @@ def calculate_age(birthdate: date) -> int:
     today = date.today()
     return today.year - birthdate.year - ((today.month, today.day) < (birthdate.month, birthdate.day))
 
-def calculate_bmr_mifflin_st_jeor(user: User) -> float:
+class ProfileVector(NamedTuple):
+    """
+    热量/营养素计算所需的用户资料
+    不可变、可哈希，可作为缓存Key，也可以脱离数据库会话使用（批处理、模拟计算）
+    """
+    gender: Optional[str]
+    age: Optional[int]  # 没有出生日期时为None
+    height_cm: Optional[float]
+    weight_kg: Optional[float]
+    body_fat_pct: Optional[float]
+    activity_level: Optional[str]
+    goal: Optional[str]
+    training_experience: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> 'ProfileVector':
+        """从用户对象构建（年龄只计算一次，DECIMAL字段只转换一次）"""
+        def to_float(value) -> Optional[float]:
+            return float(value) if value is not None else None
+
+        birthdate = getattr(user, 'birthdate', None)
+        return cls(
+            gender=user.gender,
+            age=calculate_age(birthdate) if birthdate else None,
+            height_cm=to_float(user.height_cm),
+            weight_kg=to_float(user.weight_kg),
+            body_fat_pct=to_float(getattr(user, 'body_fat_pct', None)),
+            activity_level=user.activity_level,
+            goal=user.goal,
+            training_experience=getattr(user, 'training_experience', None)
+        )
+
+
+def as_profile(user: Union[User, ProfileVector]) -> ProfileVector:
+    """将用户对象转换为 ProfileVector（已经是 ProfileVector 时直接返回）"""
+    if isinstance(user, ProfileVector):
+        return user
+    return ProfileVector.from_user(user)
+
+def calculate_bmr_mifflin_st_jeor(user: Union[User, ProfileVector]) -> float:
     """
     使用 Mifflin-St Jeor 公式计算基础代谢率 (BMR)
     这是维持生命所需的最基本能量
-    :param user: 包含性别、体重、身高和出生日期的用户对象
+    :param user: 包含性别、体重、身高和出生日期的用户对象（或 ProfileVector）
     :return: BMR值（千卡/天）
     """
-    if not all([user.weight_kg, user.height_cm, user.birthdate, user.gender]):
+    profile = as_profile(user)
+    if not all([profile.weight_kg, profile.height_cm, profile.age is not None, profile.gender]):
         return 0.0
 
-    age = calculate_age(user.birthdate)
+    age = profile.age
 
     # Mifflin-St Jeor 公式
     # BMR (kcal/day) = 10 * weight (kg) + 6.25 * height (cm) - 5 * age (y) + s
     # s 是一个性别常数: 男性为 +5, 女性为 -161
-    if user.gender == 'male':
+    if profile.gender == 'male':
         s = 5
-    elif user.gender == 'female':
+    elif profile.gender == 'female':
         s = -161
 
-    bmr = (10 * float(user.weight_kg)) + (6.25 * float(user.height_cm)) - (5 * age) + s
+    bmr = (10 * profile.weight_kg) + (6.25 * profile.height_cm) - (5 * age) + s
 
     return max(0, bmr)
 
-def calculate_bmr_katch_mcardle(user: User) -> float:
+def calculate_bmr_katch_mcardle(user: Union[User, ProfileVector]) -> float:
     """
     使用 Katch-McArdle 公式计算基础代谢率 (BMR)
     需要体脂率数据，对于高体脂人群更准确
     公式: BMR = 370 + (21.6 × 去脂体重(kg))
     去脂体重(FFM) = 体重(kg) × (1 - 体脂率/100)
-    :param user: 包含体重和体脂率的用户对象
+    :param user: 包含体重和体脂率的用户对象（或 ProfileVector）
     :return: BMR值（千卡/天），如果缺少体脂率则返回0
     """
-    if not user.weight_kg or not user.body_fat_pct:
+    profile = as_profile(user)
+    if not profile.weight_kg or not profile.body_fat_pct:
         return 0.0
 
-    weight_kg = float(user.weight_kg)
-    body_fat_pct = float(user.body_fat_pct)
+    weight_kg = profile.weight_kg
+    body_fat_pct = profile.body_fat_pct
 
     # 计算去脂体重 (Fat-Free Mass, FFM)
     fat_free_mass = weight_kg * (1 - body_fat_pct / 100)
@@ -64,28 +108,32 @@ def calculate_bmr_katch_mcardle(user: User) -> float:
 
     return max(0, bmr)
 
-def calculate_bmr(user: User, prefer_katch_mcardle: bool = False) -> float:
+@lru_cache(maxsize=4096)
+def _calculate_profile_bmr(profile: ProfileVector, prefer_katch_mcardle: bool) -> float:
+    # 如果用户有体脂率数据且prefer_katch_mcardle为True，使用Katch-McArdle公式
+    if prefer_katch_mcardle and profile.body_fat_pct:
+        bmr = calculate_bmr_katch_mcardle(profile)
+        if bmr > 0:
+            return bmr
+    
+    # 否则使用Mifflin-St Jeor公式
+    return calculate_bmr_mifflin_st_jeor(profile)
+
+def calculate_bmr(user: Union[User, ProfileVector], prefer_katch_mcardle: bool = False) -> float:
     """
     计算基础代谢率 (BMR)
     优先使用Katch-McArdle公式（如果有体脂率数据），否则使用Mifflin-St Jeor公式
-    :param user: 用户对象
+    :param user: 用户对象（或 ProfileVector，结果按 ProfileVector 缓存）
     :param prefer_katch_mcardle: 如果为True且用户有体脂率数据，优先使用Katch-McArdle公式
     :return: BMR值（千卡/天）
     """
-    # 如果用户有体脂率数据且prefer_katch_mcardle为True，使用Katch-McArdle公式
-    if prefer_katch_mcardle and user.body_fat_pct:
-        bmr = calculate_bmr_katch_mcardle(user)
-        if bmr > 0:
-            return bmr
-    
-    # 否则使用Mifflin-St Jeor公式
-    return calculate_bmr_mifflin_st_jeor(user)
+    return _calculate_profile_bmr(as_profile(user), prefer_katch_mcardle)
 
-def calculate_tdee(user: User, bmr: float = None) -> float:
+def calculate_tdee(user: Union[User, ProfileVector], bmr: float = None) -> float:
     """
     计算总日能量消耗 (Total Daily Energy Expenditure, TDEE)
     这是BMR乘以活动水平系数得出的每日总热量消耗
-    :param user: 包含活动水平的用户对象
+    :param user: 包含活动水平的用户对象（或 ProfileVector）
     :param bmr: 基础代谢率，如果未提供，将重新计算
     :return: TDEE值（千卡/天）
     """
@@ -96,6 +144,42 @@ def calculate_tdee(user: User, bmr: float = None) -> float:
 
     return bmr * multiplier
 
+@lru_cache(maxsize=4096)
+def _calculate_profile_targets(profile: ProfileVector, prefer_katch_mcardle: bool) -> Dict:
+    # 避免循环导入：区间/营养素计算模块依赖本模块的 ProfileVector
+    from app.services.calorie_range_calculator import calculate_calorie_range
+    from app.services.macro_calculator import calculate_all_macros
+
+    bmr = calculate_bmr(profile, prefer_katch_mcardle=prefer_katch_mcardle)
+    tdee = calculate_tdee(profile, bmr)
+    if tdee == 0:
+        return {'bmr': bmr, 'tdee': tdee, 'calorie_range': None, 'macros': None}
+
+    calorie_range = calculate_calorie_range(profile, tdee)
+    macros = calculate_all_macros(profile, calorie_range['recommended_kcal'])
+    return {'bmr': bmr, 'tdee': tdee, 'calorie_range': calorie_range, 'macros': macros}
+
+def calculate_targets(user: Union[User, ProfileVector], prefer_katch_mcardle: bool = True) -> Dict:
+    """
+    完整计算流程：BMR -> TDEE -> 热量区间 -> 宏量营养素（按 ProfileVector 缓存）
+    :param user: 用户对象（或 ProfileVector）
+    :param prefer_katch_mcardle: 如果有体脂率数据，是否优先使用Katch-McArdle公式计算BMR
+    :return: {
+        'bmr': BMR,
+        'tdee': TDEE,
+        'calorie_range': calculate_calorie_range 的结果（无法计算TDEE时为None）,
+        'macros': calculate_all_macros 的结果（无法计算TDEE时为None）
+    }
+    """
+    targets = _calculate_profile_targets(as_profile(user), prefer_katch_mcardle)
+    # 返回副本，避免调用方修改缓存中的结果
+    return {
+        'bmr': targets['bmr'],
+        'tdee': targets['tdee'],
+        'calorie_range': dict(targets['calorie_range']) if targets['calorie_range'] else None,
+        'macros': {key: dict(value) for key, value in targets['macros'].items()} if targets['macros'] else None
+    }
+
 def calculate_exercise_calories_burned(met_value: float, weight_kg: float, duration_minutes: int) -> float:
     """
     计算特定运动消耗的热量
@@ -118,7 +202,7 @@ class CalorieCalculatorService:
     一个封装了所有热量计算逻辑的服务类
     """
     @staticmethod
-    def get_user_bmr(user: User, prefer_katch_mcardle: bool = True) -> float:
+    def get_user_bmr(user: Union[User, ProfileVector], prefer_katch_mcardle: bool = True) -> float:
         """
         获取用户BMR
         :param user: 用户对象
@@ -128,15 +212,16 @@ class CalorieCalculatorService:
         return calculate_bmr(user, prefer_katch_mcardle=prefer_katch_mcardle)
 
     @staticmethod
-    def get_user_tdee(user: User, prefer_katch_mcardle: bool = True) -> float:
+    def get_user_tdee(user: Union[User, ProfileVector], prefer_katch_mcardle: bool = True) -> float:
         """
         获取用户TDEE
         :param user: 用户对象
         :param prefer_katch_mcardle: 如果有体脂率数据，是否优先使用Katch-McArdle公式计算BMR
         :return: TDEE值
         """
-        bmr = calculate_bmr(user, prefer_katch_mcardle=prefer_katch_mcardle)
-        return calculate_tdee(user, bmr)
+        profile = as_profile(user)
+        bmr = calculate_bmr(profile, prefer_katch_mcardle=prefer_katch_mcardle)
+        return calculate_tdee(profile, bmr)
 
     @staticmethod
     def get_exercise_calories(met_value: float, weight_kg: float, duration_minutes: int) -> float:
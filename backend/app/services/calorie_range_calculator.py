@@ -1,13 +1,14 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 from app.models.user import User
+from app.services.calorie_calculator import ProfileVector, as_profile
 
 
-def calculate_calorie_range(user: User, tdee: float) -> Dict[str, float]:
+def calculate_calorie_range(user: Union[User, ProfileVector], tdee: float) -> Dict[str, float]:
     """
     计算热量区间
     根据用户目标和体脂率，返回最低、推荐、最高热量值
     
-    :param user: 用户对象
+    :param user: 用户对象（或 ProfileVector）
     :param tdee: 用户的总日能量消耗
     :return: {
         'min_kcal': 最低热量,
@@ -16,13 +17,14 @@ def calculate_calorie_range(user: User, tdee: float) -> Dict[str, float]:
         'range_description': '区间说明'
     }
     """
-    goal = user.goal
-    body_fat_pct = float(user.body_fat_pct) if user.body_fat_pct else None
+    profile = as_profile(user)
+    goal = profile.goal
+    body_fat_pct = profile.body_fat_pct if profile.body_fat_pct else None
     
     if goal == 'lose_weight':
         return _calculate_lose_weight_range(tdee, body_fat_pct)
     elif goal == 'gain_muscle':
-        return _calculate_gain_muscle_range(tdee, user.training_experience)
+        return _calculate_gain_muscle_range(tdee, profile.training_experience)
     elif goal == 'gain_weight':
         return _calculate_gain_weight_range(tdee)
     elif goal == 'body_recomposition':
@@ -3,8 +3,10 @@
 基于用户历史数据（体重、体脂率、执行情况）自动调整营养推荐
 """
 import logging
-from datetime import date, timedelta
-from typing import Dict, List, Optional, Tuple
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
 from sqlalchemy.orm import Session
 
 from app.models.user import User
@@ -12,10 +14,9 @@ from app.schemas.log import CalorieRecommendation
 from app.services.calorie_calculator import CalorieCalculatorService
 from app.services.calorie_range_calculator import calculate_calorie_range
 from app.services.macro_calculator import calculate_all_macros
-from app.crud.crud_body_metrics import body_metrics
-from app.crud.crud_log import log
 from app.crud.crud_recommendation_history import recommendation_history
 from app.services.performance_analysis_service import performance_analysis_service
+from app.services.user_history_service import UserHistorySnapshot, user_history_service
 
 
 class DynamicAdjustmentService:
@@ -43,33 +44,37 @@ class DynamicAdjustmentService:
         :param current_recommendation: 当前推荐
         :return: 调整后的推荐（如果不需要调整则返回原推荐）
         """
-        # 1. 检查是否满足调整条件（时间间隔）
-        if not self._can_adjust(db, user.id):
-            return current_recommendation
+        # 1. 收集历史数据（一次性加载快照，距上次调整时间过短时只查询调整日期）
+        history = user_history_service.load_snapshot(
+            db,
+            user.id,
+            metric_weeks=8,
+            intake_days=14,
+            exercise_weeks=4,
+            min_adjustment_interval_days=self.min_adjustment_interval_days
+        )
         
-        # 2. 收集历史数据
-        weight_history = body_metrics.get_weight_history(db, user_id=user.id, weeks=8)
-        body_fat_history = body_metrics.get_body_fat_history(db, user_id=user.id, weeks=8)
-        daily_logs = self._get_daily_logs(db, user.id, days=14)
+        # 2. 检查是否满足调整条件（时间间隔）
+        if not self._can_adjust(history):
+            return current_recommendation
         
-        # 3. 多维度评估
+        # 3. 多维度评估（所有评估器共享同一份快照）
         adjustments = []
         
         # 体重变化评估
-        weight_adjustment = self._should_adjust_by_weight(user, weight_history)
+        weight_adjustment = self._should_adjust_by_weight(user, history)
         if weight_adjustment.get('adjust', False):
             adjustments.append(weight_adjustment)
         
         # 体脂率评估
-        if body_fat_history:
-            bf_adjustment = self._should_adjust_by_body_fat(user, body_fat_history)
-            if bf_adjustment.get('adjust', False):
-                adjustments.append(bf_adjustment)
+        bf_adjustment = self._should_adjust_by_body_fat(user, history)
+        if bf_adjustment.get('adjust', False):
+            adjustments.append(bf_adjustment)
         
         # 执行情况评估
         compliance_adjustment = self._should_adjust_by_compliance(
             user, 
-            daily_logs, 
+            history, 
             current_recommendation
         )
         if compliance_adjustment.get('adjust', False):
@@ -78,7 +83,7 @@ class DynamicAdjustmentService:
         # 训练表现评估
         performance_adjustment = self._should_adjust_by_performance(
             user,
-            db
+            history
         )
         if performance_adjustment.get('adjust', False):
             adjustments.append(performance_adjustment)
@@ -120,30 +125,58 @@ class DynamicAdjustmentService:
         
         return new_recommendation
     
-    def _can_adjust(self, db: Session, user_id: int) -> bool:
+    def get_precomputed_recommendation(
+        self,
+        user: User,
+        db: Session,
+        current_recommendation: CalorieRecommendation
+    ) -> CalorieRecommendation:
+        """
+        查询夜间批处理预先计算并保存的调整结果（batch模式下请求时使用，不做评估）
+
+        :param user: 用户对象
+        :param db: 数据库会话
+        :param current_recommendation: 当前推荐
+        :return: 调整间隔内有已保存的调整结果时返回调整后的推荐，否则返回原推荐
+        """
+        latest_adjustment = recommendation_history.get_latest_adjustment(db, user_id=user.id)
+        if not latest_adjustment or latest_adjustment.new_kcal is None:
+            return current_recommendation
+
+        days_since_last = (date.today() - latest_adjustment.adjustment_date).days
+        if days_since_last >= self.min_adjustment_interval_days:
+            return current_recommendation  # 已过期，等待下一次批处理
+
+        return self._recalculate_recommendation(user, float(latest_adjustment.new_kcal))
+
+    def _can_adjust(self, history: UserHistorySnapshot) -> bool:
         """检查是否满足调整条件（时间间隔）"""
-        latest_adjustment = recommendation_history.get_latest_adjustment(db, user_id=user_id)
-        if not latest_adjustment:
+        days_since_last = history.days_since_last_adjustment()
+        if days_since_last is None:
             return True  # 从未调整过，可以调整
         
-        days_since_last = (date.today() - latest_adjustment.adjustment_date).days
-        return days_since_last >= self.min_adjustment_interval_days
+        return history.loaded and days_since_last >= self.min_adjustment_interval_days
     
     def _should_adjust_by_weight(
         self, 
         user: User, 
-        weight_history: List[Tuple[date, float]]
+        history: UserHistorySnapshot
     ) -> Dict:
         """
         基于体重变化判断是否需要调整
         返回: {'adjust': bool, 'adjustment_kcal': float, 'reason': str}
         """
-        if len(weight_history) < 4:
+        _, weights = history.weight_series()
+        if len(weights) < 4:
             return {'adjust': False, 'reason': '体重数据不足（需要至少4周数据）'}
         
-        # 计算最近4周的体重变化
-        recent_weeks = weight_history[-4:]
-        weight_change_per_week = (recent_weeks[-1][1] - recent_weeks[0][1]) / 4
+        # 体重变化速度取平滑趋势的斜率（不受单次称重波动影响）
+        # 没有趋势状态或趋势的记录数/覆盖天数不足时，按最近4次记录估算
+        if history.weight_trend is not None and history.weight_trend['established']:
+            weight_change_per_week = history.weight_trend['slope_kg_per_week']
+        else:
+            recent_weeks = weights[-4:]
+            weight_change_per_week = float(recent_weeks[-1] - recent_weeks[0]) / 4
         
         goal = user.goal
         
@@ -182,26 +215,26 @@ class DynamicAdjustmentService:
     def _should_adjust_by_body_fat(
         self, 
         user: User, 
-        body_fat_history: List[Tuple[date, float]]
+        history: UserHistorySnapshot
     ) -> Dict:
         """
         增强的体脂率分析
         基于体脂率变化判断是否需要调整
         返回: {'adjust': bool, 'adjustment_kcal': float, 'reason': str}
         """
-        if len(body_fat_history) < 2:
+        bf_dates, bf_values = history.body_fat_series()
+        if len(bf_values) < 2:
             return {'adjust': False, 'reason': '体脂率数据不足'}
         
         # 计算体脂率变化（最近2次测量）
-        recent = body_fat_history[-2:]
-        bf_change = recent[-1][1] - recent[0][1]
-        days_between = (recent[-1][0] - recent[0][0]).days
+        bf_change = float(bf_values[-1] - bf_values[-2])
+        days_between = int((bf_dates[-1] - bf_dates[-2]).astype(int))
         
         # 计算周变化率
         bf_change_per_week = (bf_change / days_between * 7) if days_between > 0 else 0
         
         goal = user.goal
-        current_bf = recent[-1][1]
+        current_bf = float(bf_values[-1])
         
         if goal == 'lose_weight':
             # 减脂期: 如果体脂率上升，需要减少热量
@@ -261,18 +294,18 @@ class DynamicAdjustmentService:
     def _should_adjust_by_compliance(
         self, 
         user: User,
-        daily_logs: List[Dict],
+        history: UserHistorySnapshot,
         current_recommendation: CalorieRecommendation
     ) -> Dict:
         """
         基于用户实际执行情况调整
         返回: {'adjust': bool, 'adjustment_kcal': float, 'reason': str}
         """
-        if len(daily_logs) < 7:
+        if len(history.intake_kcal) < 7:
             return {'adjust': False, 'reason': '执行数据不足（需要至少7天数据）'}
         
         # 计算平均实际摄入
-        avg_actual_kcal = sum([log.get('total_intake_kcal', 0) for log in daily_logs]) / len(daily_logs)
+        avg_actual_kcal = float(np.mean(history.intake_kcal))
         recommended_kcal = current_recommendation.recommended_kcal
         
         if recommended_kcal == 0:
@@ -300,7 +333,7 @@ class DynamicAdjustmentService:
     def _should_adjust_by_performance(
         self,
         user: User,
-        db: Session
+        history: UserHistorySnapshot
     ) -> Dict:
         """
         基于训练表现判断是否需要调整
@@ -309,8 +342,8 @@ class DynamicAdjustmentService:
         try:
             performance_data = performance_analysis_service.analyze_training_performance(
                 user=user,
-                db=db,
-                weeks=4
+                weeks=4,
+                exercise_columns=history.exercise_columns
             )
             
             if not performance_data.get('has_data', False):
@@ -360,30 +393,6 @@ class DynamicAdjustmentService:
         
         return {'adjust': False, 'reason': '训练表现正常'}
     
-    def _get_daily_logs(self, db: Session, user_id: int, days: int) -> List[Dict]:
-        """获取最近N天的饮食日志汇总"""
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days)
-        
-        food_logs = log.get_food_logs_by_user_and_date_range(
-            db, 
-            user_id=user_id, 
-            start_date=start_date, 
-            end_date=end_date
-        )
-        
-        # 按日期汇总
-        daily_summary = {}
-        for food_log in food_logs:
-            log_date = food_log.log_date
-            if log_date not in daily_summary:
-                daily_summary[log_date] = {'total_intake_kcal': 0}
-            
-            if food_log.total_calories:
-                daily_summary[log_date]['total_intake_kcal'] += float(food_log.total_calories)
-        
-        return list(daily_summary.values())
-    
     def _recalculate_recommendation(
         self, 
         user: User, 
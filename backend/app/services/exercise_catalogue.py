@@ -0,0 +1,205 @@
+"""
+运动目录服务
+将运动项目（ID -> 名称、MET值、类别位掩码）一次性加载到内存中，供各服务查表使用，
+替代逐条查询运动记录和逐条关键词扫描。新增的运动通过预编译的 Aho-Corasick 自动机分类
+"""
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.crud_exercise import exercise
+
+
+# 运动类别（位掩码，一个运动可以同时属于多个类别）
+CATEGORY_STRENGTH = 1
+CATEGORY_CARDIO = 2
+
+# 力量训练关键词（用于识别力量训练）
+STRENGTH_KEYWORDS = [
+    '力量', '举重', '深蹲', '硬拉', '卧推', '推举', '划船',
+    'strength', 'weight', 'squat', 'deadlift', 'bench', 'press', 'row'
+]
+
+# 有氧训练关键词（用于识别有氧训练）
+CARDIO_KEYWORDS = [
+    '跑步', '慢跑', '快走', '游泳', '骑行', '跳绳', '有氧',
+    'run', 'jog', 'walk', 'swim', 'bike', 'cycle', 'cardio', 'hiit'
+]
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多模式匹配
+    所有关键词编译成一个自动机，一次扫描文本即可得到命中关键词的类别位掩码（不区分大小写）
+    """
+
+    def __init__(self, keyword_categories: Dict[str, int]):
+        """
+        :param keyword_categories: 关键词 -> 类别位掩码
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [0]
+
+        for keyword, category in keyword_categories.items():
+            node = 0
+            for char in keyword.lower():
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(0)
+                node = next_node
+            self._output[node] |= category
+
+        # 按广度优先构建失败指针，并沿失败指针合并输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+
+    def match(self, text: Optional[str]) -> int:
+        """
+        :param text: 待匹配文本
+        :return: 文本中命中的所有关键词的类别位掩码
+        """
+        if not text:
+            return 0
+        node = 0
+        result = 0
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            result |= self._output[node]
+        return result
+
+
+def _build_category_matcher() -> KeywordMatcher:
+    keyword_categories: Dict[str, int] = {}
+    for keyword in STRENGTH_KEYWORDS:
+        keyword_categories[keyword] = keyword_categories.get(keyword, 0) | CATEGORY_STRENGTH
+    for keyword in CARDIO_KEYWORDS:
+        keyword_categories[keyword] = keyword_categories.get(keyword, 0) | CATEGORY_CARDIO
+    return KeywordMatcher(keyword_categories)
+
+
+class ExerciseEntry(NamedTuple):
+    """运动目录条目（字段名与 Exercise 模型一致，可直接替代ORM对象读取）"""
+    id: int
+    name: str
+    met_value: Decimal
+    categories: int
+
+    @property
+    def is_strength(self) -> bool:
+        return bool(self.categories & CATEGORY_STRENGTH)
+
+    @property
+    def is_cardio(self) -> bool:
+        return bool(self.categories & CATEGORY_CARDIO)
+
+
+class ExerciseCatalogue:
+    """
+    进程内运动目录
+    首次使用时整表加载，之后每隔 RELOAD_INTERVAL_SECONDS 重新加载（运动数据直接在数据库中维护，
+    应用内没有可以通知刷新的写入路径）；查询到未知ID（新增的运动）时单独加载并分类，
+    不存在的ID缓存 MISSING_TTL_SECONDS 秒，避免反复查询数据库
+    """
+
+    RELOAD_INTERVAL_SECONDS = 300
+    MISSING_TTL_SECONDS = 60
+
+    def __init__(self):
+        self._matcher = _build_category_matcher()
+        self._entries: Dict[int, ExerciseEntry] = {}
+        self._missing: Dict[int, float] = {}  # 不存在的ID -> 缓存过期时间（monotonic）
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def classify(self, exercise_name: Optional[str]) -> int:
+        """根据运动名称计算类别位掩码"""
+        return self._matcher.match(exercise_name)
+
+    def get(self, db: Session, exercise_id: int) -> Optional[ExerciseEntry]:
+        """
+        获取运动目录条目
+        :param db: 数据库会话（目录未加载或ID未知时使用）
+        :param exercise_id: 运动ID
+        :return: 运动目录条目，不存在时返回None
+        """
+        self._ensure_loaded(db)
+        entry = self._entries.get(exercise_id)
+        if entry is None:
+            missing_until = self._missing.get(exercise_id)
+            if missing_until is not None and missing_until > time.monotonic():
+                return None
+            entry = self._load_one(db, exercise_id)
+        return entry
+
+    def get_many(self, db: Session, exercise_ids: Iterable[int]) -> Dict[int, ExerciseEntry]:
+        """批量获取运动目录条目（不存在的ID不包含在结果中）"""
+        result = {}
+        for exercise_id in set(exercise_ids):
+            entry = self.get(db, exercise_id)
+            if entry is not None:
+                result[exercise_id] = entry
+        return result
+
+    def refresh(self):
+        """清空目录，下次使用时重新加载（运动数据被修改后调用）"""
+        with self._lock:
+            self._entries = {}
+            self._missing = {}
+            self._loaded_at = None
+
+    def _make_entry(self, row) -> ExerciseEntry:
+        return ExerciseEntry(
+            id=row.id,
+            name=row.name,
+            met_value=row.met_value,
+            categories=self.classify(row.name)
+        )
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.RELOAD_INTERVAL_SECONDS
+
+    def _ensure_loaded(self, db: Session):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            entries = {row.id: self._make_entry(row) for row in exercise.get_all_exercise_columns(db)}
+            self._entries = entries
+            self._missing = {}
+            self._loaded_at = time.monotonic()
+
+    def _load_one(self, db: Session, exercise_id: int) -> Optional[ExerciseEntry]:
+        row = exercise.get_exercise_by_id(db, exercise_id=exercise_id)
+        if row is None:
+            with self._lock:
+                self._missing[exercise_id] = time.monotonic() + self.MISSING_TTL_SECONDS
+            return None
+        entry = self._make_entry(row)
+        with self._lock:
+            self._entries[exercise_id] = entry
+        return entry
+
+
+# 创建全局实例
+exercise_catalogue = ExerciseCatalogue()
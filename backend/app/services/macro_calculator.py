@@ -1,5 +1,6 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 from app.models.user import User
+from app.services.calorie_calculator import ProfileVector, as_profile
 
 
 # 每克营养素的热量 (千卡)
@@ -9,7 +10,7 @@ CALORIES_PER_GRAM = {
     'carbs': 4
 }
 
-def calculate_protein_requirement(user: User, goal: str) -> Dict[str, float]:
+def calculate_protein_requirement(user: Union[User, ProfileVector], goal: str) -> Dict[str, float]:
     """
     计算蛋白质需求（基于体重）
     科学依据:
@@ -18,7 +19,7 @@ def calculate_protein_requirement(user: User, goal: str) -> Dict[str, float]:
     - 减脂: 1.6-2.2 g/kg (高蛋白有助于保持肌肉)
     - 体态重组: 2.0-2.4 g/kg (最高需求)
     
-    :param user: 用户对象
+    :param user: 用户对象（或 ProfileVector）
     :param goal: 用户目标
     :return: {
         'min_g': 最低克数,
@@ -27,19 +28,20 @@ def calculate_protein_requirement(user: User, goal: str) -> Dict[str, float]:
         'g_per_kg': 每公斤体重克数
     }
     """
-    weight_kg = float(user.weight_kg)
+    profile = as_profile(user)
+    weight_kg = float(profile.weight_kg)
     
     # 根据目标和性别确定蛋白质需求
     if goal == 'maintain':
         g_per_kg = {'min': 0.8, 'recommended': 0.9, 'max': 1.0}
     elif goal == 'lose_weight':
         # 减脂期需要高蛋白，女性可能需要更高
-        if user.gender == 'female':
+        if profile.gender == 'female':
             g_per_kg = {'min': 1.8, 'recommended': 2.0, 'max': 2.2}
         else:
             g_per_kg = {'min': 1.6, 'recommended': 1.8, 'max': 2.2}
     elif goal == 'gain_muscle':
-        if user.training_experience == 'beginner':
+        if profile.training_experience == 'beginner':
             g_per_kg = {'min': 1.6, 'recommended': 1.8, 'max': 2.0}
         else:
             g_per_kg = {'min': 1.8, 'recommended': 2.0, 'max': 2.2}
@@ -142,28 +144,29 @@ def calculate_carb_requirement(
     }
 
 
-def calculate_all_macros(user: User, recommended_kcal: float) -> Dict:
+def calculate_all_macros(user: Union[User, ProfileVector], recommended_kcal: float) -> Dict:
     """
     计算所有宏量营养素需求
     
-    :param user: 用户对象
+    :param user: 用户对象（或 ProfileVector）
     :param recommended_kcal: 推荐热量
     :return: 包含所有宏量营养素信息的字典
     """
-    goal = user.goal
+    profile = as_profile(user)
+    goal = profile.goal
     
     # 1. 计算蛋白质
-    protein = calculate_protein_requirement(user, goal)
+    protein = calculate_protein_requirement(profile, goal)
     
     # 2. 计算脂肪
-    fat = calculate_fat_requirement(recommended_kcal, goal, user.gender)
+    fat = calculate_fat_requirement(recommended_kcal, goal, profile.gender)
     
     # 3. 计算碳水（剩余热量原则）
     carbs = calculate_carb_requirement(
         recommended_kcal,
         protein['recommended_g'],
         fat['recommended_g'],
-        user.activity_level
+        profile.activity_level
     )
     
     return {
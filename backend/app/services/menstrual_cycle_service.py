@@ -4,17 +4,121 @@
 """
 from datetime import date, timedelta
 from typing import Dict, Optional
+
+import numpy as np
+
+from app.core.cache import TTLCache
 from app.models.user import User
 from app.schemas.log import CalorieRecommendation
 
 
+# 阶段顺序（查找表中的阶段编号即此列表的下标）
+PHASE_ORDER = ['menstrual', 'follicular', 'ovulation', 'luteal']
+
+
+class CycleCalendar:
+    """
+    月经周期日历
+    一个周期内每天的阶段和调整量预先生成查找表，
+    任意日期的周期日为 (日期 - 上次月经开始日期) % 周期长度 + 1，阶段和调整量直接查表
+    """
+
+    def __init__(self, last_period_start: date, cycle_length: int, phases: Dict[str, Dict]):
+        """
+        :param last_period_start: 上次月经开始日期
+        :param cycle_length: 周期长度（天）
+        :param phases: 各阶段的调整参数（同 MenstrualCycleService.CYCLE_PHASES）
+        """
+        self.last_period_start = last_period_start
+        self.cycle_length = cycle_length
+        self._anchor = np.datetime64(last_period_start, 'D')
+
+        # 周期日 -> 阶段编号：月经期1-5天，排卵期为下次月经前第14-12天，其余按前后划分为卵泡期和黄体期
+        cycle_days = np.arange(1, cycle_length + 1)
+        ovulation_start = cycle_length - 13
+        self.phase_table = np.select(
+            [cycle_days <= 5, cycle_days < ovulation_start, cycle_days < ovulation_start + 3],
+            [0, 1, 2],
+            default=3
+        )
+
+        # 阶段编号 -> 调整量
+        self.kcal_table = np.array([phases[p]['kcal_adjustment'] for p in PHASE_ORDER])
+        self.carb_table = np.array([phases[p]['carb_adjustment_pct'] for p in PHASE_ORDER])
+        self.protein_table = np.array([phases[p]['protein_adjustment_pct'] for p in PHASE_ORDER])
+        self._phases = phases
+
+    def lookup_range(self, start_date: date, end_date: date) -> Dict[str, np.ndarray]:
+        """
+        一次性计算日期范围内每天的周期信息
+        :return: {'dates', 'days_since_period', 'cycle_day', 'phase_index', 'kcal_adjustment',
+                  'carb_adjustment_pct', 'protein_adjustment_pct'}，每项为按日期排列的数组
+        """
+        dates = np.arange(
+            np.datetime64(start_date, 'D'),
+            np.datetime64(end_date, 'D') + 1,
+            dtype='datetime64[D]'
+        )
+        days_since_period = (dates - self._anchor).astype(np.int64)
+        cycle_day = days_since_period % self.cycle_length + 1
+        phase_index = self.phase_table[cycle_day - 1]
+        return {
+            'dates': dates,
+            'days_since_period': days_since_period,
+            'cycle_day': cycle_day,
+            'phase_index': phase_index,
+            'kcal_adjustment': self.kcal_table[phase_index],
+            'carb_adjustment_pct': self.carb_table[phase_index],
+            'protein_adjustment_pct': self.protein_table[phase_index]
+        }
+
+    def phase_info(self, target_date: date) -> Dict:
+        """获取单日的周期信息（格式同 MenstrualCycleService.get_cycle_phase）"""
+        days_since_period = (target_date - self.last_period_start).days
+        cycle_day = days_since_period % self.cycle_length + 1
+        return self._make_info(days_since_period, cycle_day, int(self.phase_table[cycle_day - 1]))
+
+    def range_info(self, start_date: date, end_date: date) -> Dict[str, Dict]:
+        """获取日期范围内每天的周期信息：{日期ISO字符串: 周期信息}"""
+        columns = self.lookup_range(start_date, end_date)
+        return {
+            str(day): self._make_info(days_since_period, cycle_day, phase_index)
+            for day, days_since_period, cycle_day, phase_index in zip(
+                columns['dates'].tolist(),
+                columns['days_since_period'].tolist(),
+                columns['cycle_day'].tolist(),
+                columns['phase_index'].tolist()
+            )
+        }
+
+    def _make_info(self, days_since_period: int, cycle_day: int, phase_index: int) -> Dict:
+        phase = PHASE_ORDER[phase_index]
+        phase_info = self._phases[phase]
+        return {
+            'phase': phase,
+            'cycle_day': cycle_day,
+            'days_since_period': days_since_period,
+            'adjustments': {
+                'kcal_adjustment': phase_info['kcal_adjustment'],
+                'carb_adjustment_pct': phase_info['carb_adjustment_pct'],
+                'protein_adjustment_pct': phase_info['protein_adjustment_pct']
+            },
+            'description': phase_info['description']
+        }
+
+
 class MenstrualCycleService:
     """
     女性月经周期营养调整服务
     根据月经周期的不同阶段提供差异化的营养推荐
     """
     
-    # 月经周期阶段（通常为28天）
+    # 默认周期长度（天）及允许的范围
+    DEFAULT_CYCLE_LENGTH = 28
+    MIN_CYCLE_LENGTH = 21
+    MAX_CYCLE_LENGTH = 45
+    
+    # 月经周期阶段（以28天周期为例；其他周期长度下排卵期固定为下次月经前第14-12天）
     CYCLE_PHASES = {
         'menstrual': {  # 月经期（第1-5天）
             'days': (1, 5),
@@ -46,11 +150,40 @@ class MenstrualCycleService:
         }
     }
     
+    def __init__(self):
+        # 周期日历缓存：(用户ID, 上次月经开始日期, 周期长度) -> CycleCalendar
+        self._calendar_cache = TTLCache(ttl_seconds=24 * 3600, max_entries=10000)
+    
+    def get_cycle_calendar(
+        self,
+        user: User,
+        last_period_start: date,
+        cycle_length: Optional[int] = None
+    ) -> CycleCalendar:
+        """
+        获取用户的周期日历（按用户、上次月经开始日期和周期长度缓存）
+        
+        :param user: 用户对象
+        :param last_period_start: 上次月经开始日期
+        :param cycle_length: 周期长度（天），默认28天
+        :return: 周期日历
+        """
+        cycle_length = min(
+            max(int(cycle_length or self.DEFAULT_CYCLE_LENGTH), self.MIN_CYCLE_LENGTH),
+            self.MAX_CYCLE_LENGTH
+        )
+        key = (user.id, last_period_start, cycle_length)
+        return self._calendar_cache.get_or_load(
+            key,
+            lambda: CycleCalendar(last_period_start, cycle_length, self.CYCLE_PHASES)
+        )
+    
     def get_cycle_phase(
         self,
         user: User,
         target_date: date,
-        last_period_start: Optional[date] = None
+        last_period_start: Optional[date] = None,
+        cycle_length: Optional[int] = None
     ) -> Dict:
         """
         获取指定日期的月经周期阶段
@@ -58,8 +191,44 @@ class MenstrualCycleService:
         :param user: 用户对象（必须是女性）
         :param target_date: 目标日期
         :param last_period_start: 上次月经开始日期（如果提供）
+        :param cycle_length: 周期长度（天），默认28天
         :return: 包含阶段信息的字典
         """
+        unavailable = self._unavailable_info(user, last_period_start)
+        if unavailable is not None:
+            return unavailable
+        
+        return self.get_cycle_calendar(user, last_period_start, cycle_length).phase_info(target_date)
+    
+    def get_cycle_phase_range(
+        self,
+        user: User,
+        start_date: date,
+        end_date: date,
+        last_period_start: Optional[date] = None,
+        cycle_length: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """
+        获取日期范围内每天的月经周期阶段（一次查表生成，用于周计划/月历等范围视图）
+        
+        :param user: 用户对象（必须是女性）
+        :param start_date: 开始日期
+        :param end_date: 结束日期（包含）
+        :param last_period_start: 上次月经开始日期
+        :param cycle_length: 周期长度（天），默认28天
+        :return: {日期ISO字符串: 周期信息}；不适用时每天均为同一个提示信息
+        """
+        unavailable = self._unavailable_info(user, last_period_start)
+        if unavailable is not None:
+            return {
+                (start_date + timedelta(days=offset)).isoformat(): unavailable
+                for offset in range((end_date - start_date).days + 1)
+            }
+        
+        return self.get_cycle_calendar(user, last_period_start, cycle_length).range_info(start_date, end_date)
+    
+    def _unavailable_info(self, user: User, last_period_start: Optional[date]) -> Optional[Dict]:
+        """无法计算周期阶段时的提示信息，可以计算时返回None"""
         if user.gender != 'female':
             return {
                 'phase': None,
@@ -73,43 +242,15 @@ class MenstrualCycleService:
                 'message': '需要记录月经周期信息',
                 'suggestion': '建议记录上次月经开始日期以获得个性化调整'
             }
-        
-        # 计算距离上次月经的天数
-        days_since_period = (target_date - last_period_start).days
-        
-        # 处理周期超过28天的情况（取模）
-        cycle_day = (days_since_period % 28) + 1
-        
-        # 确定当前阶段
-        if 1 <= cycle_day <= 5:
-            phase = 'menstrual'
-        elif 6 <= cycle_day <= 14:
-            phase = 'follicular'
-        elif 15 <= cycle_day <= 17:
-            phase = 'ovulation'
-        else:  # 18-28
-            phase = 'luteal'
-        
-        phase_info = self.CYCLE_PHASES[phase]
-        
-        return {
-            'phase': phase,
-            'cycle_day': cycle_day,
-            'days_since_period': days_since_period,
-            'adjustments': {
-                'kcal_adjustment': phase_info['kcal_adjustment'],
-                'carb_adjustment_pct': phase_info['carb_adjustment_pct'],
-                'protein_adjustment_pct': phase_info['protein_adjustment_pct']
-            },
-            'description': phase_info['description']
-        }
+        return None
     
     def adjust_recommendation_for_cycle(
         self,
         user: User,
         target_date: date,
         base_recommendation: CalorieRecommendation,
-        last_period_start: Optional[date] = None
+        last_period_start: Optional[date] = None,
+        cycle_length: Optional[int] = None
     ) -> CalorieRecommendation:
         """
         根据月经周期调整推荐
@@ -118,12 +259,13 @@ class MenstrualCycleService:
         :param target_date: 目标日期
         :param base_recommendation: 基础推荐
         :param last_period_start: 上次月经开始日期
+        :param cycle_length: 周期长度（天），默认28天
         :return: 调整后的推荐
         """
         if user.gender != 'female':
             return base_recommendation
         
-        cycle_info = self.get_cycle_phase(user, target_date, last_period_start)
+        cycle_info = self.get_cycle_phase(user, target_date, last_period_start, cycle_length)
         
         if cycle_info['phase'] in [None, 'unknown']:
             return base_recommendation
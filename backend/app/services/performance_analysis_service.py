@@ -1,15 +1,55 @@
 """
 训练表现分析服务
 分析用户的运动日志，评估训练表现趋势
+运动日志先一次性转换为列式NumPy数组（周、时长、热量、类别），所有趋势/频率/强度统计都基于分组聚合计算
 """
 import logging
 from datetime import date, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
 from sqlalchemy.orm import Session
-from collections import defaultdict
 
 from app.models.user import User
 from app.crud.crud_log import log
+from app.services.exercise_catalogue import CATEGORY_CARDIO, CATEGORY_STRENGTH, exercise_catalogue
+
+
+class ExerciseLogColumns:
+    """
+    运动记录的列式表示
+    - dates: 记录日期（datetime64[D]）
+    - exercise_ids: 运动ID
+    - minutes: 运动时长（分钟）
+    - kcal: 消耗热量
+    - met: MET值（缺失为NaN）
+    - categories: 类别位掩码（CATEGORY_STRENGTH | CATEGORY_CARDIO）
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        exercise_ids: np.ndarray,
+        minutes: np.ndarray,
+        kcal: np.ndarray,
+        met: np.ndarray,
+        categories: np.ndarray
+    ):
+        self.dates = dates
+        self.exercise_ids = exercise_ids
+        self.minutes = minutes
+        self.kcal = kcal
+        self.met = met
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def week_starts(self) -> np.ndarray:
+        """每条记录所在ISO周的周一（1970-01-01是周四，偏移3天后按7取余得到周一为0的星期）"""
+        days = self.dates.astype(np.int64)
+        return days - (days + 3) % 7
 
 
 class PerformanceAnalysisService:
@@ -18,63 +58,49 @@ class PerformanceAnalysisService:
     分析运动日志，识别训练表现趋势
     """
     
-    # 力量训练关键词（用于识别力量训练）
-    STRENGTH_KEYWORDS = [
-        '力量', '举重', '深蹲', '硬拉', '卧推', '推举', '划船',
-        'strength', 'weight', 'squat', 'deadlift', 'bench', 'press', 'row'
-    ]
-    
-    # 有氧训练关键词（用于识别有氧训练）
-    CARDIO_KEYWORDS = [
-        '跑步', '慢跑', '快走', '游泳', '骑行', '跳绳', '有氧',
-        'run', 'jog', 'walk', 'swim', 'bike', 'cycle', 'cardio', 'hiit'
-    ]
-    
     def analyze_training_performance(
         self,
         user: User,
-        db: Session,
-        weeks: int = 4
+        db: Optional[Session] = None,
+        weeks: int = 4,
+        exercise_columns: Optional[ExerciseLogColumns] = None
     ) -> Dict:
         """
         分析用户的训练表现
         
         :param user: 用户对象
-        :param db: 数据库会话
+        :param db: 数据库会话（未提供 exercise_columns 时用于查询）
         :param weeks: 分析的时间范围（周）
+        :param exercise_columns: 已加载的运动记录（如历史数据快照中的记录），提供时不再查询数据库
         :return: 包含分析结果的字典
         """
         end_date = date.today()
         start_date = end_date - timedelta(weeks=weeks)
         
-        # 获取运动日志
-        exercise_logs = log.get_exercise_logs_by_user_and_date_range(
-            db,
-            user_id=user.id,
-            start_date=start_date,
-            end_date=end_date
-        )
+        # 获取运动日志（只查询分析需要的列）
+        if exercise_columns is None:
+            exercise_columns = self.load_exercise_columns(db, user.id, start_date, end_date)
         
-        if not exercise_logs:
+        if len(exercise_columns) == 0:
             return {
                 'has_data': False,
                 'message': '没有足够的运动数据进行分析'
             }
         
         # 分析总体趋势
-        overall_trend = self._analyze_overall_trend(exercise_logs)
+        overall_trend = self._analyze_overall_trend(exercise_columns)
         
         # 分析力量训练趋势
-        strength_trend = self._analyze_strength_trend(exercise_logs)
+        strength_trend = self._analyze_strength_trend(exercise_columns)
         
         # 分析有氧训练趋势
-        cardio_trend = self._analyze_cardio_trend(exercise_logs)
+        cardio_trend = self._analyze_cardio_trend(exercise_columns)
         
         # 分析训练频率
-        frequency_analysis = self._analyze_training_frequency(exercise_logs, start_date, end_date)
+        frequency_analysis = self._analyze_training_frequency(exercise_columns, start_date, end_date)
         
         # 分析训练强度
-        intensity_analysis = self._analyze_training_intensity(exercise_logs)
+        intensity_analysis = self._analyze_training_intensity(exercise_columns)
         
         return {
             'has_data': True,
@@ -91,36 +117,104 @@ class PerformanceAnalysisService:
             )
         }
     
+    def load_exercise_columns(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: date,
+        end_date: date
+    ) -> ExerciseLogColumns:
+        """查询指定日期范围内的运动记录并转换为列式数组"""
+        rows = log.get_exercise_log_columns(
+            db,
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        return self.build_exercise_columns(rows, db)
+    
+    def build_exercise_columns(
+        self,
+        rows: Sequence[Tuple[date, int, int, object]],
+        db: Optional[Session] = None
+    ) -> ExerciseLogColumns:
+        """
+        将运动记录行转换为列式数组
+        类别和MET按运动ID从运动目录查表一次，再展开到每条记录
+        
+        :param rows: [(log_date, exercise_id, duration_minutes, calories_burned), ...]
+        :param db: 数据库会话（运动目录未加载时使用）
+        """
+        exercise_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        
+        unique_ids, inverse = np.unique(exercise_ids, return_inverse=True)
+        entries = exercise_catalogue.get_many(db, unique_ids.tolist()) if len(unique_ids) else {}
+        unique_categories = np.array(
+            [entries[i].categories if i in entries else 0 for i in unique_ids.tolist()], dtype=np.uint8
+        )
+        unique_met = np.array(
+            [float(entries[i].met_value) if i in entries and entries[i].met_value else np.nan for i in unique_ids.tolist()],
+            dtype=np.float64
+        )
+        
+        return ExerciseLogColumns(
+            dates=np.array([row[0] for row in rows], dtype='datetime64[D]'),
+            exercise_ids=exercise_ids,
+            minutes=np.array([row[2] or 0 for row in rows], dtype=np.float64),
+            kcal=np.array([float(row[3] or 0) for row in rows], dtype=np.float64),
+            met=unique_met[inverse],
+            categories=unique_categories[inverse]
+        )
+    
+    @staticmethod
+    def _weekly_totals(
+        columns: ExerciseLogColumns,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按周分组聚合
+        :return: (周一日期, 每周总时长, 每周总热量, 每周记录数)，按周升序
+        """
+        week_starts = columns.week_starts
+        minutes = columns.minutes
+        kcal = columns.kcal
+        if mask is not None:
+            week_starts, minutes, kcal = week_starts[mask], minutes[mask], kcal[mask]
+        
+        weeks, inverse = np.unique(week_starts, return_inverse=True)
+        return (
+            weeks,
+            np.bincount(inverse, weights=minutes, minlength=len(weeks)),
+            np.bincount(inverse, weights=kcal, minlength=len(weeks)),
+            np.bincount(inverse, minlength=len(weeks))
+        )
+    
+    @staticmethod
+    def _duration_change_pct(recent: np.ndarray, earlier_avg: float) -> Tuple[float, float]:
+        """计算最近几周的平均时长及其相对早期平均时长的变化百分比"""
+        recent_avg = float(recent.mean())
+        return recent_avg, ((recent_avg - earlier_avg) / max(earlier_avg, 1)) * 100
+    
     def _analyze_overall_trend(
         self,
-        exercise_logs: List
+        columns: ExerciseLogColumns
     ) -> Dict:
         """
         分析总体训练趋势
         基于总训练时长和总消耗热量
         """
-        # 按周分组
-        weekly_data = defaultdict(lambda: {'duration': 0, 'calories': 0})
+        weeks, durations, _, _ = self._weekly_totals(columns)
         
-        for log_entry in exercise_logs:
-            week_key = log_entry.log_date.isocalendar()[1]  # 周数
-            weekly_data[week_key]['duration'] += log_entry.duration_minutes
-            weekly_data[week_key]['calories'] += float(log_entry.calories_burned or 0)
-        
-        if len(weekly_data) < 2:
+        if len(weeks) < 2:
             return {
                 'trend': 'insufficient_data',
                 'message': '数据不足，无法分析趋势'
             }
         
-        # 计算趋势
-        weeks = sorted(weekly_data.keys())
-        recent_weeks = weeks[-2:]  # 最近2周
-        
-        recent_avg_duration = sum([weekly_data[w]['duration'] for w in recent_weeks]) / len(recent_weeks)
-        earlier_avg_duration = sum([weekly_data[w]['duration'] for w in weeks[:-2]]) / max(1, len(weeks) - 2)
-        
-        duration_change_pct = ((recent_avg_duration - earlier_avg_duration) / max(earlier_avg_duration, 1)) * 100
+        # 最近2周与之前各周对比
+        earlier = durations[:-2]
+        earlier_avg_duration = float(earlier.sum()) / max(1, len(earlier))
+        recent_avg_duration, duration_change_pct = self._duration_change_pct(durations[-2:], earlier_avg_duration)
         
         if duration_change_pct > 10:
             trend = 'improving'
@@ -142,45 +236,29 @@ class PerformanceAnalysisService:
     
     def _analyze_strength_trend(
         self,
-        exercise_logs: List
+        columns: ExerciseLogColumns
     ) -> Dict:
         """
         分析力量训练趋势
         基于力量训练的运动时长和频率
         """
-        strength_logs = [
-            log_entry for log_entry in exercise_logs
-            if self._is_strength_training(log_entry)
-        ]
+        mask = (columns.categories & CATEGORY_STRENGTH) != 0
         
-        if len(strength_logs) < 4:
+        if int(mask.sum()) < 4:
             return {
                 'trend': 'insufficient_data',
                 'message': '力量训练数据不足'
             }
         
-        # 按周分组
-        weekly_data = defaultdict(lambda: {'duration': 0, 'count': 0})
-        
-        for log_entry in strength_logs:
-            week_key = log_entry.log_date.isocalendar()[1]
-            weekly_data[week_key]['duration'] += log_entry.duration_minutes
-            weekly_data[week_key]['count'] += 1
-        
-        weeks = sorted(weekly_data.keys())
+        weeks, durations, _, counts = self._weekly_totals(columns, mask)
         if len(weeks) < 2:
             return {
                 'trend': 'insufficient_data',
                 'message': '力量训练数据不足'
             }
         
-        recent_weeks = weeks[-2:]
-        earlier_weeks = weeks[:-2] if len(weeks) > 2 else [weeks[0]]
-        
-        recent_avg_duration = sum([weekly_data[w]['duration'] for w in recent_weeks]) / len(recent_weeks)
-        earlier_avg_duration = sum([weekly_data[w]['duration'] for w in earlier_weeks]) / len(earlier_weeks)
-        
-        duration_change_pct = ((recent_avg_duration - earlier_avg_duration) / max(earlier_avg_duration, 1)) * 100
+        earlier = durations[:-2] if len(weeks) > 2 else durations[:1]
+        recent_avg_duration, duration_change_pct = self._duration_change_pct(durations[-2:], float(earlier.mean()))
         
         if duration_change_pct > 15:
             trend = 'improving'
@@ -197,50 +275,34 @@ class PerformanceAnalysisService:
             'message': message,
             'duration_change_pct': round(duration_change_pct, 1),
             'recent_avg_duration': round(recent_avg_duration, 0),
-            'frequency': sum([weekly_data[w]['count'] for w in recent_weeks]) / len(recent_weeks)
+            'frequency': float(counts[-2:].mean())
         }
     
     def _analyze_cardio_trend(
         self,
-        exercise_logs: List
+        columns: ExerciseLogColumns
     ) -> Dict:
         """
         分析有氧训练趋势
         基于有氧训练的运动时长和频率
         """
-        cardio_logs = [
-            log_entry for log_entry in exercise_logs
-            if self._is_cardio_training(log_entry)
-        ]
+        mask = (columns.categories & CATEGORY_CARDIO) != 0
         
-        if len(cardio_logs) < 4:
+        if int(mask.sum()) < 4:
             return {
                 'trend': 'insufficient_data',
                 'message': '有氧训练数据不足'
             }
         
-        # 按周分组
-        weekly_data = defaultdict(lambda: {'duration': 0, 'calories': 0})
-        
-        for log_entry in cardio_logs:
-            week_key = log_entry.log_date.isocalendar()[1]
-            weekly_data[week_key]['duration'] += log_entry.duration_minutes
-            weekly_data[week_key]['calories'] += float(log_entry.calories_burned or 0)
-        
-        weeks = sorted(weekly_data.keys())
+        weeks, durations, _, _ = self._weekly_totals(columns, mask)
         if len(weeks) < 2:
             return {
                 'trend': 'insufficient_data',
                 'message': '有氧训练数据不足'
             }
         
-        recent_weeks = weeks[-2:]
-        earlier_weeks = weeks[:-2] if len(weeks) > 2 else [weeks[0]]
-        
-        recent_avg_duration = sum([weekly_data[w]['duration'] for w in recent_weeks]) / len(recent_weeks)
-        earlier_avg_duration = sum([weekly_data[w]['duration'] for w in earlier_weeks]) / len(earlier_weeks)
-        
-        duration_change_pct = ((recent_avg_duration - earlier_avg_duration) / max(earlier_avg_duration, 1)) * 100
+        earlier = durations[:-2] if len(weeks) > 2 else durations[:1]
+        recent_avg_duration, duration_change_pct = self._duration_change_pct(durations[-2:], float(earlier.mean()))
         
         if duration_change_pct > 10:
             trend = 'improving'
@@ -261,16 +323,15 @@ class PerformanceAnalysisService:
     
     def _analyze_training_frequency(
         self,
-        exercise_logs: List,
+        columns: ExerciseLogColumns,
         start_date: date,
         end_date: date
     ) -> Dict:
         """
         分析训练频率
         """
-        training_days = set([log_entry.log_date for log_entry in exercise_logs])
+        training_days_count = int(len(np.unique(columns.dates)))
         total_days = (end_date - start_date).days + 1
-        training_days_count = len(training_days)
         
         frequency = (training_days_count / total_days) * 100 if total_days > 0 else 0
         
@@ -283,29 +344,25 @@ class PerformanceAnalysisService:
     
     def _analyze_training_intensity(
         self,
-        exercise_logs: List
+        columns: ExerciseLogColumns
     ) -> Dict:
         """
         分析训练强度
         基于平均MET值和总消耗
         """
-        if not exercise_logs:
+        if len(columns) == 0:
             return {
                 'avg_met': 0,
                 'total_calories': 0,
                 'intensity_level': 'low'
             }
         
-        total_calories = sum([float(log_entry.calories_burned or 0) for log_entry in exercise_logs])
-        total_duration = sum([log_entry.duration_minutes for log_entry in exercise_logs])
+        total_calories = float(columns.kcal.sum())
+        total_duration = int(columns.minutes.sum())
         
-        # 计算平均MET（简化计算）
-        met_values = []
-        for log_entry in exercise_logs:
-            if log_entry.exercise and log_entry.exercise.met_value:
-                met_values.append(float(log_entry.exercise.met_value))
-        
-        avg_met = sum(met_values) / len(met_values) if met_values else 0
+        # 计算平均MET（简化计算，忽略缺失MET的记录）
+        valid_met = columns.met[~np.isnan(columns.met)]
+        avg_met = float(valid_met.mean()) if len(valid_met) else 0
         
         # 判断强度水平
         if avg_met >= 6.0:
@@ -322,22 +379,6 @@ class PerformanceAnalysisService:
             'intensity_level': intensity_level
         }
     
-    def _is_strength_training(self, log_entry) -> bool:
-        """判断是否为力量训练"""
-        if not log_entry.exercise:
-            return False
-        
-        exercise_name = log_entry.exercise.name.lower()
-        return any(keyword in exercise_name for keyword in self.STRENGTH_KEYWORDS)
-    
-    def _is_cardio_training(self, log_entry) -> bool:
-        """判断是否为有氧训练"""
-        if not log_entry.exercise:
-            return False
-        
-        exercise_name = log_entry.exercise.name.lower()
-        return any(keyword in exercise_name for keyword in self.CARDIO_KEYWORDS)
-    
     def _generate_summary(
         self,
         overall_trend: Dict,
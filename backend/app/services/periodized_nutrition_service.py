@@ -2,8 +2,9 @@
 周期化营养策略服务
 根据训练日/休息日提供差异化的营养推荐
 """
+import calendar
 from datetime import date, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 
 from app.models.user import User
@@ -11,6 +12,7 @@ from app.schemas.log import CalorieRecommendation
 from app.services.calorie_calculator import CalorieCalculatorService
 from app.services.calorie_range_calculator import calculate_calorie_range
 from app.services.macro_calculator import calculate_all_macros
+from app.services.menstrual_cycle_service import menstrual_cycle_service
 from app.crud.crud_log import log
 
 
@@ -49,6 +51,9 @@ class PeriodizedNutritionService:
         }
     }
     
+    # 训练日的最少运动时长（分钟）
+    MIN_TRAINING_MINUTES = 20
+    
     # 休息日热量调整
     REST_DAY_ADJUSTMENTS = {
         'lose_weight': {
@@ -83,7 +88,8 @@ class PeriodizedNutritionService:
         user: User,
         target_date: date,
         base_recommendation: CalorieRecommendation,
-        db: Optional[Session] = None
+        db: Optional[Session] = None,
+        is_training_day: Optional[bool] = None
     ) -> CalorieRecommendation:
         """
         获取周期化营养推荐（根据训练日/休息日）
@@ -92,10 +98,12 @@ class PeriodizedNutritionService:
         :param target_date: 目标日期
         :param base_recommendation: 基础推荐
         :param db: 数据库会话（用于检查是否有训练）
+        :param is_training_day: 已知的训练日标记（如批量计算得到），提供时不再查询
         :return: 调整后的推荐
         """
         # 判断是否为训练日
-        is_training_day = self._is_training_day(user, target_date, db)
+        if is_training_day is None:
+            is_training_day = self._is_training_day(user, target_date, db)
         
         # 获取调整参数
         if is_training_day:
@@ -165,9 +173,12 @@ class PeriodizedNutritionService:
             if exercise_logs:
                 # 有运动记录，判断为训练日
                 total_duration = sum([log_entry.duration_minutes for log_entry in exercise_logs])
-                return total_duration >= 20  # 至少20分钟才算训练日
+                return total_duration >= self.MIN_TRAINING_MINUTES  # 至少20分钟才算训练日
         
-        # 如果没有数据库或没有记录，根据活动水平判断
+        return self._is_default_training_day(user, target_date)
+    
+    def _is_default_training_day(self, user: User, target_date: date) -> bool:
+        """没有数据库或没有运动记录时，根据活动水平判断是否为训练日"""
         # 高活动人群默认更多训练日
         if user.activity_level in ['very_active', 'extra_active']:
             # 简单规则：每周5-6天训练日
@@ -237,6 +248,84 @@ class PeriodizedNutritionService:
             }
         }
     
+    def get_training_day_flags(
+        self,
+        user: User,
+        start_date: date,
+        end_date: date,
+        db: Optional[Session] = None
+    ) -> Dict[date, bool]:
+        """
+        批量判断日期范围内每一天是否为训练日（与 _is_training_day 规则一致）
+        整个范围只执行一次按日期分组的运动时长查询
+        
+        :param user: 用户对象
+        :param start_date: 开始日期
+        :param end_date: 结束日期（包含）
+        :param db: 数据库会话
+        :return: {日期: 是否为训练日}
+        """
+        daily_minutes = {}
+        if db:
+            daily_minutes = dict(log.get_daily_exercise_minutes(
+                db,
+                user_id=user.id,
+                start_date=start_date,
+                end_date=end_date
+            ))
+        
+        flags = {}
+        current_date = start_date
+        while current_date <= end_date:
+            minutes = daily_minutes.get(current_date)
+            if minutes is not None:
+                flags[current_date] = int(minutes) >= self.MIN_TRAINING_MINUTES
+            else:
+                flags[current_date] = self._is_default_training_day(user, current_date)
+            current_date += timedelta(days=1)
+        return flags
+    
+    def _build_range_plan(
+        self,
+        user: User,
+        start_date: date,
+        end_date: date,
+        base_recommendation: CalorieRecommendation,
+        db: Optional[Session] = None
+    ) -> Dict:
+        """
+        构建日期范围内每天的周期化推荐
+        训练日标记一次性批量获取；推荐只取决于训练日/休息日，两种推荐各计算一次后复用；
+        女性用户附带每天的月经周期阶段（从缓存的周期日历查表）
+        """
+        flags = self.get_training_day_flags(user, start_date, end_date, db)
+        
+        cycle_phases = None
+        if user.gender == 'female' and getattr(user, 'last_period_start', None):
+            cycle_phases = menstrual_cycle_service.get_cycle_phase_range(
+                user, start_date, end_date, user.last_period_start
+            )
+        
+        recommendations: Dict[bool, CalorieRecommendation] = {}
+        plan = {}
+        for current_date, is_training_day in flags.items():
+            if is_training_day not in recommendations:
+                recommendations[is_training_day] = self.get_periodized_recommendation(
+                    user=user,
+                    target_date=current_date,
+                    base_recommendation=base_recommendation,
+                    is_training_day=is_training_day
+                )
+            plan[current_date.isoformat()] = {
+                'date': current_date.isoformat(),
+                'day_name': current_date.strftime('%A'),
+                'is_training_day': is_training_day,
+                'recommendation': recommendations[is_training_day]
+            }
+            if cycle_phases is not None:
+                plan[current_date.isoformat()]['cycle_info'] = cycle_phases[current_date.isoformat()]
+        return plan
+    
     def get_weekly_periodized_plan(
         self,
         user: User,
@@ -253,23 +342,13 @@ class PeriodizedNutritionService:
         :param db: 数据库会话
         :return: 包含每天推荐的字典
         """
-        weekly_plan = {}
-        
-        for i in range(7):
-            current_date = start_date + timedelta(days=i)
-            day_recommendation = self.get_periodized_recommendation(
-                user=user,
-                target_date=current_date,
-                base_recommendation=base_recommendation,
-                db=db
-            )
-            
-            weekly_plan[current_date.isoformat()] = {
-                'date': current_date.isoformat(),
-                'day_name': current_date.strftime('%A'),
-                'is_training_day': self._is_training_day(user, current_date, db),
-                'recommendation': day_recommendation
-            }
+        weekly_plan = self._build_range_plan(
+            user,
+            start_date,
+            start_date + timedelta(days=6),
+            base_recommendation,
+            db
+        )
         
         return {
             'start_date': start_date.isoformat(),
@@ -277,10 +356,49 @@ class PeriodizedNutritionService:
             'summary': self._generate_weekly_summary(weekly_plan)
         }
     
+    def get_monthly_periodized_calendar(
+        self,
+        user: User,
+        year: int,
+        month: int,
+        base_recommendation: CalorieRecommendation,
+        db: Optional[Session] = None
+    ) -> Dict:
+        """
+        获取一个月的周期化营养日历（查询次数与天数无关）
+        
+        :param user: 用户对象
+        :param year: 年
+        :param month: 月
+        :param base_recommendation: 基础推荐
+        :param db: 数据库会话
+        :return: 包含每天推荐、按周排列的日历和月度摘要的字典
+        """
+        first_day = date(year, month, 1)
+        last_day = date(year, month, calendar.monthrange(year, month)[1])
+        
+        daily_plan = self._build_range_plan(user, first_day, last_day, base_recommendation, db)
+        
+        # 按周（周一开始）排列的日历，不属于本月的日期为None
+        weeks: List[List[Optional[str]]] = [
+            [day.isoformat() if day.month == month else None for day in week]
+            for week in calendar.Calendar(firstweekday=0).monthdatescalendar(year, month)
+        ]
+        
+        return {
+            'year': year,
+            'month': month,
+            'start_date': first_day.isoformat(),
+            'end_date': last_day.isoformat(),
+            'daily_plan': daily_plan,
+            'weeks': weeks,
+            'summary': self._generate_weekly_summary(daily_plan)
+        }
+    
     def _generate_weekly_summary(self, weekly_plan: Dict) -> Dict:
-        """生成周计划摘要"""
+        """生成计划摘要（周计划和月历共用）"""
         training_days = sum([1 for day in weekly_plan.values() if day['is_training_day']])
-        rest_days = 7 - training_days
+        rest_days = len(weekly_plan) - training_days
         
         avg_training_kcal = sum([
             day['recommendation'].recommended_kcal 
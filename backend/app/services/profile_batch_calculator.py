@@ -0,0 +1,240 @@
+"""
+批量热量/营养素计算（向量化）
+一次性为一组 ProfileVector 计算 BMR、TDEE、热量区间和宏量营养素，
+计算规则与 calorie_calculator / calorie_range_calculator / macro_calculator 完全一致，
+用于批处理任务和假设分析（what-if）模拟
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from app.services.calorie_calculator import ACTIVITY_MULTIPLIERS, ProfileVector
+from app.services.macro_calculator import CALORIES_PER_GRAM
+
+
+def _column(profiles: Sequence[ProfileVector], field: str) -> np.ndarray:
+    """取出数值字段（None -> NaN）"""
+    return np.array(
+        [np.nan if getattr(p, field) is None else float(getattr(p, field)) for p in profiles],
+        dtype=np.float64
+    )
+
+
+def _labels(profiles: Sequence[ProfileVector], field: str) -> np.ndarray:
+    """取出字符串字段（None -> 空字符串）"""
+    return np.array([getattr(p, field) or '' for p in profiles], dtype=object)
+
+
+# Veltkamp 拆分常数（2^27 + 1），用于无误差乘法
+_SPLITTER = 134217729.0
+
+
+def _two_product(a: np.ndarray, b: float):
+    """无误差乘法（Dekker）：a * b == p + err（精确相等）"""
+    p = a * b
+    c = _SPLITTER * a
+    a_hi = c - (c - a)
+    a_lo = a - a_hi
+    c = _SPLITTER * b
+    b_hi = c - (c - b)
+    b_lo = b - b_hi
+    err = ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+    return p, err
+
+
+def _python_round(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    与内置 round() 一致的向量化舍入（按浮点数的精确值四舍六入五成双）
+    np.round 先计算 values * 10^digits，乘法的舍入误差会让接近 .5 的值舍入到另一侧；
+    这里取 floor(values * 10^digits) 为候选整数，再用无误差乘法精确比较 values 与两个候选值的中点
+    适用范围：|values| * 10^digits < 2^52
+    """
+    scale = 10.0 ** digits
+    with np.errstate(invalid='ignore', over='ignore'):
+        lower = np.floor(values * scale)
+        p, err = _two_product(values, 2 * scale)
+        # 符号与 2 * 10^digits * values - (2 * lower + 1) 的精确值相同
+        diff = (p - (2 * lower + 1)) + err
+        round_up = (diff > 0) | ((diff == 0) & (np.fmod(lower, 2) != 0))
+        result = (lower + round_up) / scale
+    return np.where(np.isfinite(values), result, values)
+
+
+def calculate_bmr_batch(profiles: Sequence[ProfileVector], prefer_katch_mcardle: bool = True) -> np.ndarray:
+    """
+    批量计算BMR（规则同 calculate_bmr）
+    :param profiles: 用户资料列表
+    :param prefer_katch_mcardle: 如果有体脂率数据，是否优先使用Katch-McArdle公式
+    :return: BMR数组，资料不完整的为0
+    """
+    weight = _column(profiles, 'weight_kg')
+    height = _column(profiles, 'height_cm')
+    age = _column(profiles, 'age')
+    body_fat = _column(profiles, 'body_fat_pct')
+    gender = _labels(profiles, 'gender')
+
+    # Mifflin-St Jeor（体重/身高为0或缺失时与原函数一样返回0）
+    sex_constant = np.where(gender == 'male', 5.0, -161.0)
+    mifflin_valid = (np.nan_to_num(weight) != 0) & (np.nan_to_num(height) != 0) & ~np.isnan(age) & (gender != '')
+    with np.errstate(invalid='ignore'):
+        mifflin = np.maximum(0, 10 * weight + 6.25 * height - 5 * age + sex_constant)
+    mifflin = np.where(mifflin_valid, mifflin, 0.0)
+
+    if not prefer_katch_mcardle:
+        return mifflin
+
+    # Katch-McArdle（需要体脂率）
+    katch_valid = (np.nan_to_num(weight) != 0) & (np.nan_to_num(body_fat) != 0)
+    with np.errstate(invalid='ignore'):
+        katch = np.maximum(0, 370 + 21.6 * weight * (1 - body_fat / 100))
+    katch = np.where(katch_valid, katch, 0.0)
+
+    return np.where(katch > 0, katch, mifflin)
+
+
+def calculate_tdee_batch(profiles: Sequence[ProfileVector], bmr: np.ndarray) -> np.ndarray:
+    """批量计算TDEE（规则同 calculate_tdee）"""
+    multipliers = np.array(
+        [ACTIVITY_MULTIPLIERS.get(p.activity_level, 1.2) for p in profiles],
+        dtype=np.float64
+    )
+    return bmr * multipliers
+
+
+def calculate_calorie_range_batch(profiles: Sequence[ProfileVector], tdee: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算热量区间（规则同 calculate_calorie_range，不含文字说明）
+    :return: {'min_kcal', 'recommended_kcal', 'max_kcal'}
+    """
+    goal = _labels(profiles, 'goal')
+    experience = _labels(profiles, 'training_experience')
+    body_fat = np.nan_to_num(_column(profiles, 'body_fat_pct'))
+
+    # 相对TDEE的系数：(最低, 推荐, 最高)
+    lose_high_fat = body_fat > 30
+    lose_low_fat = (body_fat > 0) & (body_fat < 15)
+    conditions = [
+        (goal == 'lose_weight') & lose_high_fat,
+        (goal == 'lose_weight') & lose_low_fat,
+        goal == 'lose_weight',
+        (goal == 'gain_muscle') & (experience == 'beginner'),
+        (goal == 'gain_muscle') & (experience == 'advanced'),
+        goal == 'gain_muscle',
+        goal == 'gain_weight',
+    ]
+    factors = [
+        (0.70, 0.75, 0.80),
+        (0.80, 0.85, 0.90),
+        (0.75, 0.80, 0.85),
+        (1.10, 1.15, 1.20),
+        (1.05, 1.08, 1.12),
+        (1.05, 1.10, 1.15),
+        (1.10, 1.15, 1.20),
+    ]
+    # 体态重组和维持：95% / 100% / 105%
+    default = (0.95, 1.00, 1.05)
+
+    result = {}
+    for index, key in enumerate(('min_kcal', 'recommended_kcal', 'max_kcal')):
+        factor = np.select(conditions, [f[index] for f in factors], default=default[index])
+        result[key] = _python_round(tdee * factor, 0)
+    return result
+
+
+def calculate_macros_batch(profiles: Sequence[ProfileVector], recommended_kcal: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算宏量营养素（规则同 calculate_all_macros）
+    :return: {'protein_g', 'protein_min_g', 'protein_max_g', 'fat_g', 'fat_min_g', 'fat_max_g', 'carbs_g'}
+    """
+    goal = _labels(profiles, 'goal')
+    gender = _labels(profiles, 'gender')
+    experience = _labels(profiles, 'training_experience')
+    activity = _labels(profiles, 'activity_level')
+    weight = _column(profiles, 'weight_kg')
+
+    # 蛋白质（g/kg）：(最低, 推荐, 最高)
+    protein_conditions = [
+        goal == 'maintain',
+        (goal == 'lose_weight') & (gender == 'female'),
+        goal == 'lose_weight',
+        (goal == 'gain_muscle') & (experience == 'beginner'),
+        goal == 'gain_muscle',
+        goal == 'body_recomposition',
+    ]
+    protein_factors = [
+        (0.8, 0.9, 1.0),
+        (1.8, 2.0, 2.2),
+        (1.6, 1.8, 2.2),
+        (1.6, 1.8, 2.0),
+        (1.8, 2.0, 2.2),
+        (2.0, 2.2, 2.4),
+    ]
+    protein_default = (1.2, 1.4, 1.6)  # gain_weight
+    protein = [
+        _python_round(weight * np.select(protein_conditions, [f[i] for f in protein_factors], default=protein_default[i]), 1)
+        for i in range(3)
+    ]
+
+    # 脂肪（占总热量比例）：(最低, 推荐, 最高)
+    fat_conditions = [goal == 'lose_weight', goal == 'gain_muscle', goal == 'body_recomposition']
+    fat_factors = [(0.25, 0.28, 0.30), (0.20, 0.23, 0.25), (0.22, 0.25, 0.28)]
+    fat_default = (0.25, 0.30, 0.35)
+    fat_pct = [np.select(fat_conditions, [f[i] for f in fat_factors], default=fat_default[i]) for i in range(3)]
+    # 女性最低脂肪需求不低于25%
+    is_female = gender == 'female'
+    fat_pct[0] = np.where(is_female, np.maximum(fat_pct[0], 0.25), fat_pct[0])
+    fat_pct[1] = np.where(is_female & (fat_pct[1] < 0.25), 0.25, fat_pct[1])
+    fat = [_python_round(recommended_kcal * pct / CALORIES_PER_GRAM['fat'], 1) for pct in fat_pct]
+
+    # 碳水（剩余热量，高活动人群碳水比例低于40%时从脂肪中调整5%）
+    carb_kcal = (
+        recommended_kcal
+        - protein[1] * CALORIES_PER_GRAM['protein']
+        - fat[1] * CALORIES_PER_GRAM['fat']
+    )
+    high_activity = np.isin(activity, ['very_active', 'extra_active'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        low_carb = (carb_kcal / recommended_kcal) * 100 < 40
+    carb_kcal = np.where(high_activity & low_carb, carb_kcal + recommended_kcal * 0.05, carb_kcal)
+    carbs = _python_round(carb_kcal / CALORIES_PER_GRAM['carbs'], 1)
+
+    return {
+        'protein_min_g': protein[0],
+        'protein_g': protein[1],
+        'protein_max_g': protein[2],
+        'fat_min_g': fat[0],
+        'fat_g': fat[1],
+        'fat_max_g': fat[2],
+        'carbs_g': carbs
+    }
+
+
+def calculate_targets_batch(
+    profiles: Sequence[ProfileVector],
+    prefer_katch_mcardle: bool = True,
+    recommended_kcal: np.ndarray = None
+) -> Dict[str, np.ndarray]:
+    """
+    批量完整计算：BMR -> TDEE -> 热量区间 -> 宏量营养素
+
+    :param profiles: 用户资料列表
+    :param prefer_katch_mcardle: 如果有体脂率数据，是否优先使用Katch-McArdle公式
+    :param recommended_kcal: 指定的推荐热量（如模拟不同热量），默认使用热量区间的推荐值
+    :return: 各项指标的数组，无法计算TDEE的资料对应位置为0
+    """
+    bmr = calculate_bmr_batch(profiles, prefer_katch_mcardle)
+    tdee = calculate_tdee_batch(profiles, bmr)
+    calorie_range = calculate_calorie_range_batch(profiles, tdee)
+    if recommended_kcal is None:
+        recommended_kcal = calorie_range['recommended_kcal']
+    else:
+        recommended_kcal = np.asarray(recommended_kcal, dtype=np.float64)
+
+    valid = tdee > 0
+    macros = calculate_macros_batch(profiles, np.where(valid, recommended_kcal, 1.0))
+
+    result = {'bmr': bmr, 'tdee': tdee, **calorie_range, 'recommended_kcal': recommended_kcal, **macros}
+    for key, values in result.items():
+        if key not in ('bmr', 'tdee'):
+            result[key] = np.where(valid, values, 0.0)
+    return result
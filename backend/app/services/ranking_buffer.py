@@ -0,0 +1,313 @@
+"""
+排行榜写缓冲 - Write-behind
+运动记录的排行榜增量先写入本地（内存 + 追加写的落盘文件），由后台线程批量写入Redis。
+Redis不可用时增量保留在本地，恢复后按幂等Key重放，不会丢失也不会重复计入。
+幂等Key为运动记录ID；没有运动记录ID的增量在记录时生成UUID，随增量一起落盘。
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.ranking_service import RankingService, ranking_service
+
+
+class RankingWriteBuffer:
+    """排行榜写缓冲"""
+
+    SPILL_FILE_PREFIX = 'ranking_spill_'
+    # 缓冲未清空时，落盘文件行数超过 max(该值, 4 × 未写入数) 才压缩，保证每条增量的磁盘开销均摊为O(1)
+    SPILL_COMPACT_MIN_LINES = 10000
+
+    def __init__(
+        self,
+        service: RankingService,
+        spill_dir: str,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_retry_interval: float = 30.0
+    ):
+        """
+        :param service: 排行榜服务
+        :param spill_dir: 落盘文件目录
+        :param batch_size: 每次写入Redis的最大记录数
+        :param flush_interval: 后台线程的写入间隔（秒）
+        :param max_retry_interval: Redis不可用时的最大重试间隔（秒）
+        """
+        self.service = service
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_interval = max_retry_interval
+
+        self._pending: "OrderedDict[str, Dict]" = OrderedDict()  # 幂等Key -> 增量
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spill_path = os.path.join(spill_dir, f"{self.SPILL_FILE_PREFIX}{os.getpid()}.jsonl")
+        self._spill_file = None
+        self._spill_lines = 0  # 落盘文件当前的行数（含已写入Redis的增量）
+
+        # 统计指标
+        self.redis_available = True
+        self.recorded = 0
+        self.applied = 0
+        self.duplicates = 0
+        self.failed_flushes = 0
+
+    @staticmethod
+    def _idempotency_key(delta: Dict) -> str:
+        if delta.get('exercise_log_id') is not None:
+            return f"log:{delta['exercise_log_id']}"
+        return f"anon:{delta['delta_id']}"
+
+    def start(self):
+        """启动后台写入线程，并恢复上次未写入的落盘数据"""
+        if self._thread is not None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._recover_spill_files()
+        self._spill_file = open(self._spill_path, 'a', encoding='utf-8')
+        self._rewrite_spill_file()
+        self._thread = threading.Thread(target=self._run, name='ranking-write-buffer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台线程，并尝试写入剩余数据（写不进去的保留在落盘文件中）"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def record(
+        self,
+        *,
+        user_id: int,
+        calories: float,
+        user_identity: str,
+        log_date: date,
+        exercise_log_id: Optional[int] = None
+    ):
+        """
+        记录一条排行榜增量（只写本地，不访问Redis）
+        :param user_id: 用户ID
+        :param calories: 消耗的热量
+        :param user_identity: 用户身份
+        :param log_date: 记录日期
+        :param exercise_log_id: 运动记录ID（幂等Key）
+        """
+        delta = {
+            'user_id': user_id,
+            'calories': calories,
+            'user_identity': user_identity,
+            'log_date': log_date,
+            'exercise_log_id': exercise_log_id,
+            # 没有运动记录ID时生成UUID作为幂等Key（落盘后重放时保持不变）
+            'delta_id': uuid.uuid4().hex if exercise_log_id is None else None
+        }
+        key = self._idempotency_key(delta)
+
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending[key] = delta
+            self.recorded += 1
+            self._append_spill(delta)
+
+        if self._thread is None:
+            # 后台线程未启动（如脚本或测试中），直接同步写入
+            self.flush()
+        else:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        将缓冲中的增量分批写入Redis，直到清空或Redis不可用
+        :return: 本次写入的记录数
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(self._pending.items())[:self.batch_size]
+                if not batch:
+                    break
+
+                try:
+                    applied = self.service.apply_ranking_deltas([delta for _, delta in batch])
+                except Exception as e:
+                    if self.redis_available:
+                        logging.warning(f"Ranking write buffer: Redis unavailable, keeping {len(self._pending)} deltas locally: {e}")
+                    self.redis_available = False
+                    self.failed_flushes += 1
+                    break
+
+                if not self.redis_available:
+                    logging.info("Ranking write buffer: Redis recovered, replaying buffered deltas")
+                self.redis_available = True
+                self.applied += applied
+                self.duplicates += len(batch) - applied
+                written += len(batch)
+
+                with self._lock:
+                    for key, _ in batch:
+                        self._pending.pop(key, None)
+
+            if written:
+                with self._lock:
+                    self._compact_spill_file()
+        return written
+
+    def stats(self) -> Dict:
+        """获取写缓冲统计信息"""
+        with self._lock:
+            return {
+                'redis_available': self.redis_available,
+                'pending': len(self._pending),
+                'recorded': self.recorded,
+                'applied': self.applied,
+                'duplicates': self.duplicates,
+                'failed_flushes': self.failed_flushes
+            }
+
+    def _run(self):
+        retry_interval = self.flush_interval
+        while not self._stopping.is_set():
+            self._wakeup.wait(retry_interval)
+            self._wakeup.clear()
+            self.flush()
+            # Redis不可用时指数退避，避免频繁重试
+            if self.redis_available:
+                retry_interval = self.flush_interval
+            else:
+                retry_interval = min(retry_interval * 2, self.max_retry_interval)
+
+    def _append_spill(self, delta: Dict):
+        """追加写入落盘文件（调用方需持有锁）"""
+        if self._spill_file is None:
+            return
+        try:
+            self._spill_file.write(json.dumps(self._serialize(delta)) + '\n')
+            self._spill_file.flush()
+            self._spill_lines += 1
+        except OSError as e:
+            logging.error(f"Ranking write buffer: failed to spill delta: {e}")
+
+    def _compact_spill_file(self):
+        """
+        写入Redis后清理落盘文件（调用方需持有锁）
+        缓冲已清空时直接截断；否则只在文件明显大于未写入数据时重写，
+        残留的已写入增量在重放时由Redis端的幂等集合跳过
+        """
+        if self._spill_file is None:
+            return
+        if not self._pending:
+            try:
+                self._spill_file.seek(0)
+                self._spill_file.truncate()
+                self._spill_lines = 0
+            except OSError as e:
+                logging.error(f"Ranking write buffer: failed to truncate spill file: {e}")
+        elif self._spill_lines > max(self.SPILL_COMPACT_MIN_LINES, 4 * len(self._pending)):
+            self._rewrite_spill_file()
+
+    def _rewrite_spill_file(self):
+        """用当前未写入的增量重写落盘文件（调用方需持有锁）"""
+        if self._spill_file is None:
+            return
+        try:
+            self._spill_file.close()
+            tmp_path = f"{self._spill_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for delta in self._pending.values():
+                    f.write(json.dumps(self._serialize(delta)) + '\n')
+            os.replace(tmp_path, self._spill_path)
+            self._spill_lines = len(self._pending)
+        except OSError as e:
+            logging.error(f"Ranking write buffer: failed to compact spill file: {e}")
+        finally:
+            self._spill_file = open(self._spill_path, 'a', encoding='utf-8')
+
+    def _recover_spill_files(self):
+        """
+        加载上次未写入的落盘数据
+        包括本进程ID对应的文件，以及已退出进程遗留的文件（通过重命名认领，避免多个进程重复加载）
+        """
+        pattern = os.path.join(self.spill_dir, f"{self.SPILL_FILE_PREFIX}*.jsonl")
+        for path in glob.glob(pattern):
+            if path != self._spill_path:
+                pid_str = os.path.basename(path)[len(self.SPILL_FILE_PREFIX):-len('.jsonl')]
+                if pid_str.isdigit() and self._is_process_alive(int(pid_str)):
+                    continue
+            claimed_path = f"{path}.claimed.{os.getpid()}"
+            try:
+                os.replace(path, claimed_path)
+            except OSError:
+                continue  # 已被其他进程认领
+
+            recovered = 0
+            with open(claimed_path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        delta = self._deserialize(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue  # 写入中断产生的不完整行
+                    key = self._idempotency_key(delta)
+                    if key not in self._pending:
+                        self._pending[key] = delta
+                        recovered += 1
+            os.remove(claimed_path)
+            if recovered:
+                logging.info(f"Ranking write buffer: recovered {recovered} deltas from {path}")
+
+    @staticmethod
+    def _is_process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _serialize(delta: Dict) -> Dict:
+        return {**delta, 'log_date': delta['log_date'].isoformat()}
+
+    @staticmethod
+    def _deserialize(data: Dict) -> Dict:
+        return {
+            'user_id': int(data['user_id']),
+            'calories': float(data['calories']),
+            'user_identity': data['user_identity'],
+            'log_date': date.fromisoformat(data['log_date']),
+            'exercise_log_id': data.get('exercise_log_id'),
+            # 旧版本落盘的匿名增量没有ID，加载时补一个
+            'delta_id': data.get('delta_id') or (uuid.uuid4().hex if data.get('exercise_log_id') is None else None)
+        }
+
+
+# 创建全局实例
+ranking_write_buffer = RankingWriteBuffer(
+    ranking_service,
+    spill_dir=settings.RANKING_SPILL_DIR,
+    batch_size=settings.RANKING_BUFFER_BATCH_SIZE,
+    flush_interval=settings.RANKING_BUFFER_FLUSH_INTERVAL
+)
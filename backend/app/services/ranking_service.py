@@ -1,9 +1,14 @@
 """
 排行榜服务 - 使用Redis Sorted Set实现实时排行榜
 """
+import logging
+import threading
 import redis
-from datetime import datetime, date
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
 from typing import List, Optional, Dict, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.db.redis_client import get_redis
 from app.models.user import User
 
@@ -20,15 +25,177 @@ class RankingService:
         'health_care': 'health_care'
     }
     
+    # 滚动窗口榜单（基于日榜 ZUNIONSTORE 聚合），值为窗口天数
+    ROLLING_PERIODS = {
+        'last_7_days': 7,
+        'last_30_days': 30
+    }
+    
+    # 日榜保留天数（需覆盖最长的滚动窗口）
+    DAY_RANK_TTL_DAYS = 31
+    
+    # 历史滚动榜缓存时间（秒）；包含今天的窗口保留到当天结束
+    # 已合并的滚动榜由写入脚本增量累加，不需要靠过期来刷新
+    ROLLING_HISTORY_CACHE_TTL = 3600
+    
+    # 用户排名降级快照最多保留的条目数（超过后淘汰最久未读取的条目）
+    USER_RANKING_SNAPSHOT_MAX_ENTRIES = 10000
+    
+    # 分布直方图：每个榜单固定桶数，桶宽 = 单日桶宽 × 周期天数（最后一个桶包含所有更高分数）
+    # 周/月/年榜的分数是多天累加，按单日桶宽分桶会让绝大多数用户落入最后一个桶
+    HISTOGRAM_BUCKET_KCAL = 100
+    HISTOGRAM_BUCKET_COUNT = 50
+    HISTOGRAM_PERIOD_DAYS = {
+        'day': 1,
+        'last_7_days': 7,
+        'last_30_days': 30,
+        'month': 31,
+        'year': 366
+    }
+    
+    # 直方图公共函数：
+    # bucket: 计算分数所在的桶序号
+    # build_histogram: 榜单存在而直方图不存在时（如直方图上线前已有的榜单），按桶区间ZCOUNT生成直方图，
+    #                  O(桶数 × logN)，不扫描全榜；过期时间与榜单一致
+    HISTOGRAM_LUA_FUNCTIONS = """
+    local function bucket(score, width, max_bucket)
+        local b = math.floor(tonumber(score) / tonumber(width))
+        if b < 0 then b = 0 end
+        if b > max_bucket then b = max_bucket end
+        return b
+    end
+    local function build_histogram(board, hist, width, max_bucket)
+        if redis.call('EXISTS', hist) == 1 or redis.call('EXISTS', board) == 0 then
+            return
+        end
+        width = tonumber(width)
+        for b = 0, max_bucket do
+            local min_score = b * width
+            if b == 0 then min_score = '-inf' end
+            local max_score = '(' .. ((b + 1) * width)
+            if b == max_bucket then max_score = '+inf' end
+            local count = redis.call('ZCOUNT', board, min_score, max_score)
+            if count > 0 then
+                redis.call('HSET', hist, b, count)
+            end
+        end
+        local ttl = redis.call('PTTL', board)
+        if ttl > 0 then
+            redis.call('PEXPIRE', hist, ttl)
+        end
+    end
+    """
+    
+    # 为已有榜单补建直方图（直方图已存在或榜单不存在时不做任何事）
+    # KEYS[1]: 榜单Key, KEYS[2]: 直方图Key
+    # ARGV[1]: 桶宽, ARGV[2]: 最大桶序号
+    BUILD_HISTOGRAM_LUA = HISTOGRAM_LUA_FUNCTIONS + """
+    build_histogram(KEYS[1], KEYS[2], ARGV[1], tonumber(ARGV[2]))
+    return 1
+    """
+    
+    # 合并滚动窗口内的日榜并生成直方图；窗口为空时写入空窗口标记
+    # 与写入脚本互斥执行，合并期间的新记录要么已在日榜中，要么会被累加到合并结果上
+    # KEYS[1]: 滚动榜Key, KEYS[2]: 直方图Key, KEYS[3]: 空窗口标记Key, KEYS[4..]: 窗口内的日榜Key
+    # ARGV[1]: 过期时间, ARGV[2]: 桶宽, ARGV[3]: 最大桶序号
+    MATERIALIZE_ROLLING_LUA = HISTOGRAM_LUA_FUNCTIONS + """
+    local day_keys = {}
+    for i = 4, #KEYS do
+        day_keys[#day_keys + 1] = KEYS[i]
+    end
+    redis.call('DEL', KEYS[2], KEYS[3])
+    local size = redis.call('ZUNIONSTORE', KEYS[1], #day_keys, unpack(day_keys))
+    if size == 0 then
+        redis.call('SET', KEYS[3], 1, 'EX', ARGV[1])
+        return 0
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    build_histogram(KEYS[1], KEYS[2], ARGV[2], tonumber(ARGV[3]))
+    return size
+    """
+    
+    # 一次运动记录对所有相关榜单的更新：累加分数，同时将用户从旧分数所在的桶移到新分数所在的桶
+    # 直方图不存在时先按当前榜单补建，再应用增量
+    # 已合并的滚动榜（或空窗口标记）存在时同样累加，不存在时跳过（下次读取时从日榜合并）
+    # 传入幂等Key时先写入当天的已处理集合，重复的记录直接跳过（用于离线缓冲重放）
+    # KEYS[1]: 幂等集合Key, KEYS[2..]: 成对的 榜单Key、直方图Key，之后是三个一组的 滚动榜Key、直方图Key、空窗口标记Key
+    # ARGV[1]: 用户ID, ARGV[2]: 增量, ARGV[3]: 最大桶序号,
+    # ARGV[4]: 幂等Key（空字符串表示不检查）, ARGV[5]: 幂等集合过期时间, ARGV[6]: 固定周期榜单数量,
+    # ARGV[7..]: 每个固定周期榜单成对的 过期时间、桶宽，之后是每个滚动榜的桶宽
+    APPLY_RANKING_DELTA_LUA = HISTOGRAM_LUA_FUNCTIONS + """
+    local max_bucket = tonumber(ARGV[3])
+    local function add_score(board, hist, width)
+        build_histogram(board, hist, width, max_bucket)
+        local old_score = redis.call('ZSCORE', board, ARGV[1])
+        local new_score = redis.call('ZINCRBY', board, ARGV[2], ARGV[1])
+        local new_bucket = bucket(new_score, width, max_bucket)
+        if old_score then
+            local old_bucket = bucket(old_score, width, max_bucket)
+            if old_bucket ~= new_bucket then
+                redis.call('HINCRBY', hist, old_bucket, -1)
+                redis.call('HINCRBY', hist, new_bucket, 1)
+            end
+        else
+            redis.call('HINCRBY', hist, new_bucket, 1)
+        end
+    end
+    if ARGV[4] ~= '' then
+        if redis.call('SADD', KEYS[1], ARGV[4]) == 0 then
+            return 0
+        end
+        redis.call('EXPIRE', KEYS[1], ARGV[5])
+    end
+    local fixed = tonumber(ARGV[6])
+    local arg = 7
+    for i = 1, fixed do
+        local board = KEYS[2 * i]
+        local hist = KEYS[2 * i + 1]
+        local ttl = ARGV[arg]
+        add_score(board, hist, ARGV[arg + 1])
+        redis.call('EXPIRE', board, ttl)
+        redis.call('EXPIRE', hist, ttl)
+        arg = arg + 2
+    end
+    for i = 2 + 2 * fixed, #KEYS, 3 do
+        local board = KEYS[i]
+        local hist = KEYS[i + 1]
+        local empty = KEYS[i + 2]
+        if redis.call('EXISTS', board) == 1 then
+            add_score(board, hist, ARGV[arg])
+        elseif redis.call('EXISTS', empty) == 1 then
+            -- 空窗口的第一条记录：用榜单替换标记，沿用标记的过期时间
+            local ttl = redis.call('PTTL', empty)
+            redis.call('DEL', empty)
+            add_score(board, hist, ARGV[arg])
+            if ttl > 0 then
+                redis.call('PEXPIRE', board, ttl)
+                redis.call('PEXPIRE', hist, ttl)
+            end
+        end
+        arg = arg + 1
+    end
+    return 1
+    """
+    
     def __init__(self):
         self.redis_client = get_redis()
+        self._apply_ranking_delta = self.redis_client.register_script(self.APPLY_RANKING_DELTA_LUA)
+        self._build_histogram = self.redis_client.register_script(self.BUILD_HISTOGRAM_LUA)
+        self._materialize_rolling = self.redis_client.register_script(self.MATERIALIZE_ROLLING_LUA)
+        # Top N热点读缓存：同一进程内相同的(period, limit, identity, date)请求合并为一次Redis调用
+        # Redis不可用时返回最近一次成功读取的结果（过期快照）
+        self._top_rankings_cache = TTLCache(ttl_seconds=settings.RANKING_TOP_CACHE_TTL_SECONDS, serve_stale=True)
+        # 用户排名不缓存，仅保留最近一次成功读取的结果用于Redis不可用时降级（LRU，O(1)淘汰）
+        self._user_ranking_snapshot: OrderedDict = OrderedDict()
+        self._user_ranking_snapshot_lock = threading.Lock()
+        self._user_ranking_stale_hits = 0
     
     def _get_rank_key(self, period: str, identity: Optional[str] = None, time_str: str = None) -> str:
         """
         生成排行榜Redis Key
-        :param period: 周期类型 ('day', 'month', 'year')
+        :param period: 周期类型 ('day', 'month', 'year', 'last_7_days', 'last_30_days')
         :param identity: 身份类型，None表示总榜
-        :param time_str: 时间字符串，格式为 YYYYMMDD (日), YYYYMM (月), YYYY (年)
+        :param time_str: 时间字符串，格式为 YYYYMMDD (日), YYYYMM (月), YYYY (年)；滚动榜为窗口结束日 YYYYMMDD
         :return: Redis Key
         """
         if identity:
@@ -49,48 +216,203 @@ class RankingService:
             return target_date.strftime('%Y%m')
         elif period == 'year':
             return target_date.strftime('%Y')
+        elif period in self.ROLLING_PERIODS:
+            # 滚动榜以窗口结束日标识，跨天后自动切换到新的Key
+            return target_date.strftime('%Y%m%d')
         else:
             raise ValueError(f"Invalid period: {period}")
     
-    def update_ranking(self, user_id: int, calories: float, user_identity: str, log_date: date):
+    def _get_histogram_key(self, rank_key: str) -> str:
+        """
+        生成榜单对应的分布直方图Redis Key（Hash，field为桶序号，value为人数）
+        :param rank_key: 榜单Redis Key
+        :return: 直方图Redis Key
+        """
+        return f"{rank_key}:hist"
+    
+    def _get_empty_marker_key(self, rank_key: str) -> str:
+        """
+        生成滚动榜空窗口标记Key（窗口内没有任何记录时写入，避免每次读取都重新合并日榜）
+        :param rank_key: 滚动榜Redis Key
+        :return: 标记Redis Key
+        """
+        return f"{rank_key}:empty"
+    
+    def _get_applied_key(self, day_str: str) -> str:
+        """
+        生成已计入排行榜的运动记录ID集合Key（按记录日期分组，用于幂等重放）
+        :param day_str: 日期字符串 YYYYMMDD
+        :return: Redis Key
+        """
+        return f"rank:applied:{day_str}"
+    
+    def _get_bucket_kcal(self, period: str) -> int:
+        """计算榜单直方图的桶宽（单日桶宽 × 周期天数）"""
+        return self.HISTOGRAM_BUCKET_KCAL * self.HISTOGRAM_PERIOD_DAYS[period]
+    
+    def _get_bucket_index(self, calories: float, period: str) -> int:
+        """计算热量在该周期直方图中所在的桶序号"""
+        index = int(calories // self._get_bucket_kcal(period))
+        return max(0, min(index, self.HISTOGRAM_BUCKET_COUNT - 1))
+    
+    def _queue_build_histogram(self, pipeline, key: str, period: str):
+        """将补建直方图加入Pipeline（直方图已存在时不做任何事）"""
+        self._build_histogram(
+            keys=[key, self._get_histogram_key(key)],
+            args=[self._get_bucket_kcal(period), self.HISTOGRAM_BUCKET_COUNT - 1],
+            client=pipeline
+        )
+    
+    def _get_board_key(self, period: str, identity: Optional[str], target_date: date) -> str:
+        """
+        获取榜单Key，滚动榜未命中缓存时先合并日榜
+        :param period: 周期类型
+        :param identity: 身份类型，None表示总榜
+        :param target_date: 目标日期
+        :return: Redis Key
+        """
+        key = self._get_rank_key(period, identity, self._get_time_string(target_date, period))
+        if period in self.ROLLING_PERIODS and not self.redis_client.exists(key, self._get_empty_marker_key(key)):
+            self._materialize_rolling_ranking(key, period, identity, target_date)
+        return key
+    
+    def _materialize_rolling_ranking(self, key: str, period: str, identity: Optional[str], target_date: date):
+        """
+        将滚动窗口内的日榜合并到缓存Key（懒加载，首次请求时计算）
+        合并后的新记录由写入脚本增量累加；包含今天的窗口保留到当天结束，历史窗口保留 ROLLING_HISTORY_CACHE_TTL 秒
+        :param key: 滚动榜Redis Key
+        :param period: 滚动周期类型 ('last_7_days', 'last_30_days')
+        :param identity: 身份类型，None表示总榜
+        :param target_date: 窗口结束日期（包含）
+        """
+        days = self.ROLLING_PERIODS[period]
+        day_keys = [
+            self._get_rank_key('day', identity, self._get_time_string(target_date - timedelta(days=i), 'day'))
+            for i in range(days)
+        ]
+        
+        if target_date >= date.today():
+            end_of_day = datetime.combine(target_date + timedelta(days=1), datetime.min.time())
+            ttl = max(1, int((end_of_day - datetime.now()).total_seconds()))
+        else:
+            ttl = self.ROLLING_HISTORY_CACHE_TTL
+        
+        self._materialize_rolling(
+            keys=[key, self._get_histogram_key(key), self._get_empty_marker_key(key), *day_keys],
+            args=[ttl, self._get_bucket_kcal(period), self.HISTOGRAM_BUCKET_COUNT - 1]
+        )
+    
+    def update_ranking(
+        self,
+        user_id: int,
+        calories: float,
+        user_identity: str,
+        log_date: date,
+        exercise_log_id: Optional[int] = None
+    ):
         """
         更新排行榜（使用Pipeline批量更新）
+        每个榜单的分数与分布直方图在同一个Lua脚本中原子更新
         :param user_id: 用户ID
         :param calories: 消耗的热量
         :param user_identity: 用户身份
         :param log_date: 记录日期
+        :param exercise_log_id: 运动记录ID，传入时作为幂等Key，同一条记录只会计入一次
+        """
+        self.apply_ranking_deltas([{
+            'user_id': user_id,
+            'calories': calories,
+            'user_identity': user_identity,
+            'log_date': log_date,
+            'exercise_log_id': exercise_log_id
+        }])
+    
+    def apply_ranking_deltas(self, deltas: List[Dict]) -> int:
+        """
+        批量更新排行榜（一次Pipeline往返）
+        :param deltas: 更新列表，每个元素包含 user_id, calories, user_identity, log_date, exercise_log_id(可选), delta_id(可选)
+        :return: 实际生效的记录数（已处理过的幂等Key会被跳过）
         """
-        import time
         pipeline = self.redis_client.pipeline()
-        
+        for delta in deltas:
+            self._queue_ranking_delta(pipeline, **delta)
+        results = pipeline.execute()
+        return sum(1 for result in results if result == 1)
+    
+    def _queue_ranking_delta(
+        self,
+        pipeline,
+        user_id: int,
+        calories: float,
+        user_identity: str,
+        log_date: date,
+        exercise_log_id: Optional[int] = None,
+        delta_id: Optional[str] = None
+    ):
+        """
+        将一条运动记录对所有相关榜单的更新加入Pipeline
+        幂等Key优先使用运动记录ID，没有时使用写缓冲生成的增量ID
+        """
         # 生成时间字符串
         day_str = self._get_time_string(log_date, 'day')
         month_str = self._get_time_string(log_date, 'month')
         year_str = self._get_time_string(log_date, 'year')
         
-        # 更新总榜（日、月、年）
-        # 使用zincrby累加热量，Redis会自动处理排序
-        pipeline.zincrby(self._get_rank_key('day', None, day_str), calories, str(user_id))
-        pipeline.zincrby(self._get_rank_key('month', None, month_str), calories, str(user_id))
-        pipeline.zincrby(self._get_rank_key('year', None, year_str), calories, str(user_id))
+        # 过期时间（日榜31天，月榜2个月，年榜1年）
+        # 日榜需覆盖最长的滚动窗口（30天）
+        day_ttl = self.DAY_RANK_TTL_DAYS * 24 * 3600
+        periods = [
+            ('day', day_str, day_ttl),
+            ('month', month_str, 60 * 24 * 3600),
+            ('year', year_str, 365 * 24 * 3600)
+        ]
         
-        # 更新身份分榜（日、月、年）
+        # 总榜 + 身份分榜
+        identities = [None]
         if user_identity in self.IDENTITY_MAP:
-            pipeline.zincrby(self._get_rank_key('day', user_identity, day_str), calories, str(user_id))
-            pipeline.zincrby(self._get_rank_key('month', user_identity, month_str), calories, str(user_id))
-            pipeline.zincrby(self._get_rank_key('year', user_identity, year_str), calories, str(user_id))
+            identities.append(user_identity)
         
-        # 设置过期时间（日榜7天，月榜2个月，年榜1年）
-        pipeline.expire(self._get_rank_key('day', None, day_str), 7 * 24 * 3600)
-        pipeline.expire(self._get_rank_key('month', None, month_str), 60 * 24 * 3600)
-        pipeline.expire(self._get_rank_key('year', None, year_str), 365 * 24 * 3600)
+        if exercise_log_id is not None:
+            idempotency_key = str(exercise_log_id)
+        elif delta_id:
+            idempotency_key = f"anon:{delta_id}"
+        else:
+            idempotency_key = ''
         
-        if user_identity in self.IDENTITY_MAP:
-            pipeline.expire(self._get_rank_key('day', user_identity, day_str), 7 * 24 * 3600)
-            pipeline.expire(self._get_rank_key('month', user_identity, month_str), 60 * 24 * 3600)
-            pipeline.expire(self._get_rank_key('year', user_identity, year_str), 365 * 24 * 3600)
+        keys = [self._get_applied_key(day_str)]
+        board_args = []
+        for identity in identities:
+            for period, time_str, ttl in periods:
+                key = self._get_rank_key(period, identity, time_str)
+                keys.extend([key, self._get_histogram_key(key)])
+                board_args.extend([ttl, self._get_bucket_kcal(period)])
+        fixed_count = len(board_args) // 2
         
-        pipeline.execute()
+        # 包含记录日期、且结束日不晚于今天的滚动窗口（只有已合并的才会被累加）
+        today = date.today()
+        for identity in identities:
+            for period, days in self.ROLLING_PERIODS.items():
+                for offset in range(days):
+                    window_end = log_date + timedelta(days=offset)
+                    if window_end > today:
+                        break
+                    key = self._get_rank_key(period, identity, self._get_time_string(window_end, period))
+                    keys.extend([key, self._get_histogram_key(key), self._get_empty_marker_key(key)])
+                    board_args.append(self._get_bucket_kcal(period))
+        
+        self._apply_ranking_delta(
+            keys=keys,
+            args=[
+                str(user_id),
+                calories,
+                self.HISTOGRAM_BUCKET_COUNT - 1,
+                idempotency_key,
+                day_ttl,
+                fixed_count,
+                *board_args
+            ],
+            client=pipeline
+        )
     
     def get_top_rankings(
         self, 
@@ -101,7 +423,7 @@ class RankingService:
     ) -> List[Dict]:
         """
         获取排行榜Top N
-        :param period: 周期类型 ('day', 'month', 'year')
+        :param period: 周期类型 ('day', 'month', 'year', 'last_7_days', 'last_30_days')
         :param limit: 返回数量
         :param identity: 身份类型，None表示总榜
         :param target_date: 目标日期，None则使用当前日期
@@ -110,12 +432,36 @@ class RankingService:
         if target_date is None:
             target_date = date.today()
         
+        rankings = self._top_rankings_cache.get_or_load(
+            (period, limit, identity, target_date),
+            lambda: self._fetch_top_rankings(period, limit, identity, target_date)
+        )
+        # 缓存结果在请求间共享，返回副本避免调用方修改
+        return [dict(item) for item in rankings]
+    
+    def _fetch_top_rankings(
+        self,
+        period: str,
+        limit: int,
+        identity: Optional[str],
+        target_date: date
+    ) -> List[Dict]:
+        """从Redis读取排行榜Top N"""
         time_str = self._get_time_string(target_date, period)
         key = self._get_rank_key(period, identity, time_str)
         
         # 获取Top N，WITHSCORES返回分数
         results = self.redis_client.zrevrange(key, 0, limit - 1, withscores=True)
         
+        # 滚动榜未命中缓存时，先合并日榜再读取（空窗口标记存在时说明窗口确实为空）
+        if (
+            not results
+            and period in self.ROLLING_PERIODS
+            and not self.redis_client.exists(key, self._get_empty_marker_key(key))
+        ):
+            self._materialize_rolling_ranking(key, period, identity, target_date)
+            results = self.redis_client.zrevrange(key, 0, limit - 1, withscores=True)
+        
         rankings = []
         for rank, (user_id_str, score) in enumerate(results, start=1):
             # 从score中提取实际热量（去掉时间戳部分的影响）
@@ -129,6 +475,19 @@ class RankingService:
         
         return rankings
     
+    def get_cache_stats(self) -> Dict:
+        """获取Top N排行榜进程内缓存的命中统计"""
+        return self._top_rankings_cache.stats()
+    
+    def get_user_ranking_snapshot_stats(self) -> Dict:
+        """获取用户排名降级快照的统计"""
+        with self._user_ranking_snapshot_lock:
+            return {
+                'entries': len(self._user_ranking_snapshot),
+                'max_entries': self.USER_RANKING_SNAPSHOT_MAX_ENTRIES,
+                'stale_hits': self._user_ranking_stale_hits
+            }
+    
     def get_user_ranking(
         self,
         user_id: int,
@@ -139,7 +498,7 @@ class RankingService:
         """
         获取用户排名和分数
         :param user_id: 用户ID
-        :param period: 周期类型 ('day', 'month', 'year')
+        :param period: 周期类型 ('day', 'month', 'year', 'last_7_days', 'last_30_days')
         :param identity: 身份类型，None表示总榜
         :param target_date: 目标日期，None则使用当前日期
         :return: 包含 rank 和 calories 的字典，如果用户不在榜上则返回None
@@ -147,8 +506,35 @@ class RankingService:
         if target_date is None:
             target_date = date.today()
         
-        time_str = self._get_time_string(target_date, period)
-        key = self._get_rank_key(period, identity, time_str)
+        snapshot_key = (user_id, period, identity, target_date)
+        try:
+            user_ranking = self._fetch_user_ranking(user_id, period, identity, target_date)
+        except redis.RedisError as e:
+            # 降级：返回最近一次成功读取的结果
+            with self._user_ranking_snapshot_lock:
+                if snapshot_key not in self._user_ranking_snapshot:
+                    raise
+                self._user_ranking_snapshot.move_to_end(snapshot_key)
+                user_ranking = self._user_ranking_snapshot[snapshot_key]
+                self._user_ranking_stale_hits += 1
+            logging.warning(f"读取用户排名失败，返回降级快照: {e}")
+        else:
+            with self._user_ranking_snapshot_lock:
+                self._user_ranking_snapshot[snapshot_key] = user_ranking
+                self._user_ranking_snapshot.move_to_end(snapshot_key)
+                if len(self._user_ranking_snapshot) > self.USER_RANKING_SNAPSHOT_MAX_ENTRIES:
+                    self._user_ranking_snapshot.popitem(last=False)
+        return dict(user_ranking) if user_ranking else None
+    
+    def _fetch_user_ranking(
+        self,
+        user_id: int,
+        period: str,
+        identity: Optional[str],
+        target_date: date
+    ) -> Optional[Dict]:
+        """从Redis读取用户排名和分数"""
+        key = self._get_board_key(period, identity, target_date)
         
         # 获取排名（从0开始，需要+1）
         rank = self.redis_client.zrevrank(key, str(user_id))
@@ -205,16 +591,130 @@ class RankingService:
             score = self.redis_client.zscore(old_key, str(user_id))
             if score is not None:
                 old_scores[period] = int(score)
-                # 从旧分榜移除
+                # 从旧分榜移除，并从旧分榜直方图中扣除（直方图不存在时先按移除前的榜单补建）
+                self._queue_build_histogram(pipeline, old_key, period)
                 pipeline.zrem(old_key, str(user_id))
+                pipeline.hincrby(self._get_histogram_key(old_key), self._get_bucket_index(score, period), -1)
         
         # 添加到新分榜
         for period, time_str in zip(periods, time_strings):
             if period in old_scores:
                 new_key = self._get_rank_key(period, new_identity, time_str)
+                new_hist_key = self._get_histogram_key(new_key)
+                self._queue_build_histogram(pipeline, new_key, period)
+                # 如果用户在新分榜已有分数，先从原来的桶中扣除
+                existing_score = self.redis_client.zscore(new_key, str(user_id))
+                if existing_score is not None:
+                    pipeline.hincrby(new_hist_key, self._get_bucket_index(existing_score, period), -1)
                 pipeline.zadd(new_key, {str(user_id): old_scores[period]})
+                pipeline.hincrby(new_hist_key, self._get_bucket_index(old_scores[period], period), 1)
+        
+        # 日榜分数已在身份间移动，丢弃两个身份已合并的滚动榜，下次读取时重新合并
+        if 'day' in old_scores:
+            for identity in (old_identity, new_identity):
+                for period in self.ROLLING_PERIODS:
+                    key = self._get_rank_key(period, identity, self._get_time_string(target_date, period))
+                    pipeline.delete(key, self._get_histogram_key(key), self._get_empty_marker_key(key))
         
         pipeline.execute()
+    
+    def get_score_histogram(
+        self,
+        period: str,
+        identity: Optional[str] = None,
+        target_date: Optional[date] = None
+    ) -> Dict:
+        """
+        获取榜单分数分布直方图（只读取直方图Hash，O(桶数)）
+        :param period: 周期类型
+        :param identity: 身份类型，None表示总榜
+        :param target_date: 目标日期，None则使用当前日期
+        :return: 包含 buckets, total_users, bucket_kcal 的字典
+        """
+        if target_date is None:
+            target_date = date.today()
+        
+        key = self._get_board_key(period, identity, target_date)
+        bucket_kcal = self._get_bucket_kcal(period)
+        
+        pipeline = self.redis_client.pipeline()
+        self._queue_build_histogram(pipeline, key, period)
+        pipeline.hgetall(self._get_histogram_key(key))
+        _, raw = pipeline.execute()
+        
+        counts = [0] * self.HISTOGRAM_BUCKET_COUNT
+        for index, count in raw.items():
+            counts[int(index)] = max(0, int(count))
+        
+        # 只返回到最高的非空桶为止
+        last_index = max([i for i, count in enumerate(counts) if count], default=-1)
+        buckets = []
+        for index in range(last_index + 1):
+            buckets.append({
+                'min_kcal': index * bucket_kcal,
+                'max_kcal': None if index == self.HISTOGRAM_BUCKET_COUNT - 1 else (index + 1) * bucket_kcal,
+                'count': counts[index]
+            })
+        
+        return {
+            'buckets': buckets,
+            'total_users': sum(counts),
+            'bucket_kcal': bucket_kcal
+        }
+    
+    def get_user_percentile(
+        self,
+        user_id: int,
+        period: str,
+        identity: Optional[str] = None,
+        target_date: Optional[date] = None
+    ) -> Optional[Dict]:
+        """
+        获取用户击败了榜单中百分之多少的用户（基于直方图估算，桶内线性插值）
+        :param user_id: 用户ID
+        :param period: 周期类型
+        :param identity: 身份类型，None表示总榜
+        :param target_date: 目标日期，None则使用当前日期
+        :return: 包含 calories, percentile, total_users 的字典，如果用户不在榜上则返回None
+        """
+        if target_date is None:
+            target_date = date.today()
+        
+        key = self._get_board_key(period, identity, target_date)
+        
+        pipeline = self.redis_client.pipeline()
+        self._queue_build_histogram(pipeline, key, period)
+        pipeline.zscore(key, str(user_id))
+        pipeline.hgetall(self._get_histogram_key(key))
+        _, score, raw = pipeline.execute()
+        
+        if score is None:
+            return None
+        
+        counts = [0] * self.HISTOGRAM_BUCKET_COUNT
+        for index, count in raw.items():
+            counts[int(index)] = max(0, int(count))
+        total_users = sum(counts)
+        
+        bucket_kcal = self._get_bucket_kcal(period)
+        user_bucket = self._get_bucket_index(score, period)
+        below = sum(counts[:user_bucket])
+        # 桶内按分数位置线性插值（最后一个桶没有上界，按桶中点处理）
+        if user_bucket < self.HISTOGRAM_BUCKET_COUNT - 1:
+            fraction = (score - user_bucket * bucket_kcal) / bucket_kcal
+        else:
+            fraction = 0.5
+        below += max(0, counts[user_bucket] - 1) * fraction
+        
+        others = total_users - 1
+        percentile = (below / others * 100) if others > 0 else 100.0
+        
+        return {
+            'user_id': user_id,
+            'calories': int(score),
+            'percentile': round(min(100.0, max(0.0, percentile)), 1),
+            'total_users': total_users
+        }
 
 
 # 创建全局实例
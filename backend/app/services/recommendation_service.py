@@ -3,13 +3,12 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from app.models.user import User
-from app.services.calorie_calculator import CalorieCalculatorService
-from app.services.calorie_range_calculator import calculate_calorie_range
-from app.services.macro_calculator import calculate_all_macros
+from app.services.calorie_calculator import ProfileVector, calculate_targets
 from app.services.dynamic_adjustment_service import dynamic_adjustment_service
 from app.services.periodized_nutrition_service import periodized_nutrition_service
 from app.services.menstrual_cycle_service import menstrual_cycle_service
 from app.schemas.log import CalorieRecommendation
+from app.core.config import settings
 from datetime import date
 
 
@@ -40,57 +39,26 @@ class RecommendationService:
         :param enable_periodized: 是否启用周期化营养（默认根据用户设置）
         :return: 一个包含推荐值和区间的 Pydantic 模型
         """
-        # 1. 计算用户的TDEE (总日能量消耗)
-        # 如果有体脂率数据，优先使用Katch-McArdle公式
-        tdee = CalorieCalculatorService.get_user_tdee(user, prefer_katch_mcardle=True)
-        if tdee == 0:
-            # 如果无法计算TDEE（信息不全），返回一个空/默认的推荐
-            logging.warning(f"Unable to calculate TDEE for user {user.id}. Incomplete profile data.")
-            return CalorieRecommendation(
-                goal=user.goal,
-                recommended_kcal=0,
-                protein_g=0,
-                fat_g=0,
-                carbs_g=0
-            )
-
-        # 2. 计算热量区间
-        calorie_range = calculate_calorie_range(user, tdee)
-        recommended_kcal = calorie_range['recommended_kcal']
-        min_kcal = calorie_range['min_kcal']
-        max_kcal = calorie_range['max_kcal']
-        range_description = calorie_range['range_description']
-
-        # 3. 计算宏量营养素
-        macros = calculate_all_macros(user, recommended_kcal)
-        
-        protein = macros['protein']
-        fat = macros['fat']
-        carbs = macros['carbs']
-
-        base_recommendation = CalorieRecommendation(
-            goal=user.goal.replace('_', ' ').title(),
-            recommended_kcal=round(recommended_kcal, 2),
-            min_kcal=round(min_kcal, 2),
-            max_kcal=round(max_kcal, 2),
-            protein_g=round(protein['recommended_g'], 2),
-            protein_min_g=round(protein['min_g'], 2),
-            protein_max_g=round(protein['max_g'], 2),
-            fat_g=round(fat['recommended_g'], 2),
-            fat_min_g=round(fat['min_g'], 2),
-            fat_max_g=round(fat['max_g'], 2),
-            carbs_g=round(carbs['recommended_g'], 2),
-            range_description=range_description
-        )
+        base_recommendation = RecommendationService.get_base_recommendation(user)
+        if base_recommendation.recommended_kcal == 0:
+            return base_recommendation
         
         # 如果启用自动调整且有数据库会话，尝试自动调整
+        # batch模式下调整由夜间批处理预先计算，这里只查询已保存的结果
         if enable_auto_adjustment and db:
             try:
-                adjusted_recommendation = dynamic_adjustment_service.evaluate_and_adjust(
-                    user=user,
-                    db=db,
-                    current_recommendation=base_recommendation
-                )
+                if settings.DYNAMIC_ADJUSTMENT_MODE == 'batch':
+                    adjusted_recommendation = dynamic_adjustment_service.get_precomputed_recommendation(
+                        user=user,
+                        db=db,
+                        current_recommendation=base_recommendation
+                    )
+                else:
+                    adjusted_recommendation = dynamic_adjustment_service.evaluate_and_adjust(
+                        user=user,
+                        db=db,
+                        current_recommendation=base_recommendation
+                    )
                 base_recommendation = adjusted_recommendation
             except Exception as e:
                 logging.warning(f"Auto adjustment failed for user {user.id}: {e}")
@@ -126,4 +94,56 @@ class RecommendationService:
             except Exception as e:
                 logging.warning(f"Menstrual cycle adjustment failed for user {user.id}: {e}")
         
-        return base_recommendation
\ No newline at end of file
+        return base_recommendation
+
+    @staticmethod
+    def get_base_recommendation(user: User) -> CalorieRecommendation:
+        """
+        根据用户资料计算基础推荐（不包含自动调整、周期化营养和月经周期调整）
+        
+        :param user: 用户对象
+        :return: 基础推荐；资料不完整无法计算TDEE时返回热量为0的推荐
+        """
+        # 1. 计算用户的TDEE (总日能量消耗)、热量区间和宏量营养素（按用户资料缓存）
+        # 如果有体脂率数据，优先使用Katch-McArdle公式
+        targets = calculate_targets(ProfileVector.from_user(user), prefer_katch_mcardle=True)
+        tdee = targets['tdee']
+        if tdee == 0:
+            # 如果无法计算TDEE（信息不全），返回一个空/默认的推荐
+            logging.warning(f"Unable to calculate TDEE for user {user.id}. Incomplete profile data.")
+            return CalorieRecommendation(
+                goal=user.goal,
+                recommended_kcal=0,
+                protein_g=0,
+                fat_g=0,
+                carbs_g=0
+            )
+
+        # 2. 热量区间
+        calorie_range = targets['calorie_range']
+        recommended_kcal = calorie_range['recommended_kcal']
+        min_kcal = calorie_range['min_kcal']
+        max_kcal = calorie_range['max_kcal']
+        range_description = calorie_range['range_description']
+
+        # 3. 宏量营养素
+        macros = targets['macros']
+        
+        protein = macros['protein']
+        fat = macros['fat']
+        carbs = macros['carbs']
+
+        return CalorieRecommendation(
+            goal=user.goal.replace('_', ' ').title(),
+            recommended_kcal=round(recommended_kcal, 2),
+            min_kcal=round(min_kcal, 2),
+            max_kcal=round(max_kcal, 2),
+            protein_g=round(protein['recommended_g'], 2),
+            protein_min_g=round(protein['min_g'], 2),
+            protein_max_g=round(protein['max_g'], 2),
+            fat_g=round(fat['recommended_g'], 2),
+            fat_min_g=round(fat['min_g'], 2),
+            fat_max_g=round(fat['max_g'], 2),
+            carbs_g=round(carbs['recommended_g'], 2),
+            range_description=range_description
+        )
@@ -0,0 +1,88 @@
+"""
+推荐模拟服务（what-if）
+在一个基础资料上展开参数网格，所有场景一次性向量化计算，不访问数据库
+"""
+import itertools
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.calorie_calculator import ProfileVector
+from app.services.profile_batch_calculator import calculate_targets_batch
+
+
+class RecommendationSimulator:
+    """推荐模拟"""
+
+    # 允许变化的字段（顺序即结果表中参数列的顺序）
+    VARIATION_FIELDS = ['goal', 'activity_level', 'body_fat_pct', 'weight_kg', 'training_experience']
+
+    # 结果表中的指标列
+    RESULT_COLUMNS = [
+        'bmr', 'tdee', 'min_kcal', 'recommended_kcal', 'max_kcal',
+        'protein_g', 'protein_min_g', 'protein_max_g',
+        'fat_g', 'fat_min_g', 'fat_max_g', 'carbs_g'
+    ]
+
+    def __init__(self, max_scenarios: int = 5000):
+        """
+        :param max_scenarios: 单次模拟允许的最大场景数
+        """
+        self.max_scenarios = max_scenarios
+
+    def count_scenarios(self, variations: Dict[str, Optional[Sequence]]) -> int:
+        """计算参数网格展开后的场景数"""
+        count = 1
+        for field in self.VARIATION_FIELDS:
+            values = variations.get(field)
+            if values:
+                count *= len(values)
+        return count
+
+    def simulate(
+        self,
+        base_profile: ProfileVector,
+        variations: Dict[str, Optional[Sequence]],
+        prefer_katch_mcardle: bool = True
+    ) -> Dict:
+        """
+        展开参数网格并批量计算
+
+        :param base_profile: 基础资料
+        :param variations: {字段名: 候选值列表}，只支持 VARIATION_FIELDS 中的字段
+        :param prefer_katch_mcardle: 如果有体脂率数据，是否优先使用Katch-McArdle公式
+        :return: {'scenario_count', 'columns', 'rows', 'elapsed_ms'}
+        """
+        started_at = time.perf_counter()
+
+        varied_fields = [field for field in self.VARIATION_FIELDS if variations.get(field)]
+        scenario_count = self.count_scenarios(variations)
+        if scenario_count > self.max_scenarios:
+            raise ValueError(f"Too many scenarios: {scenario_count} > {self.max_scenarios}")
+
+        grid = [list(variations[field]) for field in varied_fields]
+        combinations = list(itertools.product(*grid))
+        profiles: List[ProfileVector] = [
+            base_profile._replace(**dict(zip(varied_fields, combination)))
+            for combination in combinations
+        ]
+
+        targets = calculate_targets_batch(profiles, prefer_katch_mcardle=prefer_katch_mcardle)
+        metrics = np.column_stack([np.round(targets[column], 2) for column in self.RESULT_COLUMNS])
+
+        rows = [
+            list(combination) + row
+            for combination, row in zip(combinations, metrics.tolist())
+        ]
+
+        return {
+            'scenario_count': len(rows),
+            'columns': varied_fields + self.RESULT_COLUMNS,
+            'rows': rows,
+            'elapsed_ms': round((time.perf_counter() - started_at) * 1000, 2)
+        }
+
+
+# 创建全局实例
+recommendation_simulator = RecommendationSimulator()
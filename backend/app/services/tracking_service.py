@@ -8,7 +8,7 @@ from collections import defaultdict
 
 from app.crud.crud_log import log
 from app.crud.crud_food import food
-from app.crud.crud_exercise import exercise
+from app.services.exercise_catalogue import exercise_catalogue
 from app.models.user import User
 from app.schemas import log as log_schema
 from app.services.calorie_calculator import CalorieCalculatorService
@@ -60,7 +60,7 @@ class TrackingService:
         detailed_exercise_log = []
         
         for cur_log in exercise_logs:
-            cur_exercise = exercise.get_exercise_by_id(db, exercise_id=cur_log.exercise_id)
+            cur_exercise = exercise_catalogue.get(db, cur_log.exercise_id)
             if cur_exercise:
                 burned = float(cur_log.calories_burned) if cur_log.calories_burned is not None else CalorieCalculatorService.get_exercise_calories(
                     met_value=float(cur_exercise.met_value),
@@ -131,9 +131,11 @@ class TrackingService:
         
         # 计算总消耗
         total_exercise_burned = 0
+        exercise_names = {}
         for cur_log in exercise_logs:
-            cur_exercise = exercise.get_exercise_by_id(db, exercise_id=cur_log.exercise_id)
+            cur_exercise = exercise_catalogue.get(db, cur_log.exercise_id)
             if cur_exercise:
+                exercise_names[cur_log.exercise_id] = cur_exercise.name
                 burned = CalorieCalculatorService.get_exercise_calories(
                     met_value=float(cur_exercise.met_value),
                     weight_kg=float(user.weight_kg),
@@ -173,7 +175,7 @@ class TrackingService:
                 - 碳水化合物: {total_carbs_g:.1f} 克 (推荐: {recommendations.carbs_g:.1f} 克)
                 
                 - 饮食记录: {', '.join([f'{(log.food.description_zh if log.food and log.food.description_zh else log.food.description_en if log.food else "未知食物")}({log.serving_grams}克)' for log in food_logs]) if food_logs else '无'}
-                - 运动记录: {', '.join([f'{log.exercise.name if log.exercise else "未知运动"}({log.duration_minutes}分钟)' for log in exercise_logs]) if exercise_logs else '无'}
+                - 运动记录: {', '.join([f'{exercise_names.get(log.exercise_id, "未知运动")}({log.duration_minutes}分钟)' for log in exercise_logs]) if exercise_logs else '无'}
 
                 请根据以上信息，生成一段大约400字的总结和建议。
                 """
@@ -217,9 +219,10 @@ class TrackingService:
         elif energy_type == "expenditure":
             logs = log.get_exercise_logs_by_user_and_date_range(db, user_id=user.id, start_date=start_date, end_date=end_date)
             for cur_log in logs:
-                if cur_log.exercise:
+                cur_exercise = exercise_catalogue.get(db, cur_log.exercise_id)
+                if cur_exercise:
                     burned = CalorieCalculatorService.get_exercise_calories(
-                        met_value=float(cur_log.exercise.met_value),
+                        met_value=float(cur_exercise.met_value),
                         weight_kg=float(user.weight_kg),
                         duration_minutes=cur_log.duration_minutes
                     )
@@ -0,0 +1,152 @@
+"""
+用户历史数据快照服务
+一次性加载动态调整所需的全部历史数据（体重/体脂率、每日饮食热量、运动记录、最近一次调整），
+以列式数组的形式供各个评估器共享，避免每个评估器各自查询数据库
+"""
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.crud.crud_body_metrics import body_metrics
+from app.crud.crud_log import log
+from app.crud.crud_recommendation_history import recommendation_history
+from app.services.performance_analysis_service import ExerciseLogColumns, performance_analysis_service
+from app.services.weight_trend_service import weight_trend_service
+
+
+def _to_float_array(values) -> np.ndarray:
+    """将可能包含None/Decimal的序列转换为float数组（None -> NaN）"""
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _to_date_array(values) -> np.ndarray:
+    return np.array(values, dtype='datetime64[D]')
+
+
+class UserHistorySnapshot:
+    """
+    用户历史数据快照（列式存储）
+    - metric_dates / weights / body_fat: 身体指标记录，缺失值为NaN
+    - intake_dates / intake_kcal: 每日饮食摄入热量汇总
+    - exercise_columns: 运动记录（列式，含周、时长、热量、类别）
+    - weight_trend: 平滑体重趋势（见 WeightTrendService.get_trend），没有体重记录时为None
+    - latest_adjustment_date: 最近一次推荐调整日期
+    - loaded: 是否已加载完整历史数据（距上次调整时间过短时只加载调整日期）
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        latest_adjustment_date: Optional[date],
+        metric_dates: Optional[np.ndarray] = None,
+        weights: Optional[np.ndarray] = None,
+        body_fat: Optional[np.ndarray] = None,
+        intake_dates: Optional[np.ndarray] = None,
+        intake_kcal: Optional[np.ndarray] = None,
+        exercise_columns: Optional[ExerciseLogColumns] = None,
+        weight_trend: Optional[dict] = None,
+        loaded: bool = True
+    ):
+        self.user_id = user_id
+        self.latest_adjustment_date = latest_adjustment_date
+        self.metric_dates = metric_dates if metric_dates is not None else _to_date_array([])
+        self.weights = weights if weights is not None else _to_float_array([])
+        self.body_fat = body_fat if body_fat is not None else _to_float_array([])
+        self.intake_dates = intake_dates if intake_dates is not None else _to_date_array([])
+        self.intake_kcal = intake_kcal if intake_kcal is not None else _to_float_array([])
+        self.exercise_columns = exercise_columns if exercise_columns is not None else (
+            performance_analysis_service.build_exercise_columns([])
+        )
+        self.weight_trend = weight_trend
+        self.loaded = loaded
+
+    def weight_series(self) -> Tuple[np.ndarray, np.ndarray]:
+        """有效体重序列（日期, 体重），与 body_metrics.get_weight_history 的过滤规则一致"""
+        mask = self.weights > 0
+        return self.metric_dates[mask], self.weights[mask]
+
+    def body_fat_series(self) -> Tuple[np.ndarray, np.ndarray]:
+        """有效体脂率序列（日期, 体脂率），与 body_metrics.get_body_fat_history 的过滤规则一致"""
+        mask = self.body_fat > 0
+        return self.metric_dates[mask], self.body_fat[mask]
+
+    def days_since_last_adjustment(self, today: Optional[date] = None) -> Optional[int]:
+        """距最近一次调整的天数（从未调整过返回None）"""
+        if self.latest_adjustment_date is None:
+            return None
+        return ((today or date.today()) - self.latest_adjustment_date).days
+
+
+class UserHistoryService:
+    """用户历史数据快照加载器"""
+
+    def load_snapshot(
+        self,
+        db: Session,
+        user_id: int,
+        *,
+        metric_weeks: int = 8,
+        intake_days: int = 14,
+        exercise_weeks: int = 4,
+        min_adjustment_interval_days: Optional[int] = None
+    ) -> UserHistorySnapshot:
+        """
+        加载用户历史数据快照，固定执行最多4次查询：
+        最近调整日期、身体指标列、每日饮食热量汇总（GROUP BY）、运动记录（JOIN运动信息）；
+        体重趋势从Redis读取（状态缺失时才查询数据库重建）
+
+        :param db: 数据库会话
+        :param user_id: 用户ID
+        :param metric_weeks: 身体指标的时间范围（周）
+        :param intake_days: 饮食汇总的时间范围（天）
+        :param exercise_weeks: 运动记录的时间范围（周）
+        :param min_adjustment_interval_days: 如果距上次调整不足该天数，则只加载调整日期（loaded=False）
+        :return: 用户历史数据快照
+        """
+        latest_adjustment_date = recommendation_history.get_latest_adjustment_date(db, user_id=user_id)
+
+        today = date.today()
+        if (
+            min_adjustment_interval_days is not None
+            and latest_adjustment_date is not None
+            and (today - latest_adjustment_date).days < min_adjustment_interval_days
+        ):
+            return UserHistorySnapshot(user_id, latest_adjustment_date, loaded=False)
+
+        metric_rows = body_metrics.get_metric_columns(
+            db,
+            user_id=user_id,
+            start_date=today - timedelta(weeks=metric_weeks),
+            end_date=today
+        )
+        intake_rows = log.get_daily_food_calorie_totals(
+            db,
+            user_id=user_id,
+            start_date=today - timedelta(days=intake_days),
+            end_date=today
+        )
+        exercise_columns = performance_analysis_service.load_exercise_columns(
+            db,
+            user_id,
+            today - timedelta(weeks=exercise_weeks),
+            today
+        )
+
+        return UserHistorySnapshot(
+            user_id,
+            latest_adjustment_date,
+            metric_dates=_to_date_array([row[0] for row in metric_rows]),
+            weights=_to_float_array([row[1] for row in metric_rows]),
+            body_fat=_to_float_array([row[2] for row in metric_rows]),
+            intake_dates=_to_date_array([row[0] for row in intake_rows]),
+            # 某天的记录全部没有热量时SUM为NULL，按0计入（与逐条累加的结果一致）
+            intake_kcal=np.nan_to_num(_to_float_array([row[1] for row in intake_rows]), nan=0.0),
+            exercise_columns=exercise_columns,
+            weight_trend=weight_trend_service.get_trend(db, user_id)
+        )
+
+
+# 创建全局实例
+user_history_service = UserHistoryService()
@@ -0,0 +1,226 @@
+"""
+体重趋势服务
+为每个用户维护一份增量更新的体重趋势状态（Holt双指数平滑：平滑体重 + 每日斜率），
+保存在Redis Hash中。新增体重记录时O(1)更新，动态调整和趋势接口直接读取当前趋势，
+不需要重新扫描历史记录；状态缺失或失效时从数据库重放最近的体重记录重建
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.crud.crud_body_metrics import body_metrics
+from app.db.redis_client import get_redis
+
+
+class WeightTrendService:
+    """体重趋势服务"""
+
+    ALPHA = 0.15  # 平滑体重的每日平滑系数
+    BETA = 0.05  # 斜率的每日平滑系数
+    # 记录数和覆盖天数都达到下限之前，按全部记录的最小二乘直线估计体重和斜率（而不是从斜率0开始平滑），
+    # 达到下限时以拟合结果作为平滑的初始值；未达到下限的趋势不可靠，调用方应改用原始差值估算
+    MIN_TREND_POINTS = 4
+    MIN_TREND_DAYS = 14
+    SUM_FIELDS = ('sum_t', 'sum_w', 'sum_tt', 'sum_tw')  # 最小二乘拟合的累加量
+    REBUILD_WEEKS = 26  # 重建状态时重放的历史范围（周）
+    STATE_TTL_SECONDS = 30 * 24 * 3600  # 状态过期时间，长期不活跃的用户会被清理，下次读取时重建
+
+    def __init__(self):
+        self.redis_client = get_redis()
+
+    def _get_state_key(self, user_id: int) -> str:
+        """生成用户趋势状态的Redis Key"""
+        return f"weight_trend:{user_id}"
+
+    @classmethod
+    def is_established(cls, state: Dict) -> bool:
+        """记录数和覆盖天数是否都达到下限（之后按平滑更新）"""
+        span_days = (state['last_date'] - state['first_date']).days
+        return state['count'] >= cls.MIN_TREND_POINTS and span_days >= cls.MIN_TREND_DAYS
+
+    @classmethod
+    def advance(cls, state: Optional[Dict], record_date: date, weight_kg: float) -> Dict:
+        """
+        用一条新的体重记录推进趋势状态（不修改传入的状态）
+
+        :param state: 当前状态 {'level', 'slope', 'first_date', 'last_date', 'count', 'sum_t', 'sum_w', 'sum_tt', 'sum_tw'}，
+                      None表示没有历史；sum_* 为最小二乘拟合的累加量（t 为距 first_date 的天数）
+        :param record_date: 记录日期（必须晚于 state['last_date']）
+        :param weight_kg: 体重
+        :return: 新的状态
+        """
+        if not state:
+            return {
+                'level': weight_kg, 'slope': 0.0, 'first_date': record_date, 'last_date': record_date, 'count': 1,
+                'sum_t': 0.0, 'sum_w': weight_kg, 'sum_tt': 0.0, 'sum_tw': 0.0
+            }
+
+        t = float((record_date - state['first_date']).days)
+        new_state = {
+            'first_date': state['first_date'],
+            'last_date': record_date,
+            'count': state['count'] + 1,
+            'sum_t': state['sum_t'] + t,
+            'sum_w': state['sum_w'] + weight_kg,
+            'sum_tt': state['sum_tt'] + t * t,
+            'sum_tw': state['sum_tw'] + t * weight_kg
+        }
+
+        if not cls.is_established(state):
+            # 历史太短：按最小二乘直线拟合全部记录，水平取拟合直线在本条记录日期的值
+            n = new_state['count']
+            denominator = n * new_state['sum_tt'] - new_state['sum_t'] ** 2
+            slope = (n * new_state['sum_tw'] - new_state['sum_t'] * new_state['sum_w']) / denominator if denominator > 0 else 0.0
+            new_state['slope'] = slope
+            new_state['level'] = (new_state['sum_w'] - slope * new_state['sum_t']) / n + slope * t
+            return new_state
+
+        gap_days = max((record_date - state['last_date']).days, 1)
+        # 记录间隔越长，新记录的权重越大（相当于按天连续平滑 gap_days 次）
+        alpha = 1 - (1 - cls.ALPHA) ** gap_days
+        beta = 1 - (1 - cls.BETA) ** gap_days
+
+        predicted = state['level'] + state['slope'] * gap_days
+        level = predicted + alpha * (weight_kg - predicted)
+        observed_slope = (level - state['level']) / gap_days
+        new_state['slope'] = state['slope'] + beta * (observed_slope - state['slope'])
+        new_state['level'] = level
+        return new_state
+
+    @classmethod
+    def replay(cls, history: Iterable[Tuple[date, float]]) -> Optional[Dict]:
+        """按日期顺序重放体重记录，得到最终状态（没有记录时返回None）"""
+        state = None
+        for record_date, weight_kg in history:
+            state = cls.advance(state, record_date, weight_kg)
+        return state
+
+    def record_weight(self, db: Session, user_id: int, record_date: date, weight_kg: Optional[float]):
+        """
+        新增体重记录后调用，O(1)更新趋势状态（WATCH/MULTI事务，并发写入同一用户时冲突的一方重试）
+        记录日期不晚于当前状态的最后日期时（补录历史数据），删除状态，下次读取时重建
+
+        :param db: 数据库会话（状态不存在时用于重建）
+        :param user_id: 用户ID
+        :param record_date: 记录日期
+        :param weight_kg: 体重，为空或0时忽略
+        """
+        if not weight_kg:
+            return
+
+        key = self._get_state_key(user_id)
+
+        def update(pipeline):
+            state = self._parse(pipeline.hgetall(key))
+            if state is None:
+                # 没有状态（首次记录、已过期或旧版本格式），从数据库重建（已包含本条记录）
+                new_state = self._rebuild(db, user_id)
+            elif record_date <= state['last_date']:
+                new_state = None
+            else:
+                new_state = self.advance(state, record_date, float(weight_kg))
+            pipeline.multi()
+            if new_state is None:
+                pipeline.delete(key)
+            else:
+                self._queue_store(pipeline, key, new_state)
+
+        try:
+            self.redis_client.transaction(update, key)
+        except Exception as e:
+            logging.warning(f"Weight trend update failed for user {user_id}: {e}")
+
+    def invalidate(self, user_id: int):
+        """历史体重记录被修改或删除后调用，删除状态，下次读取时重建"""
+        try:
+            self.redis_client.delete(self._get_state_key(user_id))
+        except Exception as e:
+            logging.warning(f"Weight trend invalidation failed for user {user_id}: {e}")
+
+    def get_trend(self, db: Session, user_id: int) -> Optional[Dict]:
+        """
+        获取用户当前的体重趋势（一次Redis读取；状态不存在时从数据库重建）
+
+        :param db: 数据库会话
+        :param user_id: 用户ID
+        :return: {'level_kg', 'slope_kg_per_week', 'last_date', 'count'}，没有体重记录时返回None
+        """
+        key = self._get_state_key(user_id)
+        try:
+            raw = self.redis_client.hgetall(key)
+        except Exception as e:
+            # Redis不可用时直接从数据库计算，不保存
+            logging.warning(f"Weight trend read failed for user {user_id}, rebuilding from database: {e}")
+            return self._to_trend(self._rebuild(db, user_id))
+
+        state = self._parse(raw)
+        if state is not None:
+            return self._to_trend(state)
+
+        state = self._rebuild(db, user_id)
+        if state is not None:
+            try:
+                self._store_if_missing(key, state)
+            except Exception as e:
+                logging.warning(f"Weight trend store failed for user {user_id}: {e}")
+        return self._to_trend(state)
+
+    def _rebuild(self, db: Session, user_id: int) -> Optional[Dict]:
+        """从数据库重放最近的体重记录（只查询日期和体重两列）"""
+        history = body_metrics.get_weight_history(db, user_id=user_id, weeks=self.REBUILD_WEEKS)
+        return self.replay(history)
+
+    def _store_if_missing(self, key: str, state: Dict):
+        """保存重建的状态；期间已有并发写入保存了状态时放弃（以已保存的为准）"""
+        def store(pipeline):
+            if pipeline.exists(key):
+                return
+            pipeline.multi()
+            self._queue_store(pipeline, key, state)
+
+        self.redis_client.transaction(store, key)
+
+    def _queue_store(self, pipeline, key: str, state: Dict):
+        """将保存状态加入Pipeline"""
+        pipeline.hset(key, mapping={
+            'level': repr(state['level']),
+            'slope': repr(state['slope']),
+            'first_date': state['first_date'].isoformat(),
+            'last_date': state['last_date'].isoformat(),
+            'count': state['count'],
+            **{field: repr(state[field]) for field in self.SUM_FIELDS}
+        })
+        pipeline.expire(key, self.STATE_TTL_SECONDS)
+
+    @classmethod
+    def _parse(cls, raw: Dict[str, str]) -> Optional[Dict]:
+        """解析Redis中的状态，不存在或缺少字段（旧版本写入）时返回None，由调用方重建"""
+        if not raw or 'first_date' not in raw:
+            return None
+        return {
+            'level': float(raw['level']),
+            'slope': float(raw['slope']),
+            'first_date': date.fromisoformat(raw['first_date']),
+            'last_date': date.fromisoformat(raw['last_date']),
+            'count': int(raw['count']),
+            **{field: float(raw[field]) for field in cls.SUM_FIELDS}
+        }
+
+    @classmethod
+    def _to_trend(cls, state: Optional[Dict]) -> Optional[Dict]:
+        if state is None:
+            return None
+        return {
+            'level_kg': round(state['level'], 2),
+            'slope_kg_per_week': round(state['slope'] * 7, 3),
+            'last_date': state['last_date'],
+            'count': state['count'],
+            'span_days': (state['last_date'] - state['first_date']).days,
+            'established': cls.is_established(state)
+        }
+
+
+# 创建全局实例
+weight_trend_service = WeightTrendService()
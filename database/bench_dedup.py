@@ -0,0 +1,93 @@
+"""
+中文去重（非 0 平均）基准测试
+用合成数据对比逐组调用 mean_ignore_zero 的原实现与流水线使用的 dedup_foods_by_chinese_name，
+先校验两者结果一致，再输出耗时
+
+用法: python bench_dedup.py --rows 200000 --groups 20000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import utils
+from usda_pipeline import NUTRIENT_COLS
+
+
+def make_dataset(rows: int, groups: int, seed: int = 0) -> pd.DataFrame:
+    """生成与 clean_food_with_zh 同结构的合成数据（含 0、空值和未翻译的行）"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "description_zh": [f"食物{i}" for i in rng.integers(0, groups, rows)],
+        "description_en": [f"food {i}" for i in rng.integers(0, groups * 2, rows)],
+        "source": rng.choice(["foundation", "fndd"], rows),
+    })
+    for col in NUTRIENT_COLS:
+        values = rng.random(rows) * 100
+        values[rng.random(rows) < 0.3] = 0
+        values[rng.random(rows) < 0.05] = np.nan
+        df[col] = values
+    df.loc[rng.random(rows) < 0.02, "description_zh"] = None
+    return df
+
+
+def dedup_reference(df: pd.DataFrame) -> pd.DataFrame:
+    """原实现：每组每列调用一次 mean_ignore_zero"""
+    df = df.copy()
+    for col in NUTRIENT_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return (
+        df
+        .groupby("description_zh", as_index=False)
+        .agg({
+            **{col: utils.mean_ignore_zero for col in NUTRIENT_COLS},
+            "description_en": "first",
+            "source": "first"
+        })
+    )
+
+
+def dedup_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """新实现（流水线使用的 utils.dedup_foods_by_chinese_name）"""
+    return utils.dedup_foods_by_chinese_name(df, NUTRIENT_COLS)
+
+
+def best_of(func, df: pd.DataFrame, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - started_at)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中文去重基准测试")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--groups", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_dataset(args.rows, args.groups)
+
+    expected, reference_seconds = best_of(dedup_reference, df, args.repeat)
+    actual, vectorized_seconds = best_of(dedup_vectorized, df, args.repeat)
+
+    # 一致性校验：列、分组、文本列完全相同，数值列误差在浮点求和顺序范围内
+    assert list(actual.columns) == list(expected.columns), "列不一致"
+    assert actual["description_zh"].tolist() == expected["description_zh"].tolist(), "分组不一致"
+    for col in ("description_en", "source"):
+        assert actual[col].tolist() == expected[col].tolist(), f"{col} 不一致"
+    max_diff = float(np.max(np.abs(actual[NUTRIENT_COLS].to_numpy() - expected[NUTRIENT_COLS].to_numpy())))
+    assert max_diff < 1e-9, f"数值不一致（最大误差 {max_diff}）"
+
+    print(f"✅ 结果一致：{len(actual)} 组，数值最大误差 {max_diff:.2e}")
+    print(f"   原实现（mean_ignore_zero）: {reference_seconds:.3f}s")
+    print(f"   向量化实现:                  {vectorized_seconds:.3f}s")
+    print(f"   加速比: {reference_seconds / vectorized_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+数据导入 Pipeline 基准测试
+按指定规模（food_nutrient.csv 行数）生成与 USDA 导出结构相同的合成数据
+（food / food_nutrient / food_portion、人工翻译文件、中国食物营养成分表），
+在各自独立的子进程中依次执行 usda_pipeline 的各个步骤，记录每个步骤的
+耗时、读写耗时、tracemalloc 峰值、常驻内存（RSS）峰值和输出文件大小，输出 JSON 和 Markdown 报告
+
+每个步骤在新启动的进程中执行，RSS 峰值即该步骤的峰值（包含解释器和依赖库的基线）；
+tracemalloc 只统计 Python/NumPy 的分配（不含 pyarrow 的字符串缓冲区等），完整占用以 RSS 为准，
+并且会使耗时增加，只比较耗时时可以加 --no-tracemalloc
+
+用法: python bench_pipeline.py --scales 10000 100000 1000000 --output bench_report
+      python bench_pipeline.py --scales 10000 --load   # 同时测试 import_usda_data / import_cdc_data（需要数据库）
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import import_cdc_data
+import import_usda_data
+import usda_pipeline
+import utils
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录 RSS
+    resource = None
+
+
+NUTRIENTS_PER_FOOD = 25  # 每种食物的营养素行数（其中只有 8 种会被保留）
+NAMES_PER_FOOD = 0.8  # 不同 fdc_id 共用英文名的比例，模拟 USDA 中的重名食物
+PORTIONS_PER_FOOD = 1.5
+CDC_MAX_FOODS = 5000
+WRITE_CHUNK_ROWS = 1_000_000  # 分块写入 food_nutrient.csv，生成 1000 万行时不需要一次性放进内存
+
+# 不在营养素映射中的营养素编号（会在读取时被过滤掉）
+FILLER_NUTRIENT_IDS = np.arange(1100, 1100 + NUTRIENTS_PER_FOOD, dtype=np.int32)
+
+CDC_COLUMNS = {
+    "energy_kcal": "能量（kal）",
+    "protein_g": "蛋白质（克）",
+    "carbohydrate_g": "糖类（克）",
+    "fat_g": "脂肪（克）",
+    "fiber_total_dietary_g": "纤维（克）",
+    "na_mg": "钠（毫克）",
+    "fe_mg": "铁（毫克）",
+}
+
+
+def food_name(index: np.ndarray) -> pd.Series:
+    """合成英文食物名，部分名称使用大写和多余空格（规范化后与原名称相同）"""
+    names = pd.Series(index).map("Food {}, raw".format)
+    variant = index % 7 == 0
+    names[variant] = names[variant].str.upper().str.replace(" ", "  ", regex=False)
+    return names
+
+
+def write_usda_source(source_dir: str, nutrient_rows: int, nutrient_ids: List[int], name_offset: int, seed: int) -> int:
+    """
+    生成一个 USDA 数据集（food.csv / food_nutrient.csv / food_portion.csv）
+    :return: 食物数
+    """
+    os.makedirs(source_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    foods = max(nutrient_rows // NUTRIENTS_PER_FOOD, 1)
+    names = max(int(foods * NAMES_PER_FOOD), 1)
+
+    fdc_ids = np.arange(foods, dtype=np.int32)
+    pd.DataFrame({
+        "fdc_id": fdc_ids,
+        "data_type": "survey_fndds_food",
+        "description": food_name(fdc_ids % names + name_offset),
+        "food_category_id": rng.integers(1, 30, foods),
+        "publication_date": "2024-10-31",
+    }).to_csv(f"{source_dir}/food.csv", index=False)
+
+    ids = np.concatenate([np.asarray(nutrient_ids, dtype=np.int32), FILLER_NUTRIENT_IDS])
+    nutrient_csv = f"{source_dir}/food_nutrient.csv"
+    for start in range(0, nutrient_rows, WRITE_CHUNK_ROWS):
+        rows = min(WRITE_CHUNK_ROWS, nutrient_rows - start)
+        row_ids = np.arange(start, start + rows)
+        pd.DataFrame({
+            "id": row_ids,
+            "fdc_id": (row_ids // NUTRIENTS_PER_FOOD % foods).astype(np.int32),
+            "nutrient_id": ids[row_ids % len(ids)],
+            "amount": np.round(rng.random(rows) * 100, 3),
+            "data_points": rng.integers(1, 10, rows),
+            "derivation_id": rng.integers(1, 80, rows),
+        }).to_csv(nutrient_csv, index=False, header=start == 0, mode="w" if start == 0 else "a")
+
+    portions = int(foods * PORTIONS_PER_FOOD)
+    pd.DataFrame({
+        "id": np.arange(portions),
+        "fdc_id": rng.integers(0, foods, portions),
+        "portion_description": "1 cup",
+        "gram_weight": np.round(rng.random(portions) * 200 + 5, 1),
+    }).to_csv(f"{source_dir}/food_portion.csv", index=False)
+    return foods
+
+
+def write_translation(path: str, names: int):
+    """人工翻译文件：每两个英文名对应同一个中文名，用于测试中文去重"""
+    index = np.arange(names)
+    pd.DataFrame({
+        "description_en": food_name(index),
+        "description_zh": pd.Series(index // 2).map("食物{}".format),
+    }).to_csv(path, index=False)
+
+
+def write_cdc_table(path: str, names: int, seed: int):
+    """中国食物营养成分表：部分名称与 USDA 译名只差括号/标点，用于测试模糊去重"""
+    rng = np.random.default_rng(seed)
+    foods = min(max(names // 10, 10), CDC_MAX_FOODS)
+    index = rng.choice(max(names // 2, 1), foods)
+    df = pd.DataFrame({"食物（每100克）": pd.Series(index).map("食物{}（生）".format)})
+    for column in CDC_COLUMNS.values():
+        df[column] = np.round(rng.random(foods) * 100, 1)
+    df.to_excel(path, index=False)
+
+
+def generate_dataset(workdir: str, nutrient_rows: int, seed: int = 0) -> Dict:
+    """在 workdir 下按 usda_pipeline 的目录结构生成合成数据，两个 USDA 数据集各占一半的营养素行"""
+    started_at = time.perf_counter()
+    os.makedirs(os.path.join(workdir, usda_pipeline.DATA_DIR), exist_ok=True)
+    half = max(nutrient_rows // 2, 1)
+
+    foundation = write_usda_source(
+        os.path.join(workdir, os.path.dirname(usda_pipeline.FOUNDATION_FOOD_CSV)),
+        half, list(usda_pipeline.SELECTED_NUTRIENTS), name_offset=0, seed=seed
+    )
+    # FNDD 的英文名与 Foundation 有一半重叠
+    fndd_offset = max(int(foundation * NAMES_PER_FOOD), 1) // 2
+    fndd = write_usda_source(
+        os.path.join(workdir, os.path.dirname(usda_pipeline.FNDD_FOOD_CSV)),
+        nutrient_rows - half, list(usda_pipeline.FNDD_NUTRIENTS), name_offset=fndd_offset, seed=seed + 1
+    )
+
+    names = fndd_offset + max(int(fndd * NAMES_PER_FOOD), 1)
+    write_translation(os.path.join(workdir, usda_pipeline.FOOD_TRANSLATION), names)
+    write_cdc_table(os.path.join(workdir, usda_pipeline.CDC_FOOD_XLSX), names, seed)
+
+    return {
+        "nutrient_rows": nutrient_rows,
+        "foods": foundation + fndd,
+        "food_names": names,
+        "generate_seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+
+def _rss_peak_mb() -> float | None:
+    """当前进程的 RSS 峰值（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _measure(func: Callable[[], None], workdir: str, trace: bool) -> Dict:
+    """子进程中执行一个步骤并记录耗时和内存"""
+    os.chdir(workdir)
+    utils._io_stats.clear()
+    rss_baseline_mb = _rss_peak_mb()
+
+    if trace:
+        tracemalloc.start()
+    started_at = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    seconds = time.perf_counter() - started_at
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace else None
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(seconds, 3),
+        "io_seconds": round(sum(item["seconds"] for item in utils._io_stats), 3),
+        "tracemalloc_peak_mb": round(traced_peak / 1024 / 1024, 1) if trace else None,
+        "rss_baseline_mb": rss_baseline_mb,
+        "rss_peak_mb": _rss_peak_mb(),
+        "written_mb": round(
+            sum(item["bytes"] for item in utils._io_stats if item["op"] == "write") / 1024 / 1024, 2
+        ),
+    }
+
+
+def build_steps(load: bool) -> List[tuple]:
+    """需要测试的步骤（按执行顺序）"""
+    steps = [
+        (f"clean_{source}", partial(usda_pipeline.step_1_clean_source, source))
+        for source in usda_pipeline.USDA_SOURCES
+    ]
+    steps += [
+        ("merge_sources", usda_pipeline.step_2_merge_sources),
+        ("extract_food_names", usda_pipeline.step_3_extract_food_names),
+        ("merge_translation", usda_pipeline.step_4_merge_translation),
+        ("dedup_by_zh", usda_pipeline.step_5_dedup_by_zh),
+        ("fuzzy_dedup", usda_pipeline.step_6_fuzzy_dedup),
+    ]
+    if load:
+        steps += [
+            ("import_usda_data", partial(import_usda_data.import_foods, usda_pipeline.CLEAN_DEDUP)),
+            ("import_cdc_data", partial(import_cdc_data.import_with_averaging, usda_pipeline.CDC_FOOD_XLSX)),
+        ]
+    return steps
+
+
+def run_scale(nutrient_rows: int, workdir: str, trace: bool, load: bool) -> Dict:
+    """生成一个规模的数据并逐个执行步骤"""
+    dataset = generate_dataset(workdir, nutrient_rows)
+    print(f"\n规模 {nutrient_rows:,} 行：{dataset['foods']:,} 种食物，生成数据 {dataset['generate_seconds']:.1f}s")
+
+    stages = []
+    context = multiprocessing.get_context("spawn")
+    for name, func in build_steps(load):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(_measure, func, workdir, trace).result()
+        stages.append({"stage": name, **result})
+        print(
+            f"   {name:<20} {result['seconds']:>8.2f}s  RSS 峰值 {result['rss_peak_mb']} MB"
+            + (f"  tracemalloc 峰值 {result['tracemalloc_peak_mb']} MB" if trace else "")
+        )
+
+    return {**dataset, "total_seconds": round(sum(stage["seconds"] for stage in stages), 3), "stages": stages}
+
+
+def to_markdown(report: Dict) -> str:
+    """Markdown 报告（每个规模一张表）"""
+    lines = [
+        "# Pipeline 基准测试",
+        "",
+        f"- 时间：{report['generated_at']}",
+        f"- 环境：Python {report['python']}，pandas {report['pandas']}，{report['platform']}",
+        f"- tracemalloc：{'开启' if report['tracemalloc'] else '关闭'}",
+    ]
+    for scale in report["scales"]:
+        lines += [
+            "",
+            f"## {scale['nutrient_rows']:,} 行 food_nutrient（{scale['foods']:,} 种食物）",
+            "",
+            "| 步骤 | 耗时 (s) | 读写 (s) | tracemalloc 峰值 (MB) | RSS 峰值 (MB) | 输出 (MB) |",
+            "| --- | ---: | ---: | ---: | ---: | ---: |",
+        ]
+        for stage in scale["stages"]:
+            lines.append(
+                f"| {stage['stage']} | {stage['seconds']:.2f} | {stage['io_seconds']:.2f} | "
+                f"{stage['tracemalloc_peak_mb'] if stage['tracemalloc_peak_mb'] is not None else '-'} | "
+                f"{stage['rss_peak_mb'] if stage['rss_peak_mb'] is not None else '-'} | {stage['written_mb']:.2f} |"
+            )
+        lines.append(f"| **合计** | {scale['total_seconds']:.2f} | | | | |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据导入 Pipeline 基准测试")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="food_nutrient.csv 的行数（可指定多个）")
+    parser.add_argument("--output", default="bench_report", help="报告文件名（生成 .json 和 .md）")
+    parser.add_argument("--workdir", default=None, help="生成数据的目录（默认使用临时目录，结束后删除）")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不记录 tracemalloc（耗时更准确）")
+    parser.add_argument("--load", action="store_true", help="同时测试导入数据库的脚本")
+    args = parser.parse_args()
+
+    trace = not args.no_tracemalloc
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "tracemalloc": trace,
+        "scales": [],
+    }
+
+    for nutrient_rows in args.scales:
+        workdir = tempfile.mkdtemp(prefix=f"bench_{nutrient_rows}_", dir=args.workdir)
+        try:
+            report["scales"].append(run_scale(nutrient_rows, workdir, trace, args.load))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(f"{args.output}.md", "w", encoding="utf-8") as f:
+        f.write(to_markdown(report))
+    print(f"\n✅ 报告已生成 → {args.output}.json / {args.output}.md")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+食物数据批量导入
+数据先写入临时文件，通过 LOAD DATA LOCAL INFILE 载入临时中转表（服务端不允许时退回为大批量多行 INSERT），
+再用一条 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 合并到 foods 表：
+按 description_zh（uk_foods_description_zh）更新已有食物、插入新食物，重复导入结果不变。
+营养标签在导入前对整批数据向量化计算（food_tags.derive_food_tags），与 foods 表触发器的规则一致
+"""
+import logging
+import os
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.engine import Connection, Engine
+
+from food_tags import TAG_COLUMNS, derive_food_tags
+
+
+FOOD_COLUMNS = [
+    "description_zh",
+    "description_en",
+    "energy_kcal",
+    "protein_g",
+    "fat_g",
+    "carbohydrate_g",
+    "fiber_total_dietary_g",
+    "sugars_g",
+    "fe_mg",
+    "na_mg",
+    "serving_size_g",
+    "source",
+    *TAG_COLUMNS,
+]
+
+TEXT_COLUMNS = ["description_zh", "description_en", "source"]
+NUMERIC_COLUMNS = [col for col in FOOD_COLUMNS if col not in TEXT_COLUMNS + TAG_COLUMNS]
+
+STAGING_TABLE = "foods_staging"
+
+STAGING_DDL = f"""
+CREATE TEMPORARY TABLE `{STAGING_TABLE}` (
+    `description_zh` VARCHAR(255),
+    `description_en` VARCHAR(255),
+    `energy_kcal` DECIMAL(10, 2),
+    `protein_g` DECIMAL(10, 2),
+    `fat_g` DECIMAL(10, 2),
+    `carbohydrate_g` DECIMAL(10, 2),
+    `fiber_total_dietary_g` DECIMAL(10, 2),
+    `sugars_g` DECIMAL(10, 2),
+    `fe_mg` DECIMAL(10, 2),
+    `na_mg` DECIMAL(10, 2),
+    `serving_size_g` DECIMAL(10, 2),
+    `source` VARCHAR(100),
+    `is_high_protein` BOOLEAN,
+    `is_low_carb` BOOLEAN,
+    `is_low_fat` BOOLEAN,
+    `is_high_fiber` BOOLEAN
+) DEFAULT CHARSET = utf8mb4
+"""
+
+INSERT_BATCH_SIZE = 5000
+
+
+def prepare_foods(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    整理待导入的数据：补齐缺失列、去掉没有中文名的行，同名食物只保留最后一条
+    """
+    df = df.copy()
+    for col in FOOD_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df = df[FOOD_COLUMNS]
+
+    df["description_zh"] = df["description_zh"].astype("string").str.strip()
+    missing_name = df["description_zh"].isna() | (df["description_zh"] == "")
+    if missing_name.any():
+        logging.warning(f"跳过 {int(missing_name.sum())} 条没有中文名的食物")
+    df = df[~missing_name]
+
+    return df.drop_duplicates("description_zh", keep="last").reset_index(drop=True)
+
+
+def _records(df: pd.DataFrame) -> list:
+    """转换为数据库驱动可用的行（NaN -> None）"""
+    values = df.astype(object).where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def _write_tsv(df: pd.DataFrame, path: str):
+    """写入 LOAD DATA 使用的制表符分隔文件（空值为 \\N，文本中的制表符/换行替换为空格）"""
+    out = df.copy()
+    for col in TEXT_COLUMNS:
+        out[col] = out[col].astype("string").str.replace(r"[\t\r\n\\\\]", " ", regex=True)
+    out.to_csv(path, sep="\t", header=False, index=False, na_rep="\\N", lineterminator="\n")
+
+
+def _load_data_infile(conn: Connection, df: pd.DataFrame):
+    """通过临时文件 + LOAD DATA LOCAL INFILE 载入中转表"""
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    os.close(fd)
+    try:
+        _write_tsv(df, path)
+        conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE `{STAGING_TABLE}` "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            "LINES TERMINATED BY '\\n' "
+            f"({', '.join(FOOD_COLUMNS)})",
+            (path.replace(os.sep, "/"),)
+        )
+    finally:
+        os.remove(path)
+
+
+def _insert_batches(conn: Connection, df: pd.DataFrame, batch_size: int):
+    """分批多行 INSERT 载入中转表（驱动会把每批合并成一条多行 INSERT 语句）"""
+    placeholders = ", ".join(["%s"] * len(FOOD_COLUMNS))
+    sql = f"INSERT INTO `{STAGING_TABLE}` ({', '.join(FOOD_COLUMNS)}) VALUES ({placeholders})"
+    records = _records(df)
+    for start in range(0, len(records), batch_size):
+        conn.exec_driver_sql(sql, records[start:start + batch_size])
+
+
+def _merge_sql() -> str:
+    """中转表合并到 foods：已存在的中文名更新营养数据，不存在的插入"""
+    columns = ", ".join(FOOD_COLUMNS)
+    updates = ", ".join(
+        f"{col} = staged.{col}" for col in FOOD_COLUMNS if col != "description_zh"
+    )
+    return (
+        f"INSERT INTO foods ({columns}) "
+        f"SELECT * FROM (SELECT {columns} FROM `{STAGING_TABLE}`) AS staged "
+        f"ON DUPLICATE KEY UPDATE {updates}"
+    )
+
+
+def bulk_upsert_foods(
+    df: pd.DataFrame,
+    engine: Engine,
+    use_load_data: bool = True,
+    batch_size: int = INSERT_BATCH_SIZE
+) -> Dict:
+    """
+    批量导入/更新食物（整个过程在一个事务中完成）
+
+    :param df: 食物数据（列名同 foods 表）
+    :param engine: 数据库引擎（使用 LOAD DATA 时需要 connect_args={"local_infile": True}）
+    :param use_load_data: 是否优先使用 LOAD DATA LOCAL INFILE
+    :param batch_size: 退回多行 INSERT 时每批的行数
+    :return: {'rows', 'affected_rows', 'method', 'seconds'}
+    """
+    started_at = time.perf_counter()
+    df = prepare_foods(df)
+    df[NUMERIC_COLUMNS] = (
+        df[NUMERIC_COLUMNS]
+        .apply(pd.to_numeric, errors="coerce")
+        .replace([np.inf, -np.inf], np.nan)
+        .round(2)
+    )
+    # 按入库精度（两位小数）计算标签，布尔值以 0/1 写入
+    df[TAG_COLUMNS] = derive_food_tags(df)[TAG_COLUMNS].astype(np.int8)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS `{STAGING_TABLE}`")
+        conn.exec_driver_sql(STAGING_DDL)
+
+        method = "insert"
+        if use_load_data:
+            try:
+                _load_data_infile(conn, df)
+                method = "load_data"
+            except Exception as e:
+                logging.warning(f"LOAD DATA LOCAL INFILE 不可用，改用批量 INSERT: {e}")
+                conn.exec_driver_sql(f"TRUNCATE TABLE `{STAGING_TABLE}`")
+        if method == "insert":
+            _insert_batches(conn, df, batch_size)
+
+        # ON DUPLICATE KEY UPDATE 的影响行数：插入计 1，更新计 2，数据未变化计 0
+        affected = conn.exec_driver_sql(_merge_sql()).rowcount
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE `{STAGING_TABLE}`")
+
+    stats = {
+        "rows": len(df),
+        "affected_rows": affected,
+        "method": method,
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
+    logging.info(
+        f"食物导入完成：{stats['rows']} 条，方式 {method}，影响行数 {affected}，耗时 {stats['seconds']}s"
+    )
+    return stats
@@ -0,0 +1,98 @@
+"""
+食物营养标签
+导入时对整张表向量化计算 is_high_protein / is_low_carb / is_low_fat / is_high_fiber，
+阈值与 nutri_plan.sql 中 foods 表的触发器一致；
+并提供整表回填命令（一条基于集合的 UPDATE，只修改标签不正确的行）
+
+用法: python food_tags.py --backfill
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+
+# 标签阈值（与触发器 update_food_labels_before_insert / before_update 一致）
+HIGH_PROTEIN_ENERGY_RATIO = 0.2  # 蛋白质供能比 > 20%
+LOW_FAT_ENERGY_RATIO = 0.15  # 脂肪供能比 < 15%
+LOW_CARB_G_PER_100G = 10  # 每100g碳水 < 10g
+HIGH_FIBER_G_PER_100G = 3  # 每100g膳食纤维 > 3g
+
+KCAL_PER_G_PROTEIN = 4.0
+KCAL_PER_G_FAT = 9.0
+
+TAG_COLUMNS = ["is_high_protein", "is_low_carb", "is_low_fat", "is_high_fiber"]
+
+# 与 derive_food_tags 相同规则的 SQL 表达式（NULL 参与比较时结果为 FALSE，与触发器的 IF(...) 一致）
+TAG_SQL = {
+    "is_high_protein": (
+        f"COALESCE(energy_kcal > 0 AND protein_g * {KCAL_PER_G_PROTEIN} / energy_kcal > {HIGH_PROTEIN_ENERGY_RATIO}, FALSE)"
+    ),
+    "is_low_carb": f"COALESCE(carbohydrate_g < {LOW_CARB_G_PER_100G}, FALSE)",
+    "is_low_fat": (
+        f"COALESCE(energy_kcal > 0 AND fat_g * {KCAL_PER_G_FAT} / energy_kcal < {LOW_FAT_ENERGY_RATIO}, FALSE)"
+    ),
+    "is_high_fiber": f"COALESCE(fiber_total_dietary_g > {HIGH_FIBER_G_PER_100G}, FALSE)",
+}
+
+
+def derive_food_tags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    向量化计算营养标签（不修改传入的 DataFrame）
+    供能比按每100g的蛋白质/脂肪供能除以每100g热量计算；缺失值对应的标签为 False
+    """
+    df = df.copy()
+    energy = pd.to_numeric(df["energy_kcal"], errors="coerce").to_numpy(dtype=np.float64)
+    protein = pd.to_numeric(df["protein_g"], errors="coerce").to_numpy(dtype=np.float64)
+    fat = pd.to_numeric(df["fat_g"], errors="coerce").to_numpy(dtype=np.float64)
+    carbs = pd.to_numeric(df["carbohydrate_g"], errors="coerce").to_numpy(dtype=np.float64)
+    fiber = pd.to_numeric(df["fiber_total_dietary_g"], errors="coerce").to_numpy(dtype=np.float64)
+
+    has_energy = energy > 0
+    safe_energy = np.where(has_energy, energy, 1.0)
+    with np.errstate(invalid="ignore"):
+        df["is_high_protein"] = has_energy & (protein * KCAL_PER_G_PROTEIN / safe_energy > HIGH_PROTEIN_ENERGY_RATIO)
+        df["is_low_fat"] = has_energy & (fat * KCAL_PER_G_FAT / safe_energy < LOW_FAT_ENERGY_RATIO)
+        df["is_low_carb"] = carbs < LOW_CARB_G_PER_100G
+        df["is_high_fiber"] = fiber > HIGH_FIBER_G_PER_100G
+    return df
+
+
+def backfill_sql() -> str:
+    """整表回填标签（只更新标签与规则不一致的行）"""
+    assignments = ", ".join(f"{col} = {expr}" for col, expr in TAG_SQL.items())
+    mismatched = " OR ".join(f"NOT ({col} <=> {expr})" for col, expr in TAG_SQL.items())
+    return f"UPDATE foods SET {assignments} WHERE {mismatched}"
+
+
+def backfill_food_tags(engine: Engine) -> int:
+    """
+    按规则重新计算 foods 表所有行的标签
+    :return: 被修改的行数
+    """
+    with engine.begin() as conn:
+        updated = conn.exec_driver_sql(backfill_sql()).rowcount
+    logging.info(f"营养标签回填完成：修改 {updated} 行")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="食物营养标签")
+    parser.add_argument("--backfill", action="store_true", help="重新计算 foods 表所有行的标签")
+    parser.add_argument("--database-url", default="mysql+pymysql://root:@127.0.0.1:3306/nutri_plan")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.backfill:
+        updated = backfill_food_tags(create_engine(args.database_url))
+        print(f"✅ 营养标签回填完成：修改 {updated} 行")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+USDA 与中国食物成分表（CDC China）食物的模糊去重
+中文名规范化后按 字符二元组 + 热量分箱 分块，只比较同一块中的食物（不做全量两两比较）；
+候选对的名称相似度（二元组 Jaccard）和营养相似度整体向量化计算，
+加权得分超过阈值的食物对连成簇，每簇合并为一行（营养素取非 0 平均）
+
+用法: python fuzzy_dedup.py --usda data/clean_food_with_zh_dedup.parquet --cdc data/中国食物营养成分表.xlsx
+"""
+import argparse
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+import utils
+from bulk_loader import NUMERIC_COLUMNS, bulk_upsert_foods
+
+
+# 规范化时去掉的字符：空白、中英文括号和标点
+NAME_SEPARATORS = r"[\s()\[\]（）【】<>《》,，、;；:：.。·\-_/\\'\"“”‘’]+"
+
+# 计算营养相似度使用的营养素
+SIMILARITY_NUTRIENTS = ["energy_kcal", "protein_g", "fat_g", "carbohydrate_g", "fiber_total_dietary_g"]
+# 相对差异的分母下限，避免很小的数值（如 0.1g 与 0.3g）被判为差异很大
+NUTRIENT_DIFF_FLOOR = 1.0
+
+ENERGY_BIN_KCAL = 50  # 热量分箱宽度，使用错开半个宽度的两套分箱，避免相近的热量落在箱边界两侧
+MAX_BLOCK_SIZE = 100  # 超过该大小的块（很常见的二元组）不参与分块，保证候选对数量近似线性
+
+DEFAULT_THRESHOLD = 0.85
+NAME_WEIGHT = 0.6  # 名称相似度权重，其余为营养相似度
+MIN_NAME_SIMILARITY = 0.5  # 名称相似度下限，营养相近但名称不同的食物不合并
+
+PREFERRED_SOURCE = "CDC China"  # 簇的代表名称优先使用中文原生数据
+
+
+def normalize_zh_names(names: pd.Series) -> pd.Series:
+    """中文名规范化：全角转半角、小写、去掉空白和标点（"鸡蛋(白皮)" 与 "鸡蛋，白皮" 结果相同）"""
+    return (
+        names
+        .astype("string")
+        .fillna("")
+        .str.normalize("NFKC")
+        .str.lower()
+        .str.replace(NAME_SEPARATORS, "", regex=True)
+        .astype(object)
+    )
+
+
+def char_bigrams(keys: pd.Series) -> pd.DataFrame:
+    """
+    按位置逐列切出字符二元组（对所有名称同时切片），单字名称使用该字本身
+    :return: 每行内去重的 (row, bigram) 表
+    """
+    keys = keys.reset_index(drop=True).astype("string")
+    lengths = keys.str.len().to_numpy()
+    single = lengths == 1
+    parts = [pd.DataFrame({"row": np.flatnonzero(single), "bigram": keys[single].to_numpy()})]
+    for start in range(int(lengths.max(initial=0)) - 1):
+        mask = lengths >= start + 2
+        parts.append(pd.DataFrame({
+            "row": np.flatnonzero(mask),
+            "bigram": keys[mask].str.slice(start, start + 2).to_numpy(),
+        }))
+    return pd.concat(parts, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def energy_bins(energy: np.ndarray, width: float = ENERGY_BIN_KCAL) -> np.ndarray:
+    """两套错开半个宽度的热量分箱，热量缺失时为 -1；返回形状 (n, 2)"""
+    with np.errstate(invalid="ignore"):
+        bins = np.stack([np.floor(energy / width), np.floor(energy / width + 0.5)], axis=1)
+    bins[np.isnan(energy)] = -1
+    return bins.astype(np.int64)
+
+
+def candidate_pairs(bigrams: pd.DataFrame, bins: np.ndarray, max_block_size: int = MAX_BLOCK_SIZE) -> pd.DataFrame:
+    """
+    生成候选食物对：至少有一套分箱中热量同箱，且有一个共同的二元组
+    :return: (row_a, row_b)，row_a < row_b
+    """
+    blocks = pd.concat(
+        [bigrams.assign(grid=grid, bin=bins[bigrams["row"].to_numpy(), grid]) for grid in (0, 1)],
+        ignore_index=True
+    )
+    size = blocks.groupby(["grid", "bin", "bigram"])["row"].transform("size")
+    blocks = blocks[(size > 1) & (size <= max_block_size)]
+
+    pairs = blocks.merge(blocks, on=["grid", "bin", "bigram"], suffixes=("_a", "_b"))
+    pairs = pairs[pairs["row_a"] < pairs["row_b"]]
+    return pairs[["row_a", "row_b"]].drop_duplicates(ignore_index=True)
+
+
+def count_shared_bigrams(pairs: pd.DataFrame, bigrams: pd.DataFrame) -> np.ndarray:
+    """候选对的共同二元组个数（使用完整的二元组表，包括未参与分块的常见二元组）"""
+    left = pairs.merge(bigrams.rename(columns={"row": "row_a"}), on="row_a")
+    both = left.merge(bigrams.rename(columns={"row": "row_b"}), on=["row_b", "bigram"])
+    shared = both.groupby(["row_a", "row_b"]).size()
+    index = pd.MultiIndex.from_frame(pairs[["row_a", "row_b"]])
+    return shared.reindex(index, fill_value=0).to_numpy()
+
+
+def pair_similarity(
+    pairs: pd.DataFrame,
+    shared: np.ndarray,
+    bigram_counts: np.ndarray,
+    nutrients: np.ndarray,
+    name_weight: float = NAME_WEIGHT
+) -> pd.DataFrame:
+    """
+    计算候选对的名称相似度、营养相似度和加权得分
+    营养相似度 = 1 - 各营养素相对差异的平均值（只比较两边都有数值的营养素，都没有时为 0）
+    """
+    a = pairs["row_a"].to_numpy()
+    b = pairs["row_b"].to_numpy()
+
+    name_sim = shared / (bigram_counts[a] + bigram_counts[b] - shared)
+
+    va, vb = nutrients[a], nutrients[b]
+    scale = np.maximum(np.fmax(np.abs(va), np.abs(vb)), NUTRIENT_DIFF_FLOOR)
+    diff = np.minimum(np.abs(va - vb) / scale, 1.0)
+    compared = ~np.isnan(diff)
+    n_compared = compared.sum(axis=1)
+    nutrient_sim = np.where(
+        n_compared > 0,
+        1 - np.where(compared, diff, 0).sum(axis=1) / np.maximum(n_compared, 1),
+        0.0
+    )
+
+    return pairs.assign(
+        name_similarity=name_sim,
+        nutrient_similarity=nutrient_sim,
+        score=name_weight * name_sim + (1 - name_weight) * nutrient_sim
+    )
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """连通分量（最小标签沿边传播 + 指针跳跃），返回每个节点所在分量的最小节点编号"""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        updated = labels.copy()
+        np.minimum.at(updated, a, low)
+        np.minimum.at(updated, b, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_foods(
+    df: pd.DataFrame,
+    threshold: float = DEFAULT_THRESHOLD,
+    name_weight: float = NAME_WEIGHT,
+    min_name_similarity: float = MIN_NAME_SIMILARITY,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    模糊去重
+
+    :param df: 食物数据（列名同 foods 表，至少包含 description_zh、source）
+    :param threshold: 合并的加权得分阈值
+    :param name_weight: 名称相似度权重
+    :param min_name_similarity: 名称相似度下限
+    :param max_block_size: 分块大小上限
+    :return: (簇分配, 合并后的食物, 统计)；簇分配为每条输入食物的 cluster_id 和代表名称
+    """
+    df = df[df["description_zh"].notna()].reset_index(drop=True)
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
+
+    keys = normalize_zh_names(df["description_zh"])
+    bigrams = char_bigrams(keys)
+    bigram_counts = np.bincount(bigrams["row"].to_numpy(), minlength=len(df))
+
+    nutrients = df.reindex(columns=SIMILARITY_NUTRIENTS).to_numpy(dtype=np.float64)
+    pairs = candidate_pairs(bigrams, energy_bins(nutrients[:, 0]), max_block_size)
+    shared = count_shared_bigrams(pairs, bigrams)
+    scored = pair_similarity(pairs, shared, bigram_counts, nutrients, name_weight)
+
+    # 规范化后同名的食物直接合并；其余按阈值合并
+    # 规范化后为空的名称（只有标点或空白）不算同名，否则会全部并入同一个簇
+    named = (keys != "").to_numpy()
+    same_key = pd.DataFrame({"row": np.flatnonzero(named), "key": keys[named].to_numpy()})
+    first_row = same_key.groupby("key")["row"].transform("min").to_numpy()
+    matched = scored[(scored["score"] >= threshold) & (scored["name_similarity"] >= min_name_similarity)]
+    edges_a = np.concatenate([matched["row_a"].to_numpy(), same_key["row"].to_numpy()])
+    edges_b = np.concatenate([matched["row_b"].to_numpy(), first_row])
+    cluster_id = connected_components(len(df), edges_a, edges_b)
+
+    # 代表名称：优先中文原生数据，其次名称最短，最后按输入顺序
+    order = pd.DataFrame({
+        "cluster_id": cluster_id,
+        "not_preferred": (df["source"] != PREFERRED_SOURCE).to_numpy(),
+        "name_length": keys.str.len().to_numpy(),
+        "row": np.arange(len(df)),
+    }).sort_values(["cluster_id", "not_preferred", "name_length", "row"])
+    representative = order.drop_duplicates("cluster_id").set_index("cluster_id")["row"]
+
+    assignments = df[["description_zh", "source"]].assign(cluster_id=cluster_id)
+    assignments["representative_zh"] = df["description_zh"].to_numpy()[representative.loc[cluster_id].to_numpy()]
+
+    means = utils.group_mean_ignore_zero(df.assign(cluster_id=cluster_id), "cluster_id", numeric_cols)
+    firsts = df.assign(cluster_id=cluster_id).groupby("cluster_id")[["description_en"]].first()
+    merged = means.join(firsts)
+    merged["description_zh"] = df["description_zh"].to_numpy()[representative.loc[merged.index].to_numpy()]
+    merged["source"] = df["source"].to_numpy()[representative.loc[merged.index].to_numpy()]
+    merged = merged.reset_index()
+
+    stats = {
+        "foods": len(df),
+        "candidate_pairs": len(pairs),
+        "matched_pairs": len(matched),
+        "clusters": len(merged),
+    }
+    logging.info(
+        f"模糊去重：{stats['foods']} 条食物，候选对 {stats['candidate_pairs']}，"
+        f"合并 {stats['matched_pairs']} 对 → {stats['clusters']} 条"
+    )
+    return assignments, merged, stats
+
+
+def dedup_food_sources(
+    usda_path: str,
+    cdc_path: str,
+    clusters_path: str,
+    output_path: str,
+    threshold: float = DEFAULT_THRESHOLD
+) -> Dict:
+    """
+    合并 USDA（Pipeline 去重结果）与中国食物成分表并模糊去重
+
+    :param usda_path: USDA 中文去重后的 Parquet
+    :param cdc_path: 中国食物营养成分表（Excel）
+    :param clusters_path: 簇分配输出（Parquet）
+    :param output_path: 合并后的食物输出（Parquet）
+    :param threshold: 合并的加权得分阈值
+    """
+    from import_cdc_data import read_cdc_foods
+
+    foods = pd.concat([utils.read_artifact(usda_path), read_cdc_foods(cdc_path)], ignore_index=True)
+    assignments, merged, stats = cluster_foods(foods, threshold=threshold)
+
+    utils.write_artifact(assignments, clusters_path)
+    utils.write_artifact(merged, output_path)
+    print(f"✅ 模糊去重完成：{stats['foods']} → {stats['clusters']} 条 → {output_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="USDA 与中国食物成分表模糊去重")
+    parser.add_argument("--usda", default="data/clean_food_with_zh_dedup.parquet")
+    parser.add_argument("--cdc", default="data/中国食物营养成分表.xlsx")
+    parser.add_argument("--clusters", default="data/food_clusters.parquet", help="簇分配输出")
+    parser.add_argument("--output", default="data/foods_merged.parquet", help="合并后的食物输出")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="合并的加权得分阈值")
+    parser.add_argument("--load", action="store_true", help="合并后导入数据库")
+    args = parser.parse_args()
+
+    dedup_food_sources(args.usda, args.cdc, args.clusters, args.output, threshold=args.threshold)
+
+    if args.load:
+        stats = bulk_upsert_foods(utils.read_artifact(args.output), utils.engine)
+        print(f"✅ 已导入 {stats['rows']} 条食物（{stats['seconds']}s）")
+
+
+if __name__ == "__main__":
+    main()
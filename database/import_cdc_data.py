@@ -1,11 +1,15 @@
 import pandas as pd
 from sqlalchemy import create_engine
 
+from bulk_loader import bulk_upsert_foods
+
 # 数据库配置
 DATABASE_URL = "mysql+pymysql://root:@127.0.0.1:3306/nutri_plan"
-engine = create_engine(DATABASE_URL)
+# local_infile: 允许批量导入使用 LOAD DATA LOCAL INFILE
+engine = create_engine(DATABASE_URL, connect_args={"local_infile": True})
 
-def import_with_averaging(file_path):
+def read_cdc_foods(file_path):
+    """读取中国食物营养成分表，同名食物取营养平均值（列名同 foods 表）"""
     df = pd.read_excel(file_path)
     df.columns = [col.replace('\n', '').strip() for col in df.columns]
     
@@ -36,11 +40,16 @@ def import_with_averaging(file_path):
     df_avg['serving_size_g'] = 100.00
     df_avg['sugars_g'] = 0
     df_avg['description_en'] = None
-    
+    return df_avg
+
+
+def import_with_averaging(file_path):
+    df_avg = read_cdc_foods(file_path)
 
     try:
-        df_avg.to_sql('foods', con=engine, if_exists='append', index=False)
-        print(f"成功导入 {len(df_avg)} 条聚合后的食物数据！")
+        # 按中文名更新已有食物、插入新食物，重复导入结果不变
+        stats = bulk_upsert_foods(df_avg, engine)
+        print(f"成功导入 {stats['rows']} 条聚合后的食物数据！（{stats['seconds']}s）")
     except Exception as e:
         print(f"❌ 导入失败: {e}")
 
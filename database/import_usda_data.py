@@ -2,10 +2,13 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 import logging
 
+from bulk_loader import bulk_upsert_foods
+
 logging.basicConfig(level=logging.INFO)
 
 DATABASE_URL = "mysql+pymysql://root:@127.0.0.1:3306/nutri_plan"
-engine = create_engine(DATABASE_URL)
+# local_infile: 允许批量导入使用 LOAD DATA LOCAL INFILE
+engine = create_engine(DATABASE_URL, connect_args={"local_infile": True})
 
 SELECTED_NUTRIENTS = {
     1008: "energy_kcal",
@@ -18,27 +21,21 @@ SELECTED_NUTRIENTS = {
     1093: "na_mg",
 }
 
-def import_foods(food_csv):
-    df = pd.read_csv(
-        food_csv,
-        usecols=["description_zh", "energy_kcal", "protein_g", "fat_g", "carbohydrate_g", "fiber_total_dietary_g", "sugars_g", "fe_mg", "na_mg", "serving_size_g", "description_en", "source"]
+def import_foods(food_path):
+    df = pd.read_parquet(
+        food_path,
+        columns=["description_zh", "energy_kcal", "protein_g", "fat_g", "carbohydrate_g", "fiber_total_dietary_g", "sugars_g", "fe_mg", "na_mg", "serving_size_g", "description_en", "source"]
     )
 
     logging.info(f"导入 food：{len(df)} 条")
 
-    df.to_sql(
-        "foods",
-        engine,
-        if_exists="append",
-        index=False,
-        method="multi",
-        chunksize=1000
-    )
+    # 按中文名更新已有食物、插入新食物，重复导入结果不变
+    bulk_upsert_foods(df, engine)
 
 
 
 def main():
-    import_foods("./data/clean_food_with_zh_dedup.csv")
+    import_foods("./data/clean_food_with_zh_dedup.parquet")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+增量 Pipeline 执行器
+每个阶段声明输入文件、输出文件和参数，阶段之间的依赖由 输出 -> 输入 自动推导。
+阶段指纹 = 输入文件内容哈希 + 参数 + 代码文件哈希，与上次运行的 manifest 一致且输出文件未变化时跳过；
+每完成一个阶段就写入 manifest，失败后重新运行会从失败的阶段继续。
+互不依赖的阶段在多个进程中并行执行。
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+
+class Stage:
+    """Pipeline 阶段"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], None],
+        inputs: List[str],
+        outputs: List[str],
+        params: Optional[Dict] = None,
+        code_files: Optional[List[str]] = None,
+        optional_inputs: Optional[List[str]] = None
+    ):
+        """
+        :param name: 阶段名称（manifest 中的 Key）
+        :param func: 阶段函数（无参数，需可被子进程导入：模块级函数或其 functools.partial）
+        :param inputs: 输入文件
+        :param outputs: 输出文件
+        :param params: 影响输出的参数（如营养素映射），必须可 JSON 序列化
+        :param code_files: 实现该阶段的代码文件，代码变化后阶段重新执行
+        :param optional_inputs: 可以不存在的输入文件，不存在时以固定值参与指纹，不会阻塞阶段
+        """
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.code_files = code_files or []
+        self.optional_inputs = optional_inputs or []
+
+
+class FileHasher:
+    """
+    文件内容哈希（SHA-256）
+    大小和修改时间与上次记录一致的文件直接复用上次的哈希，避免每次重新读取 USDA 原始数据
+    """
+
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, known: Optional[Dict[str, Dict]] = None):
+        """
+        :param known: 上次记录的 {路径: {'size', 'mtime_ns', 'sha256'}}
+        """
+        self.known = dict(known or {})
+
+    def hash(self, path: str) -> Optional[str]:
+        """计算文件哈希，文件不存在时返回 None"""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        cached = self.known.get(path)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        self.known[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        return sha256
+
+
+def _run_stage(func: Callable[[], None]) -> float:
+    """子进程中执行阶段函数，返回耗时（秒）"""
+    started_at = time.perf_counter()
+    func()
+    return time.perf_counter() - started_at
+
+
+class PipelineRunner:
+    """按依赖关系执行阶段，跳过输入未变化的阶段"""
+
+    def __init__(self, manifest_path: str, workers: int = 2):
+        """
+        :param manifest_path: manifest 文件路径（JSON）
+        :param workers: 并行执行阶段的最大进程数
+        """
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.manifest = self._load_manifest()
+        self.hasher = FileHasher(self.manifest.get("files"))
+
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {"stages": {}, "files": {}}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        """原子写入 manifest（先写临时文件再替换）"""
+        self.manifest["files"] = self.hasher.known
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def fingerprint(self, stage: Stage) -> Optional[str]:
+        """计算阶段指纹，有必需的输入文件不存在时返回 None"""
+        input_hashes = {}
+        for path in stage.inputs:
+            file_hash = self.hasher.hash(path)
+            if file_hash is None:
+                return None
+            input_hashes[path] = file_hash
+
+        payload = json.dumps(
+            {
+                "inputs": input_hashes,
+                # 不存在的可选输入哈希为 None，文件出现或消失时指纹都会变化
+                "optional_inputs": {path: self.hasher.hash(path) for path in stage.optional_inputs},
+                "params": stage.params,
+                "code": {path: self.hasher.hash(path) for path in stage.code_files},
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_up_to_date(self, stage: Stage, fingerprint: str) -> bool:
+        """指纹与上次一致，且输出文件都存在、内容与上次写入时一致"""
+        record = self.manifest["stages"].get(stage.name)
+        if not record or record.get("fingerprint") != fingerprint:
+            return False
+        return all(
+            self.hasher.hash(path) == record["outputs"].get(path)
+            for path in stage.outputs
+        )
+
+    def run(self, stages: List[Stage], force: bool = False) -> Dict[str, str]:
+        """
+        执行 Pipeline
+
+        :param stages: 阶段列表（任意顺序，依赖由输入/输出推导）
+        :param force: 是否忽略 manifest 强制执行所有阶段
+        :return: {阶段名: 'done' | 'skipped' | 'blocked'}，blocked 表示缺少外部输入（或依赖的阶段被阻塞）
+        """
+        producers = {path: stage.name for stage in stages for path in stage.outputs}
+        dependencies = {
+            stage.name: {
+                producers[path]
+                for path in stage.inputs + stage.optional_inputs
+                if path in producers
+            }
+            for stage in stages
+        }
+        by_name = {stage.name: stage for stage in stages}
+
+        status: Dict[str, str] = {}
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while len(status) < len(stages):
+                    progress = len(status)
+                    # 调度所有依赖已完成的阶段
+                    for stage in stages:
+                        if stage.name in status or stage.name in running.values():
+                            continue
+                        deps = dependencies[stage.name]
+                        if any(status.get(dep) == "blocked" for dep in deps):
+                            status[stage.name] = "blocked"
+                            print(f"⏸  {stage.name}: 等待上游阶段")
+                            continue
+                        if not all(status.get(dep) in ("done", "skipped") for dep in deps):
+                            continue
+
+                        fingerprint = self.fingerprint(stage)
+                        if fingerprint is None:
+                            missing = [path for path in stage.inputs if not os.path.exists(path)]
+                            status[stage.name] = "blocked"
+                            print(f"⏸  {stage.name}: 缺少输入 {', '.join(missing)}")
+                            continue
+                        if not force and self.is_up_to_date(stage, fingerprint):
+                            status[stage.name] = "skipped"
+                            print(f"⏭  {stage.name}: 输入未变化，跳过")
+                            continue
+
+                        future = executor.submit(_run_stage, stage.func)
+                        running[future] = stage.name
+
+                    if not running:
+                        if len(status) == progress:
+                            raise ValueError("Pipeline stages contain a dependency cycle")
+                        continue
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    errors = []
+                    for future in finished:
+                        name = running.pop(future)
+                        try:
+                            seconds = future.result()
+                        except Exception as e:
+                            # 已完成的阶段保留在 manifest 中，重新运行时从失败的阶段继续
+                            print(f"❌ {name}: 失败")
+                            errors.append(e)
+                            continue
+                        stage = by_name[name]
+                        self.manifest["stages"][name] = {
+                            # 重新计算指纹：输入可能由上游在本次运行中生成
+                            "fingerprint": self.fingerprint(stage),
+                            "outputs": {path: self.hasher.hash(path) for path in stage.outputs},
+                            "seconds": round(seconds, 3),
+                        }
+                        self._save_manifest()
+                        status[name] = "done"
+                        print(f"✅ {name}: 完成 ({seconds:.2f}s)")
+                    if errors:
+                        raise errors[0]
+            finally:
+                for future in running:
+                    future.cancel()
+                self._save_manifest()
+
+        return status
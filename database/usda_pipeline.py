@@ -1,6 +1,11 @@
+import argparse
 import os
 import sys
+from functools import partial
+
+import fuzzy_dedup
 import utils
+from pipeline_runner import PipelineRunner, Stage
 
 
 # 路径配置
@@ -16,15 +21,35 @@ FNDD_FOOD_CSV = f"{USDA_DIR}/fndd_food/food.csv"
 FNDD_FOOD_NUTRIENT_CSV = f"{USDA_DIR}/fndd_food/food_nutrient.csv"
 FNDD_FOOD_PORTION_CSV = f"{USDA_DIR}/fndd_food/food_portion.csv"
 
-CLEAN_FOUNDATION = f"{DATA_DIR}/clean_foundation_food.csv"
-CLEAN_FNDD = f"{DATA_DIR}/clean_fndd_food.csv"
-CLEAN_FOOD = f"{DATA_DIR}/clean_food.csv"
+# 中间产物使用 Parquet，只有人工翻译的输入/输出使用 CSV
+CLEAN_FOUNDATION = f"{DATA_DIR}/clean_foundation_food.parquet"
+CLEAN_FNDD = f"{DATA_DIR}/clean_fndd_food.parquet"
+CLEAN_FOOD = f"{DATA_DIR}/clean_food.parquet"
 
 FOOD_NAMES_TO_TRANSLATE = f"{DATA_DIR}/food_names_to_translate.csv"
 FOOD_TRANSLATION = f"{DATA_DIR}/food_translation.csv"
 
-CLEAN_WITH_ZH = f"{DATA_DIR}/clean_food_with_zh.csv"
-CLEAN_DEDUP = f"{DATA_DIR}/clean_food_with_zh_dedup.csv"
+# 翻译记忆：历次人工翻译按规范化英文名累积，新版本数据只需翻译新增的名称
+TRANSLATION_MEMORY = f"{DATA_DIR}/translation_memory.parquet"
+
+CLEAN_WITH_ZH = f"{DATA_DIR}/clean_food_with_zh.parquet"
+CLEAN_DEDUP = f"{DATA_DIR}/clean_food_with_zh_dedup.parquet"
+
+# 与中国食物成分表合并后的模糊去重结果
+CDC_FOOD_XLSX = f"{DATA_DIR}/中国食物营养成分表.xlsx"
+FOOD_CLUSTERS = f"{DATA_DIR}/food_clusters.parquet"
+FOODS_MERGED = f"{DATA_DIR}/foods_merged.parquet"
+FUZZY_DEDUP_THRESHOLD = fuzzy_dedup.DEFAULT_THRESHOLD
+
+# 记录每个阶段上次运行时的输入指纹，输入未变化的阶段会被跳过
+PIPELINE_MANIFEST = f"{DATA_DIR}/pipeline_manifest.json"
+
+# 阶段的实现代码，修改后相关阶段重新执行
+PIPELINE_CODE_FILES = [os.path.abspath(__file__), os.path.abspath(utils.__file__)]
+FUZZY_DEDUP_CODE_FILES = PIPELINE_CODE_FILES + [
+    os.path.abspath(fuzzy_dedup.__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_cdc_data.py"),
+]
 
 
 # 营养素映射（与你 utils 一致）
@@ -53,49 +78,59 @@ FNDD_NUTRIENTS = {
 
 NUTRIENT_COLS = list(SELECTED_NUTRIENTS.values()) + ["serving_size_g"]
 
+# USDA 数据集（food.csv / food_nutrient.csv / food_portion.csv、营养素映射、清洗结果）
+# 每个数据集是一个独立的清洗阶段，由 PipelineRunner 在多个进程中并行执行，
+# 合并时按这里的顺序拼接；新增数据集（如 SR Legacy、Branded）只需在这里登记
+USDA_SOURCES = {
+    "foundation": {
+        "csv": (FOUNDATION_FOOD_CSV, FOUNDATION_FOOD_NUTRIENT_CSV, FOUNDATION_FOOD_PORTION_CSV),
+        "nutrients": SELECTED_NUTRIENTS,
+        "output": CLEAN_FOUNDATION,
+    },
+    "fndd": {
+        "csv": (FNDD_FOOD_CSV, FNDD_FOOD_NUTRIENT_CSV, FNDD_FOOD_PORTION_CSV),
+        "nutrients": FNDD_NUTRIENTS,
+        "output": CLEAN_FNDD,
+    },
+}
 
-def step_1_clean_usda():
-    print("\nStep 1: 清洗 USDA foundation / fndd 数据")
+# 较大的 food_nutrient.csv 拆分后并行读取，CPU 核数由同时清洗的数据集平分
+NUTRIENT_READ_WORKERS = max(1, (os.cpu_count() or 1) // len(USDA_SOURCES))
 
-    utils.clean_food_dataset(
-        FOUNDATION_FOOD_CSV,
-        FOUNDATION_FOOD_NUTRIENT_CSV,
-        FOUNDATION_FOOD_PORTION_CSV,
-        SELECTED_NUTRIENTS,
-        CLEAN_FOUNDATION
-    )
 
+def step_1_clean_source(source: str):
+    print(f"\nStep 1: 清洗 USDA {source} 数据")
+
+    config = USDA_SOURCES[source]
     utils.clean_food_dataset(
-        FNDD_FOOD_CSV,
-        FNDD_FOOD_NUTRIENT_CSV,
-        FNDD_FOOD_PORTION_CSV,
-        FNDD_NUTRIENTS,
-        CLEAN_FNDD
+        *config["csv"],
+        config["nutrients"],
+        config["output"],
+        workers=NUTRIENT_READ_WORKERS
     )
 
 
 def step_2_merge_sources():
-    print("\nStep 2: 合并 foundation + fndd")
+    print(f"\nStep 2: 合并 {' + '.join(USDA_SOURCES)}")
 
     utils.merge_food_sources(
-        files=[
-            (CLEAN_FOUNDATION, "foundation"),
-            (CLEAN_FNDD, "fndd"),
-        ],
-        output_csv=CLEAN_FOOD
+        files=[(config["output"], source) for source, config in USDA_SOURCES.items()],
+        output_path=CLEAN_FOOD
     )
 
 
 def step_3_extract_food_names():
     print("\nStep 3: 提取待翻译食物名")
 
-    utils.extract_unique_food_names(
+    remaining = utils.extract_unique_food_names(
         CLEAN_FOOD,
-        FOOD_NAMES_TO_TRANSLATE
+        FOOD_NAMES_TO_TRANSLATE,
+        memory_path=TRANSLATION_MEMORY
     )
 
-    print("\n请完成翻译后再继续：")
-    print(f"{FOOD_NAMES_TO_TRANSLATE} → {FOOD_TRANSLATION}")
+    if remaining:
+        print("\n请完成翻译后再继续：")
+        print(f"{FOOD_NAMES_TO_TRANSLATE} → {FOOD_TRANSLATION}")
 
 
 def step_4_merge_translation():
@@ -109,7 +144,8 @@ def step_4_merge_translation():
     utils.merge_translation(
         CLEAN_FOOD,
         FOOD_TRANSLATION,
-        CLEAN_WITH_ZH
+        CLEAN_WITH_ZH,
+        memory_path=TRANSLATION_MEMORY
     )
 
 
@@ -122,32 +158,127 @@ def step_5_dedup_by_zh():
         nutrient_cols=NUTRIENT_COLS
     )
 
-def step_6_load_to_db():
-    print("\nStep 6: 导入数据库")
 
-    utils.load_foods_to_database(
-        CLEAN_DEDUP
+def step_6_fuzzy_dedup():
+    print("\nStep 6: 与中国食物成分表合并 + 模糊去重")
+
+    fuzzy_dedup.dedup_food_sources(
+        CLEAN_DEDUP,
+        CDC_FOOD_XLSX,
+        FOOD_CLUSTERS,
+        FOODS_MERGED,
+        threshold=FUZZY_DEDUP_THRESHOLD
     )
 
+
+def final_food_path(status: dict) -> str:
+    """
+    本次运行的最终食物文件
+    模糊去重本次完成或输入未变化时为合并结果，否则（如缺少中国食物成分表）为中文去重结果，
+    不会使用之前运行遗留的合并文件
+    """
+    return FOODS_MERGED if status.get("fuzzy_dedup") in ("done", "skipped") else CLEAN_DEDUP
+
+
+def step_7_load_to_db(food_path: str):
+    print("\nStep 7: 导入数据库")
+
+    utils.load_foods_to_database(food_path)
+
+
+def run_step(step, *args):
+    """执行一个步骤并输出该步骤的读写耗时和输出文件大小"""
+    step(*args)
+    utils.report_io_stats(f"{step.__name__}({', '.join(args)})" if args else step.__name__)
+
+
+def build_stages():
+    """Pipeline 各阶段及其输入、输出和参数（阶段之间的依赖由输入/输出推导）"""
+    clean_stages = [
+        Stage(
+            f"clean_{source}",
+            partial(run_step, step_1_clean_source, source),
+            inputs=list(config["csv"]),
+            outputs=[config["output"]],
+            params={"nutrients": config["nutrients"]},
+            code_files=PIPELINE_CODE_FILES
+        )
+        for source, config in USDA_SOURCES.items()
+    ]
+    return clean_stages + [
+        Stage(
+            "merge_sources",
+            partial(run_step, step_2_merge_sources),
+            inputs=[config["output"] for config in USDA_SOURCES.values()],
+            outputs=[CLEAN_FOOD],
+            params={"sources": list(USDA_SOURCES)},
+            code_files=PIPELINE_CODE_FILES
+        ),
+        Stage(
+            "extract_food_names",
+            partial(run_step, step_3_extract_food_names),
+            inputs=[CLEAN_FOOD],
+            outputs=[FOOD_NAMES_TO_TRANSLATE],
+            code_files=PIPELINE_CODE_FILES,
+            # 翻译记忆更新后重新提取（记忆由 merge_translation 维护，不是阶段输出；首次运行时还不存在）
+            optional_inputs=[TRANSLATION_MEMORY]
+        ),
+        Stage(
+            "merge_translation",
+            partial(run_step, step_4_merge_translation),
+            # 依赖待翻译文件，保证在提取之后才更新翻译记忆
+            inputs=[CLEAN_FOOD, FOOD_TRANSLATION, FOOD_NAMES_TO_TRANSLATE],
+            outputs=[CLEAN_WITH_ZH],
+            code_files=PIPELINE_CODE_FILES
+        ),
+        Stage(
+            "dedup_by_zh",
+            partial(run_step, step_5_dedup_by_zh),
+            inputs=[CLEAN_WITH_ZH],
+            outputs=[CLEAN_DEDUP],
+            params={"nutrient_cols": NUTRIENT_COLS},
+            code_files=PIPELINE_CODE_FILES
+        ),
+        Stage(
+            "fuzzy_dedup",
+            partial(run_step, step_6_fuzzy_dedup),
+            inputs=[CLEAN_DEDUP, CDC_FOOD_XLSX],
+            outputs=[FOOD_CLUSTERS, FOODS_MERGED],
+            params={"threshold": FUZZY_DEDUP_THRESHOLD},
+            code_files=FUZZY_DEDUP_CODE_FILES
+        ),
+    ]
+
+
 def main():
+    parser = argparse.ArgumentParser(description="食品营养数据 Pipeline")
+    parser.add_argument("--force", action="store_true", help="忽略上次运行记录，重新执行所有阶段")
+    parser.add_argument("--load", action="store_true", help="Pipeline 完成后将最终文件导入数据库")
+    parser.add_argument(
+        "--workers", type=int, default=len(USDA_SOURCES),
+        help="并行执行阶段的进程数（默认为 USDA 数据集个数）"
+    )
+    args = parser.parse_args()
+
     print("\n启动食品营养数据 Pipeline\n")
 
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    step_1_clean_usda()
-    step_2_merge_sources()
-    step_3_extract_food_names()
-
-    print("\nPipeline 暂停在翻译阶段")
-    print("完成翻译后，重新运行 pipeline.py 即可继续\n")
+    runner = PipelineRunner(PIPELINE_MANIFEST, workers=args.workers)
+    status = runner.run(build_stages(), force=args.force)
 
-    step_4_merge_translation()
-    step_5_dedup_by_zh()
+    if status.get("merge_translation") == "blocked":
+        print("\nPipeline 暂停在翻译阶段")
+        print(f"请完成翻译：{FOOD_NAMES_TO_TRANSLATE} → {FOOD_TRANSLATION}")
+        print("完成翻译后，重新运行 usda_pipeline.py 即可继续（已完成的阶段会被跳过）\n")
+        return
 
+    food_path = final_food_path(status)
     print("\nPipeline 全部完成！")
-    print(f"最终文件：{CLEAN_DEDUP}")
-
+    print(f"最终文件：{food_path}")
 
+    if args.load:
+        run_step(step_7_load_to_db, food_path)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,85 @@
+import csv
+import io
 import logging
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from sqlalchemy import create_engine, text
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Tuple
+
+from bulk_loader import bulk_upsert_foods
 
 
 logging.basicConfig(level=logging.INFO)
 DATABASE_URL = "mysql+pymysql://root:@127.0.0.1:3306/nutri_plan"
-engine = create_engine(DATABASE_URL)
+# local_infile: 允许批量导入使用 LOAD DATA LOCAL INFILE
+engine = create_engine(DATABASE_URL, connect_args={"local_infile": True})
+
+
+# 阶段之间交换的中间产物使用 Parquet（保留列类型，读取时可内存映射、只读需要的列），
+# 只有交给人工翻译的文件使用 CSV
+_io_stats: List[Dict] = []
+
+
+def _record_io(op: str, path: str, rows: int, started_at: float):
+    """记录一次读写的耗时和文件大小"""
+    _io_stats.append({
+        "op": op,
+        "path": path,
+        "rows": rows,
+        "seconds": time.perf_counter() - started_at,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+    })
+
+
+def write_artifact(df: pd.DataFrame, path: str):
+    """写入 Parquet 中间产物"""
+    started_at = time.perf_counter()
+    df.to_parquet(path, engine="pyarrow", index=False)
+    _record_io("write", path, len(df), started_at)
+
+
+def read_artifact(path: str, columns: List[str] | None = None) -> pd.DataFrame:
+    """读取 Parquet 中间产物（内存映射，可只读取部分列）"""
+    started_at = time.perf_counter()
+    df = pd.read_parquet(path, engine="pyarrow", columns=columns, memory_map=True)
+    _record_io("read", path, len(df), started_at)
+    return df
+
+
+def write_csv(df: pd.DataFrame, path: str, **kwargs):
+    """写入 CSV（人工处理的文件）"""
+    started_at = time.perf_counter()
+    df.to_csv(path, index=False, **kwargs)
+    _record_io("write", path, len(df), started_at)
+
+
+def read_csv(path: str, **kwargs) -> pd.DataFrame:
+    """读取 CSV（USDA 原始数据 / 人工翻译文件）"""
+    started_at = time.perf_counter()
+    df = pd.read_csv(path, **kwargs)
+    _record_io("read", path, len(df), started_at)
+    return df
+
+
+def report_io_stats(step_name: str) -> List[Dict]:
+    """打印并清空自上次调用以来的读写统计"""
+    stats = list(_io_stats)
+    _io_stats.clear()
+
+    for item in stats:
+        print(
+            f"   {item['op']:<5} {item['path']}: {item['rows']} 行, "
+            f"{item['seconds']:.2f}s, {item['bytes'] / 1024 / 1024:.2f} MB"
+        )
+    io_seconds = sum(item["seconds"] for item in stats)
+    written_bytes = sum(item["bytes"] for item in stats if item["op"] == "write")
+    print(f"📊 {step_name} I/O: {io_seconds:.2f}s, 输出 {written_bytes / 1024 / 1024:.2f} MB")
+    return stats
 
 
 def mean_ignore_zero(series: pd.Series) -> float:
@@ -38,37 +108,251 @@ def normalize_text(text: str) -> str:
     return text
 
 
+def normalize_text_series(series: pd.Series) -> pd.Series:
+    """normalize_text 的向量化版本（整列 str 操作，空值为空字符串）"""
+    return (
+        series
+        .astype("string")
+        .fillna("")
+        .str.strip()
+        .str.strip('"')
+        .str.strip("'")
+        .str.lower()
+        .str.replace(r"\s+", " ", regex=True)
+        .astype(object)
+    )
+
+
+# 翻译记忆：按规范化英文名保存历史翻译，跨 USDA 版本复用，
+# 提取待翻译食物名时只输出记忆中没有的名称
+TRANSLATION_MEMORY_COLUMNS = ["key", "description_en", "description_zh"]
+
+
+def load_translation_memory(memory_path: str) -> pd.DataFrame:
+    """读取翻译记忆，文件不存在时返回空表"""
+    if not os.path.exists(memory_path):
+        return pd.DataFrame(columns=TRANSLATION_MEMORY_COLUMNS, dtype=object)
+    return read_artifact(memory_path, columns=TRANSLATION_MEMORY_COLUMNS)
+
+
+def update_translation_memory(memory_path: str, translation_csv: str) -> pd.DataFrame:
+    """
+    把人工翻译文件并入翻译记忆（同一英文名以翻译文件为准），内容有变化时才重写记忆文件
+
+    :param memory_path: 翻译记忆（Parquet）
+    :param translation_csv: 人工翻译文件（description_en, description_zh）
+    :return: 更新后的翻译记忆
+    """
+    memory = load_translation_memory(memory_path)
+
+    trans_df = read_csv(translation_csv, usecols=["description_en", "description_zh"])
+    trans_df["key"] = normalize_text_series(trans_df["description_en"])
+    trans_df["description_zh"] = trans_df["description_zh"].astype("string").str.strip()
+    trans_df = trans_df[
+        (trans_df["key"] != "") & trans_df["description_zh"].notna() & (trans_df["description_zh"] != "")
+    ].drop_duplicates("key")
+    trans_df["description_zh"] = trans_df["description_zh"].astype(object)
+
+    updated = (
+        pd.concat(
+            [memory[~memory["key"].isin(trans_df["key"])], trans_df[TRANSLATION_MEMORY_COLUMNS]],
+            ignore_index=True
+        )
+        .sort_values("key", ignore_index=True)
+    )
+
+    if not updated.astype(object).equals(memory.astype(object)):
+        # 先写临时文件再替换，读取方看到的总是完整的记忆
+        tmp_path = f"{memory_path}.tmp"
+        write_artifact(updated, tmp_path)
+        os.replace(tmp_path, memory_path)
+        print(f"✅ 翻译记忆已更新：{len(memory)} → {len(updated)} 条 → {memory_path}")
+    return updated
+
+
+# food_nutrient.csv 分块读取时只保留的列及其类型
+NUTRIENT_CSV_DTYPES = {
+    "fdc_id": "int32",
+    "nutrient_id": "int32",
+    "amount": "float64",
+}
+NUTRIENT_CSV_CHUNKSIZE = 500_000
+
+
+# 超过该大小的 food_nutrient.csv 按字节范围拆分，在多个进程中并行读取和聚合
+NUTRIENT_PARTITION_BYTES = 256 * 1024 * 1024
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """只读取文件 [start, end) 字节范围的文件对象"""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _csv_partitions(path: str, partitions: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    把 CSV 按字节拆分为最多 partitions 个范围，每个范围的边界对齐到行首
+    :return: (表头列名, [(start, end)])
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        boundaries = [f.tell()]
+        step = max((size - boundaries[0]) // partitions, 1)
+        for i in range(1, partitions):
+            target = boundaries[0] + i * step
+            if target <= boundaries[-1]:
+                continue
+            f.seek(target)
+            f.readline()
+            if f.tell() >= size:
+                break
+            boundaries.append(f.tell())
+    boundaries.append(size)
+    names = next(csv.reader([header.decode("utf-8-sig").strip()]))
+    return names, list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _nutrient_totals(chunks, nutrient_map: Dict[int, str]) -> Tuple[int, pd.DataFrame | None]:
+    """按 nutrient_map 过滤并累加 (fdc_id, nutrient_id) 的合计值和计数"""
+    rows = 0
+    totals = None
+    for chunk in chunks:
+        rows += len(chunk)
+        chunk = chunk[chunk["nutrient_id"].isin(nutrient_map)]
+        if chunk.empty:
+            continue
+        partial = chunk.groupby(["fdc_id", "nutrient_id"])["amount"].agg(["sum", "count"])
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+    return rows, totals
+
+
+def _nutrient_range_totals(
+    nutrient_csv: str,
+    names: List[str],
+    byte_range: Tuple[int, int],
+    nutrient_map: Dict[int, str],
+    chunksize: int
+) -> Tuple[int, pd.DataFrame | None]:
+    """子进程中读取一个字节范围并聚合"""
+    with io.BufferedReader(_ByteRangeReader(nutrient_csv, *byte_range)) as f:
+        return _nutrient_totals(
+            pd.read_csv(
+                f,
+                header=None,
+                names=names,
+                usecols=list(NUTRIENT_CSV_DTYPES),
+                dtype=NUTRIENT_CSV_DTYPES,
+                chunksize=chunksize
+            ),
+            nutrient_map
+        )
+
+
+def read_nutrient_pivot(
+    nutrient_csv: str,
+    nutrient_map: Dict[int, str],
+    chunksize: int = NUTRIENT_CSV_CHUNKSIZE,
+    workers: int | None = None,
+    partition_bytes: int = NUTRIENT_PARTITION_BYTES
+) -> pd.DataFrame:
+    """
+    分块读取 food_nutrient.csv 并透视为 fdc_id × 营养素 的均值表
+    只读取 fdc_id / nutrient_id / amount 三列，每块先按 nutrient_map 过滤，
+    再累加 (fdc_id, nutrient_id) 的合计值和计数，峰值内存取决于输出大小而不是输入文件。
+    文件超过 partition_bytes 时按字节范围拆分，由多个进程分别聚合，
+    各范围的部分结果按范围顺序相加，结果与进程完成的先后无关
+
+    :param workers: 并行读取的进程数，默认为 CPU 核数
+    """
+    started_at = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    partitions = min(workers, -(-os.path.getsize(nutrient_csv) // partition_bytes))
+
+    results = None
+    if partitions > 1:
+        names, ranges = _csv_partitions(nutrient_csv, partitions)
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                results = list(executor.map(
+                    _nutrient_range_totals,
+                    repeat(nutrient_csv), repeat(names), ranges, repeat(nutrient_map), repeat(chunksize)
+                ))
+        except (ValueError, pd.errors.ParserError) as e:
+            # 字段中含有换行时按字节拆分会切断记录，退回单进程读取
+            logging.warning(f"{nutrient_csv} 无法按字节范围并行读取，改为单进程读取: {e}")
+            results = None
+
+    if results is None:
+        results = [_nutrient_totals(
+            pd.read_csv(
+                nutrient_csv,
+                usecols=list(NUTRIENT_CSV_DTYPES),
+                dtype=NUTRIENT_CSV_DTYPES,
+                chunksize=chunksize
+            ),
+            nutrient_map
+        )]
+
+    rows = 0
+    totals = None
+    for part_rows, part_totals in results:
+        rows += part_rows
+        if part_totals is not None:
+            totals = part_totals if totals is None else totals.add(part_totals, fill_value=0)
+    _record_io("read", nutrient_csv, rows, started_at)
+
+    if totals is None:
+        return pd.DataFrame({"fdc_id": pd.Series(dtype="int32")})
+
+    # 与 pivot_table(aggfunc="mean") 一致：忽略空值求均值，全部为空的组合不出现在结果中
+    totals = totals[totals["count"] > 0]
+    means = (totals["sum"] / totals["count"]).rename("amount").reset_index()
+    means["nutrient_name"] = means["nutrient_id"].map(nutrient_map)
+
+    pivot = means.pivot(index="fdc_id", columns="nutrient_name", values="amount")
+    pivot.columns.name = None
+    return pivot.reset_index()
+
+
 def clean_food_dataset(
     food_csv: str,
     nutrient_csv: str,
     portion_csv: str | None,
     nutrient_map: Dict[int, str],
-    output_csv: str
+    output_path: str,
+    workers: int | None = None
 ):
-    """清洗 USDA food + nutrient 数据"""
-    food_df = pd.read_csv(food_csv, low_memory=False)
-    nutrient_df = pd.read_csv(nutrient_csv, low_memory=False)
-
-    food_df = food_df[["fdc_id", "description"]]
-
-    nutrient_df = nutrient_df[nutrient_df["nutrient_id"].isin(nutrient_map)]
-    nutrient_df["nutrient_name"] = nutrient_df["nutrient_id"].map(nutrient_map)
-
-    nutrient_pivot = (
-        nutrient_df
-        .pivot_table(
-            index="fdc_id",
-            columns="nutrient_name",
-            values="amount",
-            aggfunc="mean"
-        )
-        .reset_index()
-    )
+    """
+    清洗 USDA food + nutrient 数据
+    :param workers: 并行读取 food_nutrient.csv 的进程数（文件较大时才会拆分）
+    """
+    food_df = read_csv(food_csv, usecols=["fdc_id", "description"], low_memory=False)
+
+    nutrient_pivot = read_nutrient_pivot(nutrient_csv, nutrient_map, workers=workers)
 
     merged = food_df.merge(nutrient_pivot, on="fdc_id", how="left")
 
     if portion_csv:
-        portion_df = pd.read_csv(portion_csv, low_memory=False)
+        portion_df = read_csv(portion_csv, usecols=["fdc_id", "gram_weight"], low_memory=False)
         portion_avg = (
             portion_df[["fdc_id", "gram_weight"]]
             .groupby("fdc_id", as_index=False)
@@ -88,11 +372,11 @@ def clean_food_dataset(
         .fillna(0)
     )
 
-    final_df.to_csv(output_csv, index=False)
-    print(f"✅ Saved → {output_csv}")
+    write_artifact(final_df, output_path)
+    print(f"✅ Saved → {output_path}")
 
 
-def merge_food_sources(files: List[tuple], output_csv: str):
+def merge_food_sources(files: List[tuple], output_path: str):
     """合并 foundation / fndd 数据"""
     dfs = []
 
@@ -110,7 +394,7 @@ def merge_food_sources(files: List[tuple], output_csv: str):
     ]
 
     for file, source in files:
-        df = pd.read_csv(file)
+        df = read_artifact(file)
         for col in REQUIRED_COLS:
             if col not in df.columns:
                 df[col] = 0
@@ -120,35 +404,55 @@ def merge_food_sources(files: List[tuple], output_csv: str):
 
     final_df = pd.concat(dfs, ignore_index=True)
     final_df = final_df.rename(columns={"description": "description_en"})
-    final_df.to_csv(output_csv, index=False)
-    print(f"✅ 合并完成 → {output_csv}")
+    write_artifact(final_df, output_path)
+    print(f"✅ 合并完成 → {output_path}")
 
 
-def extract_unique_food_names(input_csv: str, output_csv: str):
-    """提取唯一英文食物名"""
-    df = pd.read_csv(input_csv)
+def extract_unique_food_names(input_path: str, output_csv: str, memory_path: str | None = None) -> int:
+    """
+    提取唯一英文食物名（输出 CSV 交给人工翻译）
+    指定翻译记忆时只输出记忆中没有的名称
+    :return: 待翻译的名称数量
+    """
+    df = read_artifact(input_path, columns=["description_en"])
     unique_names = (
         df[["description_en"]]
         .drop_duplicates()
         .sort_values("description_en")
     )
-    unique_names.to_csv(output_csv, index=False)
-    print(f"✅ 已生成 {output_csv}")
+    total = len(unique_names)
+
+    if memory_path:
+        memory = load_translation_memory(memory_path)
+        known = normalize_text_series(unique_names["description_en"]).isin(memory["key"])
+        unique_names = unique_names[~known.to_numpy()]
+        print(f"   {total} 个唯一食物名，{total - len(unique_names)} 个已在翻译记忆中")
+
+    write_csv(unique_names, output_csv)
+    print(f"✅ 已生成 {output_csv}（待翻译 {len(unique_names)} 个）")
+    return len(unique_names)
 
 
 def merge_translation(
-    food_csv: str,
+    food_path: str,
     translation_csv: str,
-    output_csv: str
+    output_path: str,
+    memory_path: str | None = None
 ):
-    """合并中英文描述"""
-    food_df = pd.read_csv(food_csv)
-    trans_df = pd.read_csv(translation_csv)
+    """
+    合并中英文描述
+    指定翻译记忆时先把翻译文件并入记忆，再按记忆合并（翻译文件只需包含新增的名称）
+    """
+    food_df = read_artifact(food_path)
 
-    food_df["key"] = food_df["description_en"].apply(normalize_text)
-    trans_df["key"] = trans_df["description_en"].apply(normalize_text)
+    if memory_path:
+        trans_df = update_translation_memory(memory_path, translation_csv)
+    else:
+        trans_df = read_csv(translation_csv)
+        trans_df["key"] = normalize_text_series(trans_df["description_en"])
+        trans_df = trans_df.drop_duplicates("key")
 
-    trans_df = trans_df.drop_duplicates("key")
+    food_df["key"] = normalize_text_series(food_df["description_en"])
 
     merged = food_df.merge(
         trans_df[["key", "description_zh"]],
@@ -156,47 +460,59 @@ def merge_translation(
         how="left"
     ).drop(columns=["key"])
 
-    merged.to_csv(output_csv, index=False, encoding="utf-8-sig")
-    print(f"✅ 合并完成 → {output_csv}")
+    missing = int(merged["description_zh"].isna().sum())
+    if missing:
+        logging.warning(f"{missing} 条食物没有中文翻译")
+
+    write_artifact(merged, output_path)
+    print(f"✅ 合并完成 → {output_path}")
+
+
+def group_mean_ignore_zero(
+    df: pd.DataFrame,
+    key: str,
+    value_cols: List[str]
+) -> pd.DataFrame:
+    """
+    按 key 分组，对每列只对非 0 数值求平均（向量化版本的 mean_ignore_zero）
+    0 一次性替换为 NaN 后使用原生 groupby().mean()，分组内没有非 0 数值时为 0.0
+    """
+    values = df[value_cols].apply(pd.to_numeric, errors="coerce")
+    values = values.mask(values == 0)
+    values[key] = df[key]
+    return values.groupby(key).mean().fillna(0.0)
+
+
+def dedup_foods_by_chinese_name(df: pd.DataFrame, nutrient_cols: List[str]) -> pd.DataFrame:
+    """
+    按中文名去重：营养素取非 0 平均，英文名和来源取每组第一条
+    """
+    means = group_mean_ignore_zero(df, "description_zh", nutrient_cols)
+    firsts = df.groupby("description_zh")[["description_en", "source"]].first()
+    return means.join(firsts).reset_index()
 
 
 def dedup_by_chinese_name(
-    input_csv: str,
-    output_csv: str,
+    input_path: str,
+    output_path: str,
     nutrient_cols: List[str]
 ):
-    df = pd.read_csv(input_csv)
-
-    for col in nutrient_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    result = (
-        df
-        .groupby("description_zh", as_index=False)
-        .agg({
-            **{col: mean_ignore_zero for col in nutrient_cols},
-            "description_en": "first",
-            "source": "first"
-        })
-    )
+    df = read_artifact(input_path)
 
-    result.to_csv(output_csv, index=False)
-    print(f"✅ 去重完成 → {output_csv}")
+    result = dedup_foods_by_chinese_name(df, nutrient_cols)
 
-def import_foods(food_csv):
+    write_artifact(result, output_path)
+    print(f"✅ 去重完成 → {output_path}")
 
-    df = pd.read_csv(
-        food_csv,
-        usecols=["description_zh", "energy_kcal", "protein_g", "fat_g", "carbohydrate_g", "fiber_total_dietary_g", "sugars_g", "fe_mg", "na_mg", "serving_size_g", "description_en", "source"]
-    )
+
+def load_foods_to_database(food_path: str):
+    """批量导入去重后的食物数据（按中文名更新已有食物，可重复执行）"""
+    df = read_artifact(food_path)
 
     logging.info(f"导入 food：{len(df)} 条")
 
-    df.to_sql(
-        "foods_information",
-        engine,
-        if_exists="append",
-        index=False,
-        method="multi",
-        chunksize=1000
-    )
\ No newline at end of file
+    return bulk_upsert_foods(df, engine)
+
+
+def import_foods(food_path):
+    return load_foods_to_database(food_path)